@@ -0,0 +1,230 @@
+"""
+Run programs repeatedly, summarize and compare the measurements.
+"""
+
+import json
+import math
+import os
+import re
+import statistics
+import subprocess
+import time
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils import format_size, subprocess_call
+
+# Difference with p-value below it is reported as significant.
+SIGNIFICANCE_LEVEL = 0.05
+# Measurements of each run, and the units to display them.
+METRICS = {
+    'wall': 's',
+    'cpu': 's',
+    'max_rss': 'B',
+}
+
+# Phases of the editor startup, in the form of (name, start pattern, end pattern).
+# A phase starts at the first line matching the start pattern, or the first line of the log if it is empty,
+# and ends at the last line matching the end pattern.
+STARTUP_PHASES = [
+    ('engine init', '', r'Engine is initialized'),
+    ('module loading', r'Log(?:Module|Plugin)Manager:', r'Log(?:Module|Plugin)Manager:'),
+    ('asset registry', r'LogAssetRegistry:', r'LogAssetRegistry:'),
+    ('shader compile', r'LogShaderCompilers:', r'LogShaderCompilers:'),
+    ('total', '', r''),
+]
+_LOG_TIMESTAMP_RE = re.compile(r'^\[(\d{4})\.(\d{2})\.(\d{2})-(\d{2})\.(\d{2})\.(\d{2}):(\d{3})\]')
+
+
+class Sample(NamedTuple):
+    """Measurements of one run."""
+    wall: float  # Wall time in seconds.
+    cpu: float  # User and system CPU time in seconds, 0 if unavailable.
+    max_rss: int  # Peak resident set size in bytes, 0 if unavailable.
+    returncode: int
+
+
+class Stats(NamedTuple):
+    """Statistics of a metric over the runs."""
+    mean: float
+    median: float
+    stddev: float
+    p95: float
+    min: float
+    max: float
+
+
+def run_once(cmd: List[str], quiet=True) -> Sample:
+    """Run the command once and measure it."""
+    output = subprocess.DEVNULL if quiet else None
+    start = time.perf_counter()
+    if not hasattr(os, 'wait4'):
+        returncode = subprocess_call(cmd, stdout=output, stderr=output)
+        return Sample(time.perf_counter() - start, 0.0, 0, returncode)
+    with subprocess.Popen(cmd, stdout=output, stderr=output) as p:
+        _, status, rusage = os.wait4(p.pid, 0)
+        wall = time.perf_counter() - start
+        # The process is reaped by wait4, tell Popen its exit status.
+        p.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS.
+    max_rss = rusage.ru_maxrss * (1 if os.uname().sysname == 'Darwin' else 1024)
+    return Sample(wall, rusage.ru_utime + rusage.ru_stime, max_rss, p.returncode)
+
+
+def summarize(values: List[float]) -> Stats:
+    """Calculate the statistics of the values."""
+    stddev = statistics.stdev(values) if len(values) > 1 else 0.0
+    p95 = statistics.quantiles(values, n=20, method='inclusive')[-1] if len(values) > 1 else values[0]
+    return Stats(statistics.mean(values), statistics.median(values), stddev, p95, min(values), max(values))
+
+
+def make_result(name, cmd: List[str], samples: List[Dict[str, float]], target='', config='') -> dict:
+    """
+    Make the JSON serializable result of a benchmark, the metrics are the keys of each sample.
+    The target and config identify the result to match the baseline, the name depends on the options.
+    """
+    # Only the metrics measured in all runs are summarized.
+    metrics = [m for m in samples[0] if all(m in s for s in samples)] if samples else []
+    return {
+        'name': name,
+        'target': target,
+        'config': config,
+        'command': cmd,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'samples': samples,
+        'stats': {metric: summarize([s[metric] for s in samples])._asdict() for metric in metrics},
+    }
+
+
+def format_value(metric, value: float) -> str:
+    """Format a value of the metric with its unit, the unit of unknown metrics is second."""
+    unit = METRICS.get(metric, 's')
+    if unit == 'B':
+        return format_size(value)
+    return f'{value:.3f}{unit}'
+
+
+def metric_values(result: dict, metric) -> List[float]:
+    """Values of a metric of all samples in a result."""
+    return [s[metric] for s in result['samples']]
+
+
+def compare(base: dict, new: dict) -> Dict[str, dict]:
+    """Compare each metric of two results with Welch's t-test."""
+    comparison = {}
+    for metric in base['stats']:
+        if metric not in new['stats']:
+            continue
+        a, b = metric_values(base, metric), metric_values(new, metric)
+        if not any(a) and not any(b):
+            continue
+        t, p = welch_t_test(a, b)
+        base_mean = statistics.mean(a)
+        change = (statistics.mean(b) - base_mean) / base_mean if base_mean else 0.0
+        comparison[metric] = {'change': change, 't': t, 'p': p, 'significant': p < SIGNIFICANCE_LEVEL}
+    return comparison
+
+
+def find_baseline(baselines: List[dict], result: dict) -> Optional[dict]:
+    """Find the baseline result of the same target and config as the result, None if not found."""
+    key = (result['target'], result['config'])
+    return next((b for b in baselines if (b.get('target'), b.get('config')) == key), None)
+
+
+def welch_t_test(a: List[float], b: List[float]) -> Tuple[float, float]:
+    """Welch's t-test for the means of two samples, returns the t statistic and the two-sided p-value."""
+    if len(a) < 2 or len(b) < 2:
+        return 0.0, 1.0
+    va = statistics.variance(a) / len(a)
+    vb = statistics.variance(b) / len(b)
+    diff = statistics.mean(a) - statistics.mean(b)
+    if va + vb == 0:
+        return (0.0, 1.0) if diff == 0 else (math.copysign(math.inf, diff), 0.0)
+    t = diff / math.sqrt(va + vb)
+    df = (va + vb) ** 2 / (va ** 2 / (len(a) - 1) + vb ** 2 / (len(b) - 1))
+    return t, _regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def _regularized_incomplete_beta(a, b, x) -> float:
+    """The regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x))
+    # The continued fraction converges rapidly for x < (a + 1) / (a + b + 2), use the symmetry otherwise.
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - front * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def _beta_continued_fraction(a, b, x, max_iterations=200, epsilon=1e-12) -> float:
+    """Evaluate the continued fraction of the incomplete beta function by the modified Lentz's method."""
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, max_iterations + 1):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < epsilon:
+            break
+    return result
+
+
+def parse_startup_phases(log_file) -> Dict[str, float]:
+    """Parse the durations in seconds of the STARTUP_PHASES from the timestamps in the log file."""
+    lines = _read_timestamped_lines(log_file)
+    phases = {}
+    for name, start, end in STARTUP_PHASES:
+        start_time = next((t for t, text in lines if not start or re.search(start, text)), None)
+        end_time = next((t for t, text in reversed(lines) if not end or re.search(end, text)), None)
+        if start_time is not None and end_time is not None and end_time >= start_time:
+            phases[name] = end_time - start_time
+    return phases
+
+
+def _read_timestamped_lines(log_file) -> List[Tuple[float, str]]:
+    """Read the lines with timestamps in the log file, returns a list of (seconds, text after the timestamp)."""
+    lines = []
+    with open(log_file, encoding='utf8', errors='replace') as f:
+        for line in f:
+            m = _LOG_TIMESTAMP_RE.match(line)
+            if m:
+                year, month, day, hour, minute, second, millisecond = (int(g) for g in m.groups())
+                seconds = time.mktime((year, month, day, hour, minute, second, 0, 0, -1)) + millisecond / 1000
+                lines.append((seconds, line[m.end():]))
+    return lines
+
+
+def can_drop_page_cache() -> bool:
+    """Whether drop_page_cache is supported, which requires root on Linux."""
+    return os.path.exists('/proc/sys/vm/drop_caches') and hasattr(os, 'geteuid') and os.geteuid() == 0
+
+
+def drop_page_cache():
+    """Write dirty pages and drop the page cache, for measuring cold starts."""
+    os.sync()
+    with open('/proc/sys/vm/drop_caches', 'w', encoding='utf8') as f:
+        f.write('3\n')
+
+
+def load_results(path) -> List[dict]:
+    """Load the results saved by save_results."""
+    with open(path, encoding='utf8') as f:
+        return json.load(f)['results']
+
+
+def save_results(path, results: List[dict], comparison: Optional[Dict[str, dict]] = None):
+    """Save the results and the optional comparison of them as JSON."""
+    data: dict = {'results': results}
+    if comparison is not None:
+        data['comparison'] = comparison
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(data, f, indent=2)
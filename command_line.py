@@ -8,6 +8,7 @@ import sys
 
 import constants
 from command_alias import CommandAlias
+from utils import parse_size
 
 VERSION = '0.1'
 
@@ -59,6 +60,24 @@ def build_parser() -> argparse.ArgumentParser:
 
     build_parents = [build_config, scope]
 
+    _add_workspace_commands(subparsers, build_config, scope)
+    _add_build_commands(subparsers, build_parents)
+    _add_run_commands(subparsers, build_config, build_parents)
+    _add_content_commands(subparsers, build_config, scope)
+    _add_pack_commands(subparsers, build_config)
+    _add_tool_commands(subparsers)
+
+    try:
+        _fixup_parser(parser)
+    except NameError:
+        # In case of different name in different python version.
+        pass
+
+    return parser
+
+
+def _add_workspace_commands(subparsers, build_config, scope):
+    """Add the commands to manage the engine and the workspace."""
     subparsers.add_parser('setup', help='Setup the engine')
 
     _add_dual_subcommand(subparsers, 'switch', 'engine', help='Swith engine for current project')
@@ -68,6 +87,14 @@ def build_parser() -> argparse.ArgumentParser:
         _add_dual_subcommand(subparsers, 'switch', 'xcode', help='Swicth xcode globally')
     gpf = _add_dual_subcommand(subparsers, 'generate', 'project', help='Generate project files')
     gpf.add_argument('--engine', action='store_true', help='for the engine')
+    gpf.add_argument('--force', action='store_true', help='generate even if nothing relevant changed')
+    gpf.add_argument('--verbose', action='store_true', help='show all changed inputs')
+    compdb = _add_dual_subcommand(subparsers, 'generate', 'compdb', parents=[build_config],
+                                  help='Generate compile_commands.json for the targets',
+                                  epilog='Any arguments after the first bare "--" will be passed to UBT.')
+    compdb.add_argument('-o', '--output', type=str,
+                        help='path of the output file, default to compile_commands.json in the project or engine')
+    compdb.add_argument('--force', action='store_true', help='regenerate all modules, ignore the cache')
 
     list_parsers = subparsers.add_parser('list', help='List objects in the workspace').add_subparsers(
         dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
@@ -76,6 +103,15 @@ def build_parser() -> argparse.ArgumentParser:
 
     list_parsers.add_parser('engine', help='list all unreal engines in this computer')
 
+    modules = list_parsers.add_parser('module', help='List modules, or dependencies of the specified modules',
+                                      parents=[scope])
+    module_relation = modules.add_mutually_exclusive_group()
+    module_relation.add_argument('--deps', action='store_true',
+                                 help='list all modules the specified modules depend on directly or indirectly')
+    module_relation.add_argument('--rdeps', action='store_true',
+                                 help='list all modules depend on the specified modules directly or indirectly')
+    modules.add_argument('--verbose', action='store_true', help='show detailed information')
+
     open_parsers = subparsers.add_parser('open', help='Open objects in the workspace').add_subparsers(
         dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
     open_parsers.add_parser('file', help='Open file', parents=[scope])
@@ -85,55 +121,229 @@ def build_parser() -> argparse.ArgumentParser:
     subparsers.add_parser('runubt', help='Run UnrelBuildTool')
     subparsers.add_parser('runuat', help='Run AutomationTool')
 
+
+def _add_build_commands(subparsers, build_parents):
+    """Add the commands to build targets."""
     build = subparsers.add_parser('build', help='Build specified targets', parents=build_parents)
     build.add_argument('-m', '--modules', type=csv, action=ExtendAction,
                         help='modules to build')
     build.add_argument('-f', '--files', type=csv, action=ExtendAction,
                         help='source files to compile')
+    build.add_argument('--changed', action='store_true',
+                        help='compile source files changed since the base revision in git, '
+                             'changed headers are replaced with the source files including them in the same module')
+    build.add_argument('--affected', action='store_true',
+                        help='build only the modules affected by the changes since the base revision in git, '
+                             'all targets of the project are checked if no target is specified')
+    build.add_argument('--watch', action='store_true',
+                        help='watch the source files of the project, build when they are changed')
+    build.add_argument('--debounce', type=float, default=0.5,
+                        help='seconds to wait for more changes before building in watch mode (default: 0.5)')
+    build.add_argument('--single-file-limit', type=int, default=5,
+                        help='compile with -SingleFile in watch mode if at most so many source files '
+                             'are changed (default: 5)')
+    build.add_argument('--base', type=str, default='HEAD',
+                        help='the base git revision of --changed and --affected (default: HEAD)')
+    build.add_argument('--time-trace', action='store_true',
+                        help='compile with clang -ftime-trace and report the most expensive headers, templates, '
+                             'translation units and modules')
+    build.add_argument('--time-trace-top', type=int, default=20,
+                        help='number of items to show in each list of the --time-trace report (default: 20)')
+    build.add_argument('--pgo', type=str, choices=('instrument', 'collect', 'optimize'),
+                        help='run a step of the profile-guided optimization workflow: build the instrumented binary, '
+                             'run the workload with it to collect the profile, or build the optimized binary')
+    build.add_argument('--pgo-runs', type=int, default=5,
+                        help='number of measured runs to benchmark the workload of --pgo (default: 5)')
     subparsers.add_parser('rebuild', help='Rebuild specified targets', parents=[build], add_help=False)
 
-    subparsers.add_parser('clean', help='Clean specified targets', parents=build_parents)
+    clean = subparsers.add_parser('clean', help='Clean specified targets', parents=build_parents)
+    clean.add_argument('--purge', action='store_true',
+                       help='remove the build output directories instead of cleaning targets by UBT')
+    clean.add_argument('--intermediate', action='store_true', help='purge the Intermediate directories')
+    clean.add_argument('--binaries', action='store_true', help='purge the Binaries directories')
+    clean.add_argument('--saved', action='store_true', help='purge the Saved directories')
+    clean.add_argument('--wait', action='store_true',
+                       help='wait for the purged directories to be removed instead of removing them in background')
+
+    seed = subparsers.add_parser('seed', help='Copy the build artifacts from another work tree of the project')
+    seed.add_argument('--from', dest='source', type=str, required=True,
+                      help='directory of the project in another work tree')
+    seed.add_argument('--hardlink', action='store_true',
+                      help='hardlink files if reflink is not supported, they are shared with the other work tree')
+    seed.add_argument('--force', action='store_true', help='replace the existing build artifacts')
+
+
+def _add_run_commands(subparsers, build_config, build_parents):
+    """Add the commands to run targets."""
+    trace = argparse.ArgumentParser(add_help=False)
+    trace.add_argument('--trace', action='store_true',
+                       help='capture an Unreal Insights trace into Saved/Traces/uct')
+    trace.add_argument('--trace-channels', type=str, metavar='CHANNELS',
+                       help='comma separated channels to trace, implies --trace, default to the "default" preset')
 
     run = subparsers.add_parser(
         'run',
         help='Build and run a single target',
         epilog='Any arguments after the first bare "--" will be passed to the program.',
-        parents=build_parents)
+        parents=build_parents + [trace])
     run.add_argument('--dry-run', action='store_true',
                      help="Don't actually run any commands; just print them.")
+    run.add_argument('--parallel', action='store_true',
+                     help='run all targets concurrently with prefixed output, stop all of them on Ctrl-C')
+    run.add_argument('--log-dir', type=str, help='write the output of each target to its own log file in it')
+    run.add_argument('--primary', type=str, metavar='TARGET',
+                     help='stop all other targets when this target exits, implies --parallel')
+    run.add_argument('--instances', type=int, default=1, metavar='N',
+                     help='run N instances of the target concurrently with their own log files, implies --parallel')
+    run.add_argument('--base-port', type=int, metavar='PORT',
+                     help='pass -port=PORT+i to the i-th instance, starting from 0')
+    run.add_argument('--perf', action='store_true',
+                     help='profile the target with perf record -g and generate a flame graph, on Linux')
+    run.add_argument('--freq', type=int, default=999, help='sampling frequency of --perf, default to 999')
+    run.add_argument('--duration', type=float, metavar='SECONDS', help='stop profiling after SECONDS')
+    run.add_argument('--attach', action='store_true',
+                     help='profile the running processes of the target rather than launching it')
+    run.add_argument('--memreport', action='store_true',
+                     help='run with the Low-Level Memory Tracker and report the memory of each tag after the run')
+    run.add_argument('--memreport-baseline', type=str, metavar='FILE',
+                     help='compare the memory reports with the ones saved by --memreport-output')
+    run.add_argument('--memreport-output', type=str, metavar='FILE', help='save the memory reports as JSON')
+    run.add_argument('--pin-cpus', action='store_true',
+                     help='pin each concurrently running program to its own set of CPUs by taskset, on Linux')
+
+    bench = subparsers.add_parser(
+        'bench',
+        help='Run programs repeatedly, report and compare the statistics',
+        epilog='Any arguments after the first bare "--" will be passed to the program.',
+        parents=build_parents)
+    bench.add_argument('--repeat', '--runs', dest='repeat', type=int, default=10,
+                       help='number of measured runs, default to 10')
+    bench.add_argument('--warmup', type=int, default=1, help='number of unmeasured warmup runs, default to 1')
+    bench.add_argument('--compare', type=str, metavar='CONFIG', choices=constants.CONFIG_MAP.keys(),
+                       help='also run the build of this configuration and compare with the one of -c')
+    bench.add_argument('--baseline', type=str, metavar='FILE', help='compare with the results saved by --output')
+    bench.add_argument('-o', '--output', type=str, metavar='FILE', help='save the results as JSON')
+    bench.add_argument('--verbose', action='store_true', help='show the output of the programs')
+    bench.add_argument('--editor-startup', action='store_true',
+                       help='benchmark the startup of the editor rather than the targets')
+    bench.add_argument('--cold', action='store_true',
+                       help='for --editor-startup, drop the page cache before each run, requires root on Linux')
+    bench.add_argument('--map', type=str, help='for --editor-startup, the map to open')
 
     test = subparsers.add_parser(
         'test',
         help='Build and run tests',
         epilog='Any arguments after the first bare "--" will be passed to the program.',
-        parents=[build_config])
+        parents=[build_config, trace])
     test.add_argument('--list', dest='list', action='store_true', help='list all tests')
     test.add_argument('--run-all', dest='run_all', action='store_true', help='Run all test')
     test.add_argument('--run', dest='tests', type=str,  nargs='+', help='Run tests')
     test.add_argument('--cmds', dest='test_cmds', type=str, nargs='+', help='Extra test commands')
 
+
+def _add_content_commands(subparsers, build_config, scope):
+    """Add the commands to cook content and manage the DDC and pak files."""
+    cook = subparsers.add_parser(
+        'cook',
+        help='Cook content of the project',
+        epilog='Any arguments after the first bare "--" will be passed to the cook commandlet.',
+        parents=[build_config])
+    cook.add_argument('--full', action='store_true',
+                      help='Cook all packages instead of iterative cooking')
+    cook.add_argument('-j', '--processes', type=int,
+                      help='number of cook processes, default is sized from CPU and memory')
+    cook.add_argument('--maps', type=csv, action=ExtendAction,
+                      help='maps to cook')
+
+    ddc_dirs = argparse.ArgumentParser(add_help=False, parents=[scope])
+    ddc_dirs.add_argument('--dirs', type=csv, action=ExtendAction,
+                          help='DDC directories, default is the local DDC of the project and the engine')
+    ddc = subparsers.add_parser('ddc', help='Manage the local DerivedDataCache').add_subparsers(
+        dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
+    ddc.add_parser('stats', help='Show size, file count and age histogram of the DDC', parents=[ddc_dirs])
+    ddc_fill = ddc.add_parser('fill', help='Fill the DDC by running the DerivedDataCache commandlet',
+                              epilog='Any arguments after the first bare "--" will be passed to the commandlet.',
+                              parents=[build_config])
+    ddc_fill.add_argument('--maps', type=csv, action=ExtendAction, help='maps to fill the DDC for')
+    ddc_fill.add_argument('--background', action='store_true',
+                          help='run in background with low priority, the output is written to a log file')
+    ddc_prune = ddc.add_parser('prune', help='Remove least recently accessed files of the DDC', parents=[ddc_dirs])
+    ddc_prune.add_argument('--max-size', type=parse_size, required=True,
+                           help='size budget of the DDC, such as 100G')
+    ddc_prune.add_argument('--dry-run', action='store_true',
+                           help="Don't actually remove any files; just print the result.")
+
+    pak_files = argparse.ArgumentParser(add_help=False)
+    pak_files.add_argument('files', nargs='+', help='.pak or .utoc files')
+    pak = subparsers.add_parser('pak', help='Inspect .pak and .utoc files').add_subparsers(
+        dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
+    pak.add_parser('info', help='Show summary information of the files', parents=[pak_files])
+    pak.add_parser('list', help='List files in the files', parents=[pak_files])
+    pak_stat = pak.add_parser('stat', help='Show sizes and compression ratios by directory', parents=[pak_files])
+    pak_stat.add_argument('--depth', type=int, default=3, help='depth of directories to roll up (default: 3)')
+
+
+def _add_pack_commands(subparsers, build_config):
+    """Add the commands to pack and compare archives."""
+    pack_store = argparse.ArgumentParser(add_help=False)
+    pack_store.add_argument('--store', type=str,
+                            help='move the archived files into this content-addressed store and replace them with '
+                                 'hardlinks, the store must be on the same file system with the output')
+
     pack = subparsers.add_parser('pack', help='Pack specified artifacts').add_subparsers(
         dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
     pack_target = pack.add_parser('target', help='Pack game targets',
                                   epilog='Any arguments after the first bare "--" will be passed to UAT.',
-                                  parents=[build_config])
+                                  parents=[build_config, pack_store])
     pack_target.add_argument('-o', '--output', dest='output', type=str, required=True,
                              help='directory to archive the builds to')
+    pack_target.add_argument('--skip-cook', action='store_true',
+                             help='use the content cooked by the cook command')
+    pack_target.add_argument('-j', '--jobs', type=int, default=1,
+                             help='number of targets to pack concurrently, each one is archived into a subdirectory')
+    pack_target.add_argument('--verify-sdk', action='store_true',
+                             help='always run Turnkey to verify the SDK, ignore the cached result')
+    pack_target.add_argument('--sdk-ttl', type=float, default=24,
+                             help='hours to cache the result of SDK verification, 0 to disable (default: 24)')
+
+    pack_diff = pack.add_parser('diff', help='Compare two archive directories to estimate the patch size')
+    pack_diff.add_argument('old_dir', help='the archive directory of the previous release')
+    pack_diff.add_argument('new_dir', help='the archive directory of the new release')
+    pack_diff.add_argument('--top', type=int, default=20, help='number of biggest changes to show (default: 20)')
+    pack_diff.add_argument('--json', type=str, help="write the result as JSON to the file, '-' for stdout")
 
     pack_plugin = pack.add_parser('plugin', help='Pack plugin',
-                                  epilog='Any arguments after the first bare "--" will be passed to UAT.')
+                                  epilog='Any arguments after the first bare "--" will be passed to UAT.',
+                                  parents=[pack_store])
     pack_plugin.add_argument('-o', '--output', dest='output', type=str, required=True,
                              help='directory to archive the plugin to')
     pack_plugin.add_argument('-p', '--platforms', type=str, nargs='+', choices=constants.PLATFORM_MAP.keys(),
                              help='Target platforms')
-
-    try:
-        _fixup_parser(parser)
-    except NameError:
-        # In case of different name in different python version.
-        pass
-
-    return parser
+    pack_plugin.add_argument('--parallel', action='store_true',
+                             help='Build each platform in a separate UAT process concurrently')
+
+
+def _add_tool_commands(subparsers):
+    """Add the commands to analyze profiles and manage the outputs."""
+    perf_csv = _add_dual_subcommand(subparsers, 'perf', 'csv', help='Analyze the CSV profiler (-csvprofile) files')
+    perf_csv.add_argument('files', nargs='+', help='the CSV files, later ones are compared with the first one')
+    perf_csv.add_argument('--thresholds', type=lambda s: [float(t) for t in s.split(',')], default=[33.3, 50, 100],
+                          help='comma separated frame time thresholds of hitches in ms, default to 33.3,50,100')
+    perf_csv.add_argument('--top', type=int, default=20, help='number of top stats to show, default to 20')
+
+    trace_list = _add_dual_subcommand(subparsers, 'trace', 'list', help='List the captured trace sessions')
+    trace_list.add_argument('--verbose', action='store_true', help='show the trace files in each session')
+    trace_prune = _add_dual_subcommand(subparsers, 'trace', 'prune', help='Remove old trace sessions')
+    trace_prune.add_argument('--keep', type=int, default=10, help='number of newest sessions to keep, default to 10')
+    trace_prune.add_argument('--older-than', type=float, default=0, metavar='DAYS',
+                             help='only remove the sessions older than DAYS')
+    trace_prune.add_argument('--dry-run', action='store_true', help='only show what would be removed')
+
+    store = subparsers.add_parser('store', help='Manage the content-addressed artifact store').add_subparsers(
+        dest='subcommand', help=_SUB_COMMAND_HELP, required=True)
+    store_gc = store.add_parser('gc', help='Remove objects which are not referenced by any archive')
+    store_gc.add_argument('dir', help='the store directory')
+    store_gc.add_argument('--dry-run', action='store_true', help='only show what would be removed')
 
 
 def _fixup_parser(parser: argparse.ArgumentParser):
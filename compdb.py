@@ -0,0 +1,113 @@
+"""
+Incremental compilation database (compile_commands.json) generation.
+
+The database generated by UBT for a target is split into per-module files in the cache directory,
+so only the modules whose build rules or source file lists are changed need to be regenerated,
+and the final database is merged from the per-module files.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+
+from typing import Dict, Iterable, List
+
+from module_graph import ModuleGraph
+
+INDEX_FILE = 'index.json'
+# Entries of files which don't belong to any module, such as generated files.
+OTHER_MODULE = '_Other'
+
+_EXCLUDED_DIRS = {'Binaries', 'Intermediate'}
+_SOURCE_SUFFIXES = ('.c', '.cc', '.cpp', '.h', '.hpp', '.inl', '.ispc')
+
+
+def module_fingerprint(build_file) -> str:
+    """Fingerprint of the build rules and the source file list of the module."""
+    h = hashlib.blake2b(digest_size=16)
+    st = os.stat(build_file)
+    h.update(f'{st.st_size} {st.st_mtime_ns}\n'.encode())
+    module_dir = os.path.dirname(build_file)
+    for root, dirs, files in os.walk(module_dir):
+        dirs[:] = sorted(d for d in dirs if d not in _EXCLUDED_DIRS)
+        for file in sorted(files):
+            if file.endswith(_SOURCE_SUFFIXES):
+                h.update(os.path.relpath(os.path.join(root, file), module_dir).encode() + b'\n')
+    return h.hexdigest()
+
+
+def module_fingerprints(build_files: Dict[str, str]) -> Dict[str, str]:
+    """Fingerprints of the modules, build_files is a dict of module name -> path of its Build.cs file."""
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        return dict(zip(build_files, executor.map(module_fingerprint, build_files.values())))
+
+
+def load_index(cache_dir) -> Dict[str, str]:
+    """Load the module -> fingerprint index of the cached modules."""
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(cache_dir, index: Dict[str, str]):
+    """Save the module -> fingerprint index of the cached modules."""
+    with open(os.path.join(cache_dir, INDEX_FILE), 'w', encoding='utf8') as f:
+        json.dump(index, f, indent=4, sort_keys=True)
+
+
+def split_entries(entries: List[dict], graph: ModuleGraph) -> Dict[str, List[dict]]:
+    """Split the database entries by the modules which their files belong to."""
+    modules: Dict[str, List[dict]] = {}
+    for entry in entries:
+        path = os.path.join(entry.get('directory', ''), entry['file'])
+        module = graph.module_of_file(path) or OTHER_MODULE
+        modules.setdefault(module, []).append(entry)
+    return modules
+
+
+def fold_unknown_modules(entries: Dict[str, List[dict]], modules: Iterable[str]) -> Dict[str, List[dict]]:
+    """Move the entries of the modules which are not in the modules into OTHER_MODULE, so they are still merged."""
+    known = set(modules)
+    folded: Dict[str, List[dict]] = {}
+    for module, module_entries in entries.items():
+        folded.setdefault(module if module in known else OTHER_MODULE, []).extend(module_entries)
+    return folded
+
+
+def save_module(cache_dir, module, entries: List[dict]):
+    """Save the entries of a module into the cache directory."""
+    with open(os.path.join(cache_dir, module + '.json'), 'w', encoding='utf8') as f:
+        json.dump(entries, f)
+
+
+def merge(output, module_files: Iterable[str]) -> int:
+    """
+    Merge the per-module files into the output database, entries of duplicated files are skipped.
+    The output is written in streaming, only one module is loaded at a time to keep memory bounded.
+    Returns the number of written entries.
+    """
+    seen = set()
+    count = 0
+    tmp = output + '.tmp'
+    with open(tmp, 'w', encoding='utf8') as out:
+        out.write('[')
+        for path in module_files:
+            try:
+                with open(path, encoding='utf8') as f:
+                    entries = json.load(f)
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                key = os.path.normpath(os.path.join(entry.get('directory', ''), entry['file']))
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.write(',\n' if count else '\n')
+                out.write(json.dumps(entry))
+                count += 1
+        out.write('\n]\n')
+    os.replace(tmp, output)
+    return count
@@ -14,6 +14,19 @@ PLATFORM_MAP = {
     'ps5': 'PS5',
 }
 
+# Build platform to cook platform.
+COOK_PLATFORM_MAP = {
+    'Win64': 'Windows',
+    'Linux': 'Linux',
+    'LinuxArm64': 'LinuxArm64',
+    'Mac': 'Mac',
+    'Android': 'Android',
+    'IOS': 'IOS',
+    'TVOS': 'TVOS',
+    'HoloLens': 'HoloLens',
+    'PS5': 'PS5',
+}
+
 CONFIG_MAP = {
     'debug': 'Debug',
     'dbg': 'Debug',
@@ -25,3 +38,5 @@ CONFIG_MAP = {
 }
 
 CONFIG_FILE_PATH = '~/.config/uct/config.ini'
+
+CACHE_DIR = '~/.cache/uct'
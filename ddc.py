@@ -0,0 +1,112 @@
+"""
+Local DerivedDataCache management.
+"""
+
+import concurrent.futures
+import os
+import platform
+import time
+
+from typing import Iterable, List, NamedTuple, Tuple
+
+import fs
+
+# Age buckets of the histogram, (upper bound in days, label).
+AGE_BUCKETS = [
+    (1, '< 1 day'),
+    (7, '< 1 week'),
+    (30, '< 1 month'),
+    (90, '< 3 months'),
+    (float('inf'), '>= 3 months'),
+]
+
+
+class CacheFile(NamedTuple):
+    """A file in the DDC."""
+    path: str
+    size: int
+    # Last access time, the modification time is also considered because atime is not updated on some file systems.
+    atime: float
+
+
+def user_ddc_dir() -> str:
+    """The engine version agnostic local DDC directory of current user."""
+    if platform.system() == 'Windows':
+        return os.path.join(os.path.expandvars('%LOCALAPPDATA%'), 'UnrealEngine', 'Common', 'DerivedDataCache')
+    if platform.system() == 'Darwin':
+        return os.path.expanduser('~/Library/Application Support/Epic/UnrealEngine/Common/DerivedDataCache')
+    return os.path.expanduser('~/.config/Epic/UnrealEngine/Common/DerivedDataCache')
+
+
+def scan(dirs: Iterable[str]) -> List[CacheFile]:
+    """Scan all files under the dirs in parallel."""
+    files = []
+    subdirs = []
+    for top in dirs:
+        for entry in fs.list_dir_entries(top):
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                files.append(_make_cache_file(entry))
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for result in executor.map(_scan_tree, subdirs):
+            files += result
+    return files
+
+
+def _scan_tree(top) -> List[CacheFile]:
+    files = []
+    stack = [top]
+    while stack:
+        for entry in fs.list_dir_entries(stack.pop()):
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                files.append(_make_cache_file(entry))
+    return files
+
+
+def _make_cache_file(entry) -> CacheFile:
+    st = entry.stat(follow_symlinks=False)
+    return CacheFile(entry.path, st.st_size, max(st.st_atime, st.st_mtime))
+
+
+def prune(files: List[CacheFile], max_size: int, dry_run=False) -> Tuple[int, int]:
+    """
+    Remove the least recently accessed files until the total size is under max_size.
+    Returns the number and total size of removed files.
+    """
+    total = sum(f.size for f in files)
+    evicted = []
+    for file in sorted(files, key=lambda f: f.atime):
+        if total <= max_size:
+            break
+        evicted.append(file)
+        total -= file.size
+    if not dry_run:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            evicted = [f for f, ok in zip(evicted, executor.map(_remove, evicted)) if ok]
+    return len(evicted), sum(f.size for f in evicted)
+
+
+def _remove(file: CacheFile) -> bool:
+    try:
+        os.remove(file.path)
+        return True
+    except OSError:
+        return False
+
+
+def age_histogram(files: List[CacheFile]) -> List[Tuple[str, int, int]]:
+    """Returns a list of (label, file count, total size) of each age bucket."""
+    now = time.time()
+    counts = [0] * len(AGE_BUCKETS)
+    sizes = [0] * len(AGE_BUCKETS)
+    for file in files:
+        age = (now - file.atime) / 86400
+        for i, (days, _) in enumerate(AGE_BUCKETS):
+            if age < days:
+                counts[i] += 1
+                sizes[i] += file.size
+                break
+    return [(label, counts[i], sizes[i]) for i, (_, label) in enumerate(AGE_BUCKETS)]
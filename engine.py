@@ -50,8 +50,7 @@ class Engine:
 
     def version_string(self):
         """String form of the version."""
-        ver = self.version
-        return f"{ver['MajorVersion']}.{ver['MinorVersion']}.{ver['PatchVersion']}"
+        return version_string(self.version)
 
 
 def find_source_builds() -> list:
@@ -132,3 +131,8 @@ def parse_version(engine_root) -> Tuple[dict, int]:
     with open(os.path.join(engine_root, 'Engine/Build/Build.version'), encoding='utf8') as f:
         version = json.load(f)
         return version, int(version['MajorVersion'])
+
+
+def version_string(version: dict) -> str:
+    """String form of a version parsed by parse_version."""
+    return f"{version['MajorVersion']}.{version['MinorVersion']}.{version['PatchVersion']}"
@@ -0,0 +1,108 @@
+"""
+Parallel file hashing with a cache in the user cache directory.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+
+from typing import Dict, NamedTuple
+
+import constants
+
+# The cache files are outside of the hashed directories, which may be read only or shipped.
+CACHE_DIR = os.path.join(constants.CACHE_DIR, 'hashes')
+_CHUNK_SIZE = 1024 * 1024
+
+
+class FileHash(NamedTuple):
+    """Hash of a file."""
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def hash_file(path) -> str:
+    """Hash a file in streaming chunks."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_tree(root, max_workers=None) -> Dict[str, FileHash]:
+    """
+    Hash all files under the root directory in parallel.
+    Hashes of files whose size and mtime are unchanged are reused from the cache.
+    Returns a dict of relative path (with '/' as separator) -> FileHash.
+    """
+    cache = _load_cache(root)
+    result = {}
+    to_hash = {}
+    for path, st in _walk_files(root):
+        relpath = os.path.relpath(path, root).replace(os.sep, '/')
+        cached = cache.get(relpath)
+        if cached and cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+            result[relpath] = cached
+        else:
+            to_hash[relpath] = (path, st)
+
+    if to_hash:
+        # Hashing is mostly IO bound and hashlib releases the GIL, so threads are enough.
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) * 2)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {relpath: executor.submit(hash_file, path) for relpath, (path, _) in to_hash.items()}
+            for relpath, future in futures.items():
+                st = to_hash[relpath][1]
+                result[relpath] = FileHash(st.st_size, st.st_mtime_ns, future.result())
+        save_cache(root, result)
+    elif len(result) != len(cache):
+        save_cache(root, result)
+    return result
+
+
+def _walk_files(root):
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def cache_file(root) -> str:
+    """The cache file of the root directory, which is keyed by its absolute path."""
+    root = os.path.abspath(root)
+    key = hashlib.blake2b(root.encode('utf8'), digest_size=16).hexdigest()
+    return os.path.join(os.path.expanduser(CACHE_DIR), f'{key}.json')
+
+
+def _load_cache(root) -> Dict[str, FileHash]:
+    try:
+        with open(cache_file(root), encoding='utf8') as f:
+            cache = json.load(f)
+        if cache['root'] != os.path.abspath(root):
+            return {}
+        return {path: FileHash(*value) for path, value in cache['files'].items()}
+    except (OSError, ValueError, TypeError, KeyError):
+        return {}
+
+
+def save_cache(root, hashes: Dict[str, FileHash]):
+    """Save the hashes of files under the root directory into its cache file."""
+    path = cache_file(root)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump({'root': os.path.abspath(root),
+                       'files': {relpath: list(value) for relpath, value in hashes.items()}}, f)
+    except OSError:
+        # The cache is just an optimization.
+        pass
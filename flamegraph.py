@@ -0,0 +1,148 @@
+"""
+Fold the stacks of `perf script` output and render them as a flame graph.
+"""
+
+import collections
+import html
+import re
+import zlib
+
+from typing import Dict, Iterable, List, Tuple
+
+_FRAME_RE = re.compile(r'^\s*[0-9a-fA-F]+\s+(.+?)(?:\s+\((.*)\))?$')
+_OFFSET_RE = re.compile(r'\+0x[0-9a-fA-F]+$')
+
+# Layout of the SVG.
+_WIDTH = 1200
+_FRAME_HEIGHT = 16
+_FONT_SIZE = 12
+_FONT_WIDTH = 0.59  # Average character width relative to the font size.
+_MIN_WIDTH = 0.1  # Narrower frames are not drawn.
+_PADDING = 10
+_TITLE_HEIGHT = 30
+
+
+def fold_perf_script(lines: Iterable[str]) -> Dict[str, int]:
+    """
+    Fold the stacks in the `perf script` output lines, returns a dict of the ';' separated stack -> sample count.
+    The lines are consumed one by one, only the folded stacks are kept in memory.
+    """
+    stacks: Dict[str, int] = collections.Counter()
+    comm = ''
+    frames: List[str] = []
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line.strip():
+            if comm:
+                stacks[';'.join([comm] + frames[::-1])] += 1
+            comm = ''
+            frames = []
+        elif not line[0].isspace():
+            # The sample header, such as "UnrealServer 12345 [003] 1234.567890: 1010101 cycles:".
+            # The command name may contain spaces, it is followed by the pid.
+            comm = re.split(r'\s+\d+(?:/\d+)?\s', line, maxsplit=1)[0].strip() or line.split()[0]
+        else:
+            frames.append(_frame_name(line))
+    if comm:
+        stacks[';'.join([comm] + frames[::-1])] += 1
+    return stacks
+
+
+def _frame_name(line) -> str:
+    """Get the function name of a frame line, such as "  7f1234 FEngineLoop::Tick+0x12 (/path/libFoo.so)"."""
+    m = _FRAME_RE.match(line)
+    if not m:
+        return line.strip()
+    symbol, dso = m.group(1), m.group(2) or ''
+    if symbol == '[unknown]' and dso:
+        return f'[{dso.rsplit("/", 1)[-1]}]'
+    # ';' is the separator of the folded stack.
+    return _OFFSET_RE.sub('', symbol).replace(';', ':')
+
+
+def write_folded(path, stacks: Dict[str, int]):
+    """Write the stacks in the collapsed format, one "stack count" per line."""
+    with open(path, 'w', encoding='utf8') as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f'{stack} {count}\n')
+
+
+class _Node:
+    """A node of the merged call tree."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('children', 'count')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.count = 0
+
+
+def _build_tree(stacks: Dict[str, int]) -> _Node:
+    root = _Node()
+    for stack, count in stacks.items():
+        node = root
+        node.count += count
+        for frame in stack.split(';'):
+            node = node.children.setdefault(frame, _Node())
+            node.count += count
+    return root
+
+
+def _color(name) -> str:
+    """A stable warm color for the function name."""
+    h = zlib.crc32(name.encode())
+    return f'rgb({205 + h % 50},{(h >> 8) % 230},{(h >> 16) % 55})'
+
+
+def _layout(root: _Node, scale: float) -> Tuple[List[Tuple[str, int, float, float, int]], int]:
+    """Layout the frames, returns a list of (name, count, x, width, depth) and the max depth."""
+    frames = []
+    max_depth = 0
+    pending: List[Tuple[str, _Node, float, int]] = []
+    _push_children(pending, root, _PADDING, 1, scale)
+    while pending:
+        name, node, x, depth = pending.pop()
+        width = node.count * scale
+        if width < _MIN_WIDTH:
+            continue
+        frames.append((name, node.count, x, width, depth))
+        max_depth = max(max_depth, depth)
+        _push_children(pending, node, x, depth + 1, scale)
+    return frames, max_depth
+
+
+def _push_children(pending, node: _Node, x: float, depth: int, scale: float):
+    """Place the children of the node side by side from x, such as the stacks of the threads under the root."""
+    for name, child in sorted(node.children.items()):
+        pending.append((name, child, x, depth))
+        x += child.count * scale
+
+
+def render_svg(path, stacks: Dict[str, int], title='Flame Graph'):
+    """Render the stacks as a self-contained SVG flame graph, hover a frame to see its details."""
+    root = _build_tree(stacks)
+    total = max(root.count, 1)
+    frames, max_depth = _layout(root, (_WIDTH - 2 * _PADDING) / total)
+    height = _TITLE_HEIGHT + (max_depth + 1) * _FRAME_HEIGHT + _PADDING
+    with open(path, 'w', encoding='utf8') as f:
+        f.write(f'<?xml version="1.0" standalone="no"?>\n'
+                f'<svg version="1.1" width="{_WIDTH}" height="{height}" xmlns="http://www.w3.org/2000/svg">\n'
+                f'<rect x="0" y="0" width="{_WIDTH}" height="{height}" fill="#f8f8f8"/>\n'
+                f'<text x="{_WIDTH // 2}" y="20" font-size="16" font-family="Verdana" text-anchor="middle">'
+                f'{html.escape(title)}</text>\n')
+        for name, count, x, width, depth in frames:
+            y = height - _PADDING - depth * _FRAME_HEIGHT
+            f.write(_render_frame(name, f'{count} samples, {100.0 * count / total:.2f}%', x, y, width))
+        f.write('</svg>\n')
+
+
+def _render_frame(name, details, x, y, width) -> str:
+    """Render a frame as a SVG group of the tooltip, the box and the label if it fits."""
+    svg = (f'<g><title>{html.escape(name)} ({details})</title>'
+           f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{_FRAME_HEIGHT - 1}" fill="{_color(name)}" rx="2"/>')
+    chars = int(width / (_FONT_SIZE * _FONT_WIDTH))
+    if chars >= 3:
+        text = name if len(name) <= chars else name[:chars - 2] + '..'
+        svg += (f'<text x="{x + 3:.1f}" y="{y + _FRAME_HEIGHT - 4}" font-size="{_FONT_SIZE}" '
+                f'font-family="Verdana">{html.escape(text)}</text>')
+    return svg + '</g>\n'
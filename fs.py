@@ -2,13 +2,19 @@
 File system utility.
 """
 
+import concurrent.futures
 import fnmatch
 import os
 import pathlib
+import re
+import shutil
+import stat
 import subprocess
 import sys
+import threading
+import time
 
-from typing import List
+from typing import Dict, List
 
 import console
 
@@ -80,6 +86,36 @@ def _find_files_under_subdir(start_dir, subdir, patterns, relpath, **kwargs) ->
     return files
 
 
+SOURCE_SUFFIXES = ('.cpp', '.c', '.cc')
+HEADER_SUFFIXES = ('.h', '.hpp', '.inl')
+_INCLUDE_RE = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*["<]([^">]+)[">]', re.M)
+
+
+def find_including_sources(headers: List[str]) -> List[str]:
+    """Find source files in the same modules with the headers which include any of them directly."""
+    module_headers: Dict[str, List[str]] = {}
+    for header in headers:
+        build_file = find_file_bottom_up('*.Build.cs', os.path.dirname(header))
+        if build_file:
+            module_headers.setdefault(os.path.dirname(build_file), []).append('/' + header.replace('\\', '/'))
+
+    result = []
+    for module_dir, paths in module_headers.items():
+        sources = find_files_under(module_dir, ['*' + s for s in SOURCE_SUFFIXES], excluded_dirs=['Intermediate'])
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            for source, includes in zip(sources, executor.map(_parse_includes, sources)):
+                if any(path.endswith(include) for path in paths for include in includes):
+                    result.append(source)
+    return result
+
+
+def _parse_includes(path) -> List[str]:
+    """Returns the included paths in the source file, each one is prefixed with '/' for suffix matching."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return ['/' + m.decode('utf8', errors='replace').replace('\\', '/') for m in _INCLUDE_RE.findall(content)]
+
+
 def fnmatch_ifilter(names: List[str], pattern: str) -> List[str]:
     """Case insensitive fnmatch.filter."""
     pattern = case_insensitive(pattern)
@@ -128,6 +164,205 @@ def expand_source_files(files, engine_dir) -> list:
     return matched_files
 
 
+def find_plugin_dirs(root) -> List[str]:
+    """Find the directories of plugins under the root/Plugins directory."""
+    plugin_dirs = []
+    for plugin_root, subdirs, files in os.walk(os.path.join(root, 'Plugins')):
+        if any(f.endswith('.uplugin') for f in files):
+            plugin_dirs.append(plugin_root)
+            # Plugins are not nested.
+            subdirs.clear()
+    return plugin_dirs
+
+
+def list_dir_entries(path) -> List[os.DirEntry]:
+    """List the entries of the directory, empty if it can't be read."""
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+
+# ioctl request code of FICLONE on Linux.
+_FICLONE = 0x40049409
+_reflink_supported = True
+
+
+def clone_file(src, dst, hardlink=False) -> str:
+    """
+    Copy a file in the fastest way supported by the file system, the modification time is kept.
+    A reflink (copy on write clone) is tried first, then a hardlink if allowed, and a plain copy at last.
+    Returns the used method: 'reflink', 'hardlink' or 'copy'.
+    """
+    if _reflink(src, dst):
+        shutil.copystat(src, dst)
+        return 'reflink'
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def _reflink(src, dst) -> bool:
+    global _reflink_supported # pylint: disable=global-statement
+    if not _reflink_supported:
+        return False
+    if sys.platform.startswith('linux'):
+        import fcntl # pylint: disable=import-outside-toplevel
+        try:
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return True
+        except OSError:
+            # Not supported by the file system, or across file systems.
+            _reflink_supported = False
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+    if sys.platform == 'darwin':
+        import ctypes # pylint: disable=import-outside-toplevel
+        if ctypes.CDLL(None).clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0:
+            return True
+        _reflink_supported = False
+        return False
+    _reflink_supported = False
+    return False
+
+
+def merge_tree(src_dir, dst_dir) -> int:
+    """
+    Move files under src_dir into dst_dir, keeping the directory structure.
+    Files already existing in dst_dir are kept.
+    Returns the number of moved files.
+    """
+    moved = 0
+    for root, _, files in os.walk(src_dir):
+        target_dir = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for file in files:
+            target = os.path.join(target_dir, file)
+            if not os.path.exists(target):
+                os.replace(os.path.join(root, file), target)
+                moved += 1
+    return moved
+
+
+def remove_dirs_in_background(paths: List[str]) -> threading.Thread:
+    """
+    Remove directories in a background thread.
+    The thread is not a daemon, so the program will wait for it to finish before exiting.
+    """
+    def remove():
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+    thread = threading.Thread(target=remove, name='remove_dirs')
+    thread.start()
+    return thread
+
+
+# Directories moved into this directory are removed in background.
+TRASH_DIR = '.uct-trash'
+
+
+def move_to_trash(path, trash_dir) -> str:
+    """
+    Move a directory into the trash_dir atomically with a unique name, it must be on the same file system.
+    Returns the new path.
+    """
+    os.makedirs(trash_dir, exist_ok=True)
+    target = os.path.join(trash_dir, f'{os.path.basename(path)}-{os.getpid()}-{time.time_ns()}')
+    os.rename(path, target)
+    return target
+
+
+def remove_trees(paths: List[str], max_workers=None):
+    """
+    Remove directory trees in parallel, errors are ignored.
+    Files of each directory are removed by a separate task, then the empty directories are removed bottom up.
+    """
+    dirs = []
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) * 2)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_remove_files_in, path) for path in paths}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path, subdirs = future.result()
+                dirs.append(path)
+                pending |= {executor.submit(_remove_files_in, d) for d in subdirs}
+    # A directory is always completed after its parent, so the reversed order is bottom up.
+    for path in reversed(dirs):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def _remove_files_in(path):
+    """Remove files in the directory, returns the path and its subdirectories."""
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return path, subdirs
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if _is_junction(entry):
+                    # Remove the junction itself, don't touch its target.
+                    os.rmdir(entry.path)
+                else:
+                    subdirs.append(entry.path)
+                continue
+            _remove_file(entry.path)
+        except OSError:
+            pass
+    return path, subdirs
+
+
+def _is_junction(entry) -> bool:
+    if os.name != 'nt':
+        return False
+    attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+    return bool(attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except PermissionError:
+        if os.name != 'nt':
+            raise
+        # Read only files can't be removed on Windows.
+        os.chmod(path, stat.S_IWRITE)
+        os.remove(path)
+
+
+def remove_trees_detached(paths: List[str]) -> int:
+    """
+    Remove directory trees in a detached low priority process, which keeps running after this program exits.
+    Returns the pid of the process.
+    """
+    cmd = [sys.executable, '-c', 'import sys, fs; fs.remove_trees(sys.argv[1:])'] + paths
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = (subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP |
+                                   subprocess.BELOW_NORMAL_PRIORITY_CLASS)
+    else:
+        kwargs['start_new_session'] = True
+        kwargs['preexec_fn'] = lambda: os.nice(10)
+    # pylint: disable-next=consider-using-with
+    p = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+    return p.pid
+
+
 def reveal_file(path):
     """Open a file in system specific file explorer."""
     if _in_vscode():
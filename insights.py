@@ -0,0 +1,71 @@
+"""
+Unreal Insights trace capture support.
+"""
+
+import os
+import time
+
+from typing import List, NamedTuple
+
+# Traces are written into timestamped session directories under it, relative to the project or engine directory.
+TRACE_DIR = os.path.join('Saved', 'Traces', 'uct')
+TRACE_SUFFIX = '.utrace'
+# The channel preset of cpu, gpu, frame, log and bookmark.
+DEFAULT_CHANNELS = 'default'
+
+_SESSION_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class Session(NamedTuple):
+    """A directory of the traces captured by one command."""
+    path: str
+    time: float
+    files: List[str]
+    size: int
+
+
+def is_supported(engine_version: dict) -> bool:
+    """Whether the engine supports writing trace files, which is introduced in UE 4.26."""
+    return (engine_version['MajorVersion'], engine_version['MinorVersion']) >= (4, 26)
+
+
+def new_session_dir(root) -> str:
+    """Path of a new session directory with current time as its name."""
+    return os.path.join(root, TRACE_DIR, time.strftime(_SESSION_FORMAT))
+
+
+def trace_args(channels: str) -> List[str]:
+    """Command line arguments to capture the channels, the -tracefile argument is not included."""
+    # Named events of stats make the CPU track much more useful.
+    return [f'-trace={channels}', '-statnamedevents']
+
+
+def list_sessions(root) -> List[Session]:
+    """List the trace sessions under the root, sorted by time from old to new."""
+    sessions: List[Session] = []
+    trace_dir = os.path.join(root, TRACE_DIR)
+    if not os.path.isdir(trace_dir):
+        return sessions
+    for entry in os.scandir(trace_dir):
+        if not entry.is_dir():
+            continue
+        files = []
+        size = 0
+        for file in os.scandir(entry.path):
+            if file.name.endswith(TRACE_SUFFIX) and file.is_file():
+                files.append(file.path)
+                size += file.stat().st_size
+        sessions.append(Session(entry.path, entry.stat().st_mtime, sorted(files), size))
+    return sorted(sessions, key=lambda s: s.time)
+
+
+def sessions_to_prune(sessions: List[Session], keep: int, older_than_days: float = 0) -> List[Session]:
+    """
+    Select the sessions to remove from the sessions sorted from old to new.
+    The newest keep sessions are always kept, others are selected if they are older than older_than_days.
+    """
+    candidates = sessions[:max(0, len(sessions) - keep)]
+    if older_than_days > 0:
+        deadline = time.time() - older_than_days * 24 * 3600
+        candidates = [s for s in candidates if s.time < deadline]
+    return candidates
@@ -0,0 +1,196 @@
+"""
+Run multiple programs concurrently with multiplexed, prefixed output.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import console
+from utils import popen_in_new_group, terminate_process_group
+
+# Colors of the output prefixes, used in turn.
+PREFIX_COLORS = ('cyan', 'green', 'yellow', 'purple', 'blue', 'white')
+
+
+class ProcessGroup:
+    """
+    A group of processes run concurrently.
+    Output lines of each process are prefixed with its name and written to the console, and to its own log file
+    if the log directory is specified. All processes are terminated together when the group is shut down.
+    """
+
+    def __init__(self, log_dir: Optional[str] = None):
+        self.log_dir = log_dir
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._readers: List[threading.Thread] = []
+        self._terminated: Set[str] = set()
+        self._lock = threading.Lock()
+        self._width = 0
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+    def start(self, name: str, cmd: List[str], **kwargs) -> subprocess.Popen:
+        """Start a process with the unique name."""
+        assert name not in self._processes, name
+        p = popen_in_new_group(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors='replace', bufsize=1, **kwargs)
+        self._processes[name] = p
+        self._width = max(self._width, len(name))
+        color = PREFIX_COLORS[(len(self._processes) - 1) % len(PREFIX_COLORS)]
+        reader = threading.Thread(target=self._read_output, args=(name, p, color), daemon=True)
+        reader.start()
+        self._readers.append(reader)
+        return p
+
+    def _read_output(self, name, p: subprocess.Popen, color):
+        """Copy the output lines of the process to the console and its log file."""
+        log = None
+        if self.log_dir:
+            log = open(os.path.join(self.log_dir, name + '.log'), 'w', encoding='utf8') # pylint: disable=consider-using-with
+        try:
+            assert p.stdout
+            for line in p.stdout:
+                if log:
+                    log.write(line)
+                with self._lock:
+                    prefix = console.colored(f'[{name}]'.ljust(self._width + 2), color)
+                    sys.stdout.write(f'{prefix} {line.rstrip()}\n')
+                    sys.stdout.flush()
+        finally:
+            if log:
+                log.close()
+
+    @property
+    def processes(self) -> Dict[str, subprocess.Popen]:
+        """The started processes by name."""
+        return self._processes
+
+    def wait(self, primary: Optional[str] = None, interval=0.2,
+             on_poll: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+        """
+        Wait for all processes to exit, or the primary process exits then terminate the others.
+        Terminate all processes on Ctrl-C. Returns a dict of name -> exit code of the processes which exited
+        by themselves. on_poll is called every interval seconds while waiting.
+        """
+        try:
+            while any(p.poll() is None for p in self._processes.values()):
+                if primary and self._processes[primary].poll() is not None:
+                    console.info(f'{primary} exited, stop all others.')
+                    break
+                if on_poll:
+                    on_poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            console.warn('Interrupted, stop all processes.')
+        self.shutdown()
+        return {name: p.returncode for name, p in self._processes.items() if name not in self._terminated}
+
+    def shutdown(self):
+        """Terminate all running processes and wait for their output to be drained."""
+        for name, p in self._processes.items():
+            if p.poll() is None:
+                self._terminated.add(name)
+                terminate_process_group(p)
+        for reader in self._readers:
+            reader.join()
+
+
+def split_cpus(count: int) -> List[List[int]]:
+    """Split the CPUs available to this process into count contiguous sets, empty if not supported."""
+    if not hasattr(os, 'sched_getaffinity'):
+        return []
+    cpus = sorted(os.sched_getaffinity(0))
+    if count > len(cpus):
+        # Share the CPUs in turn if there are more instances than CPUs.
+        return [[cpus[i % len(cpus)]] for i in range(count)]
+    size, remainder = divmod(len(cpus), count)
+    sets = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < remainder else 0)
+        sets.append(cpus[start:end])
+        start = end
+    return sets
+
+
+class Usage(NamedTuple):
+    """Resource usage summary of a process."""
+    average_cpu: float  # In percent of one CPU.
+    peak_cpu: float
+    average_rss: int  # In bytes.
+    peak_rss: int
+    samples: int
+
+
+def read_process_usage(pid) -> Optional[Tuple[float, int]]:
+    """Read the (CPU seconds, RSS bytes) of a process from /proc, None if unavailable."""
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf8') as f:
+            # The command name field may contain spaces, the fields after it are split from the last ')'.
+            fields = f.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    # utime and stime are the 14th and 15th fields, rss is the 24th field, counted from 1.
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu_seconds, int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class UsageMonitor:
+    """Sample the CPU and RSS usage of the processes periodically, on Linux."""
+
+    def __init__(self, processes: Dict[str, subprocess.Popen], period=1.0):
+        self.processes = processes
+        self.period = period
+        self._last_time = 0.0
+        self._last_cpu: Dict[str, float] = {}
+        self._cpu: Dict[str, List[float]] = {name: [] for name in processes}
+        self._rss: Dict[str, List[int]] = {name: [] for name in processes}
+
+    def poll(self):
+        """Take a sample if the period is elapsed since the last one."""
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed < self.period:
+            return
+        self._last_time = now
+        for name, p in self.processes.items():
+            if p.poll() is not None:
+                continue
+            usage = read_process_usage(p.pid)
+            if usage is None:
+                continue
+            cpu_seconds, rss = usage
+            if name in self._last_cpu:
+                self._cpu[name].append(100.0 * (cpu_seconds - self._last_cpu[name]) / elapsed)
+            self._last_cpu[name] = cpu_seconds
+            self._rss[name].append(rss)
+
+    def summary(self) -> Dict[str, Usage]:
+        """Usage summary of each process which has samples."""
+        result = {}
+        for name in self.processes:
+            cpu, rss = self._cpu[name], self._rss[name]
+            if rss:
+                result[name] = Usage(sum(cpu) / len(cpu) if cpu else 0.0, max(cpu, default=0.0),
+                                     sum(rss) // len(rss), max(rss), len(rss))
+        return result
+
+
+def find_processes(executable) -> List[int]:
+    """Find the pids of the running processes of the executable, on Linux."""
+    executable = os.path.realpath(executable)
+    pids = []
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            if os.readlink(os.path.join(entry.path, 'exe')) == executable:
+                pids.append(int(entry.name))
+        except OSError:
+            continue
+    return pids
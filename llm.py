@@ -0,0 +1,131 @@
+"""
+Low-Level Memory Tracker (LLM) report support.
+
+With -LLM -LLMCSV, the engine writes the memory of each tag periodically into CSV files under Saved/Profiling/LLM,
+one row per sample and one column per tag, in MB, and an empty cell means 0.
+"""
+
+import csv
+import json
+import os
+
+from typing import Dict, List, NamedTuple
+
+LLM_DIR = os.path.join('Saved', 'Profiling', 'LLM')
+# Growth of the peak of a tag over the baseline which is considered as a regression, both must be exceeded.
+REGRESSION_RATIO = 0.05
+REGRESSION_MB = 1.0
+
+
+class TagStats(NamedTuple):
+    """The memory statistics of a tag in a report, in MB."""
+    peak: float
+    final: float
+    # From the first sample to the final one.
+    growth: float
+
+
+class Report(NamedTuple):
+    """A parsed LLM CSV file."""
+    path: str
+    samples: int
+    tags: Dict[str, TagStats]
+
+    @property
+    def kind(self) -> str:
+        """Such as LLM or LLMPlatform, the prefix of the file name, used to match the baseline."""
+        return os.path.basename(self.path).split('_', 1)[0]
+
+
+class TagDiff(NamedTuple):
+    """Change of the peak memory of a tag from the baseline."""
+    tag: str
+    base: float
+    new: float
+
+    @property
+    def delta(self) -> float:
+        """The absolute change in MB."""
+        return self.new - self.base
+
+    @property
+    def is_regression(self) -> bool:
+        """Whether the growth exceeds both the relative and the absolute tolerances."""
+        return self.delta > REGRESSION_MB and self.delta > self.base * REGRESSION_RATIO
+
+
+def memreport_args() -> List[str]:
+    """Command line arguments to write the LLM CSV files."""
+    return ['-LLM', '-LLMCSV']
+
+
+def list_reports(root) -> Dict[str, float]:
+    """List the LLM CSV files under the root, path -> modification time."""
+    llm_dir = os.path.join(root, LLM_DIR)
+    if not os.path.isdir(llm_dir):
+        return {}
+    return {entry.path: entry.stat().st_mtime for entry in os.scandir(llm_dir)
+            if entry.name.endswith('.csv') and entry.is_file()}
+
+
+def new_reports(root, before: Dict[str, float]) -> List[str]:
+    """Find the LLM CSV files which are created or modified since the listing before, sorted by path."""
+    # The modification time is compared with the listing rather than the clock, whose resolution may differ.
+    return sorted(path for path, mtime in list_reports(root).items() if before.get(path) != mtime)
+
+
+def load(path) -> Report:
+    """Load a LLM CSV file, the rows are processed one by one, only the statistics are kept in memory."""
+    with open(path, encoding='utf8', errors='replace', newline='') as f:
+        reader = csv.reader(f)
+        # The header is padded with spaces so that the engine can rewrite it when new tags are added.
+        tags = [name.strip() for name in next(reader, [])]
+        first: List[float] = []
+        peak: List[float] = []
+        last: List[float] = []
+        samples = 0
+        for row in reader:
+            values = [_parse_mb(cell) for cell in row[:len(tags)]]
+            if not values:
+                continue
+            values += [0.0] * (len(tags) - len(values))
+            if not samples:
+                first, peak = list(values), list(values)
+            else:
+                peak = [max(p, v) for p, v in zip(peak, values)]
+            last = values
+            samples += 1
+    stats = {tag: TagStats(peak[i], last[i], last[i] - first[i]) for i, tag in enumerate(tags) if tag and samples}
+    return Report(path, samples, stats)
+
+
+def _parse_mb(cell: str) -> float:
+    try:
+        return float(cell) if cell.strip() else 0.0
+    except ValueError:
+        return 0.0
+
+
+def compare(base: Dict[str, dict], report: Report) -> List[TagDiff]:
+    """Compare the peaks of the tags in the report with the baseline, sorted by the change from high to low."""
+    diffs = [TagDiff(tag, base[tag]['peak'] if tag in base else 0.0, stats.peak)
+             for tag, stats in report.tags.items()]
+    diffs += [TagDiff(tag, item['peak'], 0.0) for tag, item in base.items() if tag not in report.tags]
+    return sorted(diffs, key=lambda d: d.delta, reverse=True)
+
+
+def to_json(report: Report) -> Dict[str, dict]:
+    """The tag statistics of the report in the baseline format."""
+    return {tag: stats._asdict() for tag, stats in report.tags.items()}
+
+
+def load_baseline(path) -> Dict[str, Dict[str, Dict[str, dict]]]:
+    """Load the baseline saved by save_baseline, target -> report kind -> tag -> statistics."""
+    with open(path, encoding='utf8') as f:
+        return json.load(f)['memreports']
+
+
+def save_baseline(path, memreports: Dict[str, Dict[str, Dict[str, dict]]]):
+    """Save the tag statistics of the reports of the targets as JSON."""
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump({'memreports': memreports}, f, indent=2)
@@ -9,18 +9,39 @@ import json
 import os
 import re
 import shutil
+import signal
 import subprocess
 import sys
+import time
 
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
+import benchmark
 import command_line
+import compdb
 import constants
 import console
+import ddc
 import engine
+import filehash
+import flamegraph
 import fs
-
-from utils import subprocess_call, subprocess_run
+import insights
+import launcher
+import llm
+import module_graph
+import pak
+import perfcsv
+import pgo
+import projectfiles
+import seed
+import store
+import timetrace
+import vcs
+import watch
+
+from utils import format_size, popen_in_new_group, run_commands_parallel, subprocess_call, subprocess_run, \
+    subprocess_stream, terminate_process_group, total_memory
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'vendor'))
 import cutie # pylint: disable = wrong-import-order, wrong-import-position
@@ -30,6 +51,14 @@ import cutie # pylint: disable = wrong-import-order, wrong-import-position
 EXIT_COMMAND_NOT_FOUND = 127
 
 
+class PackJob(NamedTuple):
+    """Options to pack a target."""
+    target: str
+    archive_dir: str
+    skip_cook: bool = False
+    staging_dir: Optional[str] = None
+
+
 class UnrealCommandTool:
     """Unreal Command Line Tool."""
     def __init__(self, options, targets, extra_args):
@@ -75,6 +104,10 @@ class UnrealCommandTool:
             return False
         if options.command == 'list' and options.subcommand == 'engine':
             return False
+        if options.command in ('pak', 'perf', 'store'):
+            return False
+        if options.command == 'pack' and options.subcommand == 'diff':
+            return False
         return True
 
     def setup_linux_cross_tool(self):
@@ -127,8 +160,10 @@ class UnrealCommandTool:
         console.error(f"Error finding correct linux cross tools for the engine '{self.engine_dir}'")
         sys.exit(1)
 
-    def _find_project_file(self):
-        """Find the project file and engine root."""
+    def _find_project_file(self, from_dir=None):
+        """Find the project file from the from_dir or the current directory."""
+        if from_dir:
+            return fs.find_file_bottom_up('*.uproject', from_dir)
         project_file = os.environ.get('PROJECT_FILE')
         if not project_file:
             project_file = fs.find_file_bottom_up('*.uproject')
@@ -383,12 +418,128 @@ class UnrealCommandTool:
     def generate_project(self) -> int:
         """Handle the `generate project` command."""
         cmd = [self.ubt, '-ProjectFiles']
+        root = self.engine_dir
         if self.project_file and not self.options.engine:
             cmd.append(self._make_path_argument('-Project', self.project_file))
             cmd.append('-Game')
+            root = self.project_dir
         cmd += self.extra_args
+        settings = {
+            'engine': self.engine_root,
+            'engine version': json.dumps(self.engine_version, sort_keys=True),
+            'arguments': ' '.join(cmd),
+        }
+        installed = os.path.exists(os.path.join(self.engine_dir, 'Build', 'InstalledBuild.txt'))
+        # The engine modules are also in the project files of the game for a source engine.
+        engine_dir = self.engine_dir if root != self.engine_dir and not installed else None
+        inputs = projectfiles.fingerprint(root, settings, engine_dir)
+        if not self.options.force:
+            old_inputs = projectfiles.load(root)
+            changes = projectfiles.diff(old_inputs, inputs)
+            if not changes:
+                print('Project files are up to date, use --force to regenerate.')
+                return 0
+            if old_inputs:
+                limit = len(changes) if self.options.verbose else 10
+                print(f'Generate project files because {len(changes)} inputs changed:')
+                for change in changes[:limit]:
+                    print(f'  {change}')
+                if len(changes) > limit:
+                    print(f'  ... and {len(changes) - limit} more, use --verbose to show all.')
         print(' '.join(cmd))
-        return subprocess_call(cmd)
+        ret = subprocess_call(cmd)
+        if ret == 0:
+            projectfiles.save(root, inputs)
+        return ret
+
+    def generate_compdb(self) -> int:
+        """
+        Handle the `generate compdb` command.
+        Generate the compilation database for the targets, only changed modules are regenerated.
+        """
+        if not self.targets:
+            console.error('Missing targets, nothing to generate.')
+            return 1
+        graph = self._load_module_graph()
+        output = self.options.output or os.path.join(self.project_dir or self.engine_root, 'compile_commands.json')
+        module_files = []
+        for target in self.targets:
+            cache_dir = os.path.join(self.project_dir or self.engine_dir, 'Intermediate', 'uct', 'compdb',
+                                     f'{target}-{self.platform}-{self.config}')
+            os.makedirs(cache_dir, exist_ok=True)
+            modules = self._update_compdb_cache(graph, target, cache_dir)
+            if modules is None:
+                return 1
+            module_files += [os.path.join(cache_dir, m + '.json') for m in modules + [compdb.OTHER_MODULE]]
+        count = compdb.merge(os.path.abspath(output), module_files)
+        print(f'{count} entries are written to {output}')
+        return 0
+
+    def _update_compdb_cache(self, graph, target, cache_dir) -> Optional[list]:
+        """Regenerate the cached databases of changed modules of the target, returns the modules of the target."""
+        index = {} if self.options.force else compdb.load_index(cache_dir)
+        fingerprints: Dict[str, str] = {}
+        modules = graph.target_modules(target)
+        if modules is None:
+            console.warn(f"Can't find modules of {target}, regenerate the whole database.")
+        else:
+            fingerprints = compdb.module_fingerprints(
+                {m: graph.modules[m].path for m in modules if graph.modules[m].type != 'External'})
+        dirty = [m for m, fp in fingerprints.items() if index.get(m) != fp]
+        if modules is not None and not dirty:
+            print(f'Compilation database of {target} is up to date.')
+            return list(fingerprints)
+
+        result = self._generate_compdb(graph, target, cache_dir, dirty, len(fingerprints))
+        if result is None:
+            return None
+        entries, partial = result
+        if not partial:
+            for file in glob.glob(os.path.join(cache_dir, '*.json')):
+                os.remove(file)
+            if modules is None:
+                index = {m: '' for m in entries if m != compdb.OTHER_MODULE}
+            else:
+                # Such as the modules missed by the target modules, the index only has the fingerprinted ones.
+                entries = compdb.fold_unknown_modules(entries, fingerprints)
+                index = dict(fingerprints)
+            dirty = list(entries)
+        else:
+            index = {m: fp for m, fp in index.items() if m in fingerprints}
+            index.update((m, fingerprints[m]) for m in dirty)
+        for module in dirty:
+            compdb.save_module(cache_dir, module, entries.get(module, []))
+        compdb.save_index(cache_dir, index)
+        return list(index)
+
+    def _generate_compdb(self, graph, target, cache_dir, dirty, module_count) -> Optional[Tuple[dict, bool]]:
+        """
+        Run UBT to generate the compilation database of the target, only for the dirty modules if possible.
+        Returns the entries split by modules and whether it is partial, None if failed.
+        """
+        cmd = [self.ubt, '-Mode=GenerateClangDatabase', target, self.platform, self.config]
+        if self.project_file:
+            cmd.append(self._make_path_argument('-Project', self.project_file))
+        # UBT file filter rules are relative to the engine root, so only modules under it can be filtered.
+        module_dirs = [os.path.dirname(graph.modules[m].path) for m in dirty]
+        partial = (self.engine_major_version >= 5 and 0 < len(dirty) < module_count and
+                   all(d.startswith(os.path.join(self.engine_root, '')) for d in module_dirs))
+        if partial:
+            rules = [os.path.relpath(d, self.engine_root).replace('\\', '/') + '/...' for d in module_dirs]
+            cmd.append('-Filter=' + ';'.join(rules))
+            print(f'Generate compilation database of {target} for {len(dirty)} changed modules')
+        else:
+            print(f'Generate compilation database of {target}')
+        ubt_output_dir = self.engine_root
+        if self.engine_major_version >= 5:
+            ubt_output_dir = os.path.join(cache_dir, 'ubt')
+            cmd.append(self._make_path_argument('-OutputDir', ubt_output_dir))
+        ret = subprocess_call(cmd + self.extra_args)
+        if ret != 0:
+            console.error(f'Failed to generate compilation database of {target}.')
+            return None
+        with open(os.path.join(ubt_output_dir, 'compile_commands.json'), encoding='utf8') as f:
+            return compdb.split_entries(json.load(f), graph), partial
 
     def switch_engine(self):
         """Handle the `switch engine` command."""
@@ -545,6 +696,38 @@ class UnrealCommandTool:
 
         return 0
 
+    def list_module(self) -> int:
+        """Handle the `list module` command."""
+        graph = self._load_module_graph()
+        if self.raw_targets:
+            names = []
+            for pattern in self.raw_targets:
+                matched = fs.fnmatch_ifilter(list(graph.modules), pattern)
+                if not matched:
+                    console.error(f"Module '{pattern}' doesn't exist.")
+                    return 1
+                names += matched
+            if self.options.deps or self.options.rdeps:
+                related = set()
+                for name in names:
+                    related |= graph.dependencies(name) if self.options.deps else graph.dependents(name)
+                names = list(related)
+        else:
+            search_in_engine, search_in_project = self._get_search_scope()
+            names = [m.name for m in graph.modules.values()
+                     if (search_in_project and self.project_dir and m.path.startswith(self.project_dir)) or
+                     (search_in_engine and m.path.startswith(self.engine_dir))]
+        modules = sorted((graph.modules[n] for n in names if n in graph.modules), key=lambda m: m.name)
+        if self.options.verbose:
+            print(f'{"Type":20}{"Name":40}{"Path"}')
+            print('-' * 120)
+            for m in modules:
+                print(f'{m.type:20}{m.name:40}{m.path}')
+        else:
+            for m in modules:
+                print(m.name)
+        return 0
+
     def _print_targets(self, targets):
         if self.options.verbose:
             print(f'{"Type":10}{"Name":32}{"Path"}')
@@ -666,31 +849,94 @@ class UnrealCommandTool:
         Handle the `build` command.
         Build the specified targets.
         """
-        if not self.targets:
+        targets = self.targets
+        if not targets and self.options.affected and self.project_dir:
+            targets = [t['Name'] for t in self.project_targets]
+        if not targets:
             console.error('Missing targets, nothing to build.')
             return 1
+        if self.options.pgo:
+            return self._build_pgo(targets, is_rebuild)
+        if self.options.watch:
+            return self._build_watch(targets)
+        return self._build_once(targets, is_rebuild)
+
+    def _build_once(self, targets, is_rebuild) -> int:
+        """Build the targets once, only the specified files or the affected modules if required."""
+        files = self._find_files_to_build()
+        if files is None:
+            return 1
+        if self.options.changed and not files:
+            return 0
+        target_modules = None
+        if self.options.affected:
+            target_modules = self._find_affected_modules(targets)
+            if target_modules is None:
+                return 1
+            if not target_modules:
+                return 0
+        start_time = time.time()
+        returncode = self._build_targets(targets, files, target_modules, is_rebuild)
+        if self.options.time_trace:
+            self._report_time_traces(start_time)
+        return returncode
+
+    def _find_files_to_build(self) -> Optional[list]:
+        """Find the source files to compile specified by --files and --changed, None if failed."""
+        files = []
+        if self.options.files:
+            files = self._expand_files(self.options.files)
+            if not files:
+                console.error(f"Can't find {self.options.files}")
+                return None
+        if self.options.changed:
+            try:
+                changed_files = self._find_changed_source_files(self.options.base)
+            except vcs.VcsError as e:
+                console.error(str(e))
+                return None
+            if not changed_files and not files:
+                print(f'No source file is changed since {self.options.base}.')
+            files += [f for f in changed_files if f not in files]
+        return files
+
+    def _find_affected_modules(self, targets) -> Optional[Dict[str, list]]:
+        """
+        Find the modules of each target which are affected by the changed files, None if failed.
+        Returns an empty dict if no module is affected.
+        """
+        try:
+            changed_files = self._find_changed_files(self.options.base)
+        except vcs.VcsError as e:
+            console.error(str(e))
+            return None
+        graph = self._load_module_graph()
+        affected_modules = graph.affected_modules(changed_files)
+        if not affected_modules:
+            print(f'No module is affected by the changes since {self.options.base}.')
+            return {}
+        return {target: self._affected_modules_in_target(graph, target, affected_modules) for target in targets}
+
+    def _build_targets(self, targets, files, target_modules, is_rebuild) -> int:
+        """Build the targets one by one, only the affected modules of each target if target_modules is not None."""
         returncode = 0
-        cmd_base = [self.ubt, self.platform, self.config]
-        if is_rebuild:
-            cmd_base.append('-Rebuild')
-        if self.project_file:
-            cmd_base.append(self._make_path_argument('-Project', self.project_file))
         failed_targets = []
-        for target in self.targets:
+        for target in targets:
+            modules = self.options.modules or []
+            if target_modules is not None:
+                modules = target_modules[target]
+                if not modules:
+                    print(f'{target} is not affected.')
+                    continue
             action = 'Rebuild' if is_rebuild else 'Build'
             print(f'{action} {target}')
-            cmd = cmd_base + [target]
-            if self.options.files:
-                files = self._expand_files(self.options.files)
-                if not files:
-                    console.error(f"Can't find {self.options.files}")
-                    return 1
+            if files:
                 console.info(f'Compile file {files} for {target}')
-                cmd += [self._make_path_argument('-SingleFile', f) for f in files]
-            if self.options.modules:
-                console.info(f'Build module {self.options.modules} for {target}')
-                cmd += [self._make_path_argument('-Module', m) for m in self.options.modules]
-            cmd += self.extra_args
+            if modules:
+                console.info(f'Build module {modules} for {target}')
+            cmd = self._make_build_cmd(target, files, modules, is_rebuild)
+            if self.options.time_trace:
+                cmd += timetrace.build_args()
             ret = subprocess_call(cmd)
             if ret != 0:
                 # Use first failed exitcode
@@ -700,9 +946,233 @@ class UnrealCommandTool:
             console.error(f'Failed to build {" ".join(failed_targets)}.')
         return returncode
 
+    def _report_time_traces(self, start_time):
+        """Aggregate the time trace files written by the build since the start time and print the report."""
+        # The object files of plugins are under their own Intermediate directories.
+        roots = [root for root in (self.project_dir, self.engine_dir) if root]
+        roots += [plugin_dir for root in roots for plugin_dir in fs.find_plugin_dirs(root)]
+        dirs = [os.path.join(root, 'Intermediate', 'Build', self.platform) for root in roots]
+        files = timetrace.find_traces(dirs, start_time)
+        if files:
+            print(f'Aggregating {len(files)} JSON files')
+        report = timetrace.aggregate(files)
+        if not report.units:
+            console.warn('No time trace file is written, is the toolchain clang and anything compiled?')
+            return
+        print_time_trace_report(report, self.options.time_trace_top)
+
+    def _make_build_cmd(self, target, files=(), modules=(), is_rebuild=False) -> list:
+        cmd = [self.ubt, self.platform, self.config]
+        if is_rebuild:
+            cmd.append('-Rebuild')
+        if self.project_file:
+            cmd.append(self._make_path_argument('-Project', self.project_file))
+        cmd.append(target)
+        cmd += [self._make_path_argument('-SingleFile', f) for f in files]
+        cmd += [self._make_path_argument('-Module', m) for m in modules]
+        cmd += self.extra_args
+        return cmd
+
+    def _build_pgo(self, targets, is_rebuild) -> int:
+        """Run a step of the profile-guided optimization workflow for the target."""
+        if len(targets) != 1 or not self.project_dir:
+            console.error('--pgo requires exactly one target of the project.')
+            return 1
+        target = targets[0]
+        name = pgo.profile_name(target, self.platform, self.config)
+        raw_dir = pgo.profraw_dir(self.project_dir, name)
+        profdata = pgo.profdata_path(self.project_dir, self.platform, name)
+        # The benchmark result of the regular binary, to be compared with the optimized one.
+        baseline_file = os.path.join(self.project_dir, pgo.PROFRAW_DIR, name + '.baseline.json')
+        if self.options.pgo == 'collect':
+            return self._collect_pgo_profile(target, raw_dir, profdata)
+        if self.options.pgo == 'instrument':
+            baseline = self._benchmark_pgo_workload(target)
+            if baseline:
+                os.makedirs(os.path.dirname(baseline_file), exist_ok=True)
+                benchmark.save_results(baseline_file, [baseline])
+            elif os.path.exists(baseline_file):
+                os.remove(baseline_file)
+            # The raw profiles of the previous instrumented binary are stale.
+            shutil.rmtree(raw_dir, ignore_errors=True)
+            flag = '-PGOProfile'
+        else:
+            if not os.path.exists(profdata):
+                console.error(f"{profdata} doesn't exist, please run `--pgo collect` first.")
+                return 1
+            flag = '-PGOOptimize'
+        print(f'{"Rebuild" if is_rebuild else "Build"} {target} with {flag}')
+        ret = subprocess_call(self._make_build_cmd(target, is_rebuild=is_rebuild) + [flag])
+        if ret != 0:
+            console.error(f'Failed to build {target}.')
+            return ret
+        if self.options.pgo == 'optimize':
+            self._report_pgo_benchmark(target, baseline_file)
+        return 0
+
+    def _collect_pgo_profile(self, target, raw_dir, profdata) -> int:
+        """Run the workload with the instrumented binary, and merge all raw profiles collected so far."""
+        llvm_profdata = shutil.which('llvm-profdata')
+        if not llvm_profdata:
+            console.error("Can't find llvm-profdata, please add the directory of it to PATH.")
+            return EXIT_COMMAND_NOT_FOUND
+        workload = pgo.load_workload(constants.CONFIG_FILE_PATH, target) or []
+        cmd = self._make_run_cmd(target, args=workload + self.extra_args)
+        if not cmd:
+            return EXIT_COMMAND_NOT_FOUND
+        os.makedirs(raw_dir, exist_ok=True)
+        print(f'Run {" ".join(cmd)}')
+        ret = subprocess_call(cmd, env=dict(os.environ, LLVM_PROFILE_FILE=os.path.join(raw_dir, pgo.PROFRAW_PATTERN)))
+        if ret != 0:
+            console.warn(f'{target} exited with code {ret}.')
+        raw_files = sorted(glob.glob(os.path.join(raw_dir, '*' + pgo.PROFRAW_SUFFIX)))
+        if not raw_files:
+            console.error(f'No raw profile is written into {raw_dir}, is {target} built with `--pgo instrument`?')
+            return ret or 1
+        os.makedirs(os.path.dirname(profdata), exist_ok=True)
+        ret = subprocess_call(pgo.merge_cmd(llvm_profdata, profdata, raw_files))
+        if ret != 0:
+            console.error('Failed to merge the raw profiles.')
+            return ret
+        print(f'Profile: {profdata}, merged from {len(raw_files)} raw profiles')
+        return 0
+
+    def _benchmark_pgo_workload(self, target) -> Optional[dict]:
+        """Benchmark the current binary of the target with the configured workload, None if unable to."""
+        workload = pgo.load_workload(constants.CONFIG_FILE_PATH, target)
+        if workload is None:
+            console.info(f'No PGO workload of {target} is configured in {constants.CONFIG_FILE_PATH}, '
+                         'skip benchmarking.')
+            return None
+        executable = self._full_path_of_target(target)
+        if not executable or not os.path.exists(executable):
+            console.info(f'{target} is not built, skip benchmarking.')
+            return None
+        cmd = self._make_run_cmd(target, args=workload)
+        samples = self._run_benchmark({target: cmd}, self.options.pgo_runs)
+        if not samples:
+            return None
+        result = benchmark.make_result(target, cmd, [{m: getattr(s, m) for m in benchmark.METRICS}
+                                                     for s in samples[target]])
+        print_bench_result(result)
+        return result
+
+    def _report_pgo_benchmark(self, target, baseline_file):
+        """Benchmark the optimized binary and compare it with the regular one benchmarked before instrumenting."""
+        result = self._benchmark_pgo_workload(target)
+        if not result:
+            return
+        if not os.path.exists(baseline_file):
+            console.info('No benchmark result of the regular binary to compare with.')
+            return
+        baseline = benchmark.load_results(baseline_file)[0]
+        title = 'regular vs PGO optimized'
+        print_bench_comparison(title, benchmark.compare(baseline, result))
+
+    def _build_watch(self, targets) -> int:
+        """
+        Watch the source files of the project, build the targets when they are changed.
+        An in-flight build is cancelled when new changes arrive.
+        """
+        if self.options.time_trace:
+            console.error("--time-trace can't be used with --watch.")
+            return 1
+        if not self.project_dir:
+            console.error('not in project directory')
+            return 1
+        dirs = [os.path.join(self.project_dir, d) for d in ('Source', 'Plugins')]
+        dirs = [d for d in dirs if os.path.isdir(d)]
+        suffixes = fs.SOURCE_SUFFIXES + fs.HEADER_SUFFIXES + ('.cs', '.uplugin')
+        watcher = watch.create_watcher(dirs, suffixes)
+        print(f'Watching {" ".join(dirs)} by {watcher.kind}, press Ctrl-C to stop.')
+        # Changed files which are not built successfully yet.
+        unbuilt: Set[str] = set()
+        commands: List[Tuple[str, list]] = []
+        process = None
+        try:
+            while True:
+                watcher, changes = watch.wait_changes(watcher, 0.2 if process or commands else None,
+                                                      self.options.debounce)
+                if changes:
+                    unbuilt |= changes
+                    if process:
+                        console.warn('Files are changed, cancel the running build.')
+                        terminate_process_group(process)
+                        process = None
+                    commands = [(t, self._make_watch_build_cmd(t, unbuilt)) for t in targets]
+                if process and process.poll() is not None:
+                    if process.returncode != 0:
+                        console.error(f'Build failed with exit code {process.returncode}, waiting for changes.')
+                        commands = []
+                    elif not commands:
+                        unbuilt.clear()
+                        console.info('Build succeeded, waiting for changes.')
+                    process = None
+                if not process and commands:
+                    target, cmd = commands.pop(0)
+                    print(f'Build {target} for {len(unbuilt)} changed files')
+                    process = popen_in_new_group(cmd)
+        except KeyboardInterrupt:
+            if process:
+                terminate_process_group(process)
+        finally:
+            watcher.close()
+        return 0
+
+    def _make_watch_build_cmd(self, target, changes) -> list:
+        """Compile the changed files with -SingleFile if there are only a few source files, otherwise build all."""
+        sources = [f for f in changes if f.endswith(fs.SOURCE_SUFFIXES) and os.path.isfile(f)]
+        if sources and len(sources) == len(changes) and len(sources) <= self.options.single_file_limit:
+            return self._make_build_cmd(target, files=sorted(sources))
+        return self._make_build_cmd(target, modules=self.options.modules or ())
+
+    def _affected_modules_in_target(self, graph, target, affected_modules) -> list:
+        """The affected modules which can be built in the target."""
+        target_modules = graph.target_modules(target)
+        if target_modules is None:
+            console.warn(f"Can't find modules of {target}, build all affected modules.")
+            target_modules = affected_modules
+        modules = affected_modules & target_modules
+        if self.options.modules:
+            modules &= set(self.options.modules)
+        return sorted(m for m in modules if graph.modules[m].type != 'External')
+
     def _expand_files(self, files) -> list:
         return fs.expand_source_files(files, self.engine_dir)
 
+    def _find_changed_source_files(self, base) -> list:
+        """
+        Find source files changed since the base revision in the project and engine repositories.
+        Changed headers are replaced with the source files including them in the same module.
+        """
+        changed = self._find_changed_files(base)
+        sources = [f for f in changed if f.endswith(fs.SOURCE_SUFFIXES)]
+        headers = [f for f in changed if f.endswith(fs.HEADER_SUFFIXES)]
+        if headers:
+            sources += [f for f in fs.find_including_sources(headers) if f not in sources]
+        return sources
+
+    def _find_changed_files(self, base) -> list:
+        """Find files changed since the base revision in the project and engine repositories."""
+        search_in_engine, search_in_project = self._get_search_scope()
+        repo_dirs = []
+        if search_in_project:
+            repo_dirs.append(self.project_dir)
+        if search_in_engine:
+            repo_dirs.append(self.engine_root)
+        changed = []
+        for repo_dir in repo_dirs:
+            if not vcs.is_repo(repo_dir):
+                continue
+            for path in vcs.changed_files(repo_dir, base):
+                path = os.path.normpath(os.path.join(repo_dir, path))
+                if path not in changed and 'Intermediate' not in path.split(os.sep):
+                    changed.append(path)
+        return changed
+
+    def _load_module_graph(self) -> module_graph.ModuleGraph:
+        return module_graph.load(self.engine_dir, self.project_file)
+
     def rebuild(self) -> int:
         """Rebuild targets."""
         return self.build(True)
@@ -712,6 +1182,11 @@ class UnrealCommandTool:
         Handle the `clean` command.
         Clean the specified targets.
         """
+        if self.options.purge:
+            return self._purge()
+        if self.options.intermediate or self.options.binaries or self.options.saved:
+            console.error('--intermediate, --binaries and --saved take effect only with --purge.')
+            return 1
         if not self.targets:
             console.error('Missing targets, nothing to clean.')
             return 1
@@ -733,6 +1208,127 @@ class UnrealCommandTool:
             console.error(f'Failed to clean {" ".join(failed_targets)}.')
         return returncode
 
+    def _purge(self) -> int:
+        """
+        Move the build output directories into the trash directory atomically, then remove the trash directories
+        in a background process, so the next build can start immediately.
+        """
+        kinds = [k for k in ('intermediate', 'binaries', 'saved') if getattr(self.options, k)]
+        kinds = kinds or ['intermediate', 'binaries']
+        roots = {}
+        if self.project_dir and (self.options.project or not self.options.engine):
+            roots[self.project_dir] = self._dirs_to_purge(self.project_dir, kinds)
+        if self.options.engine or not self.project_dir:
+            if os.path.exists(os.path.join(self.engine_dir, 'Build', 'InstalledBuild.txt')):
+                console.error("Can't purge an installed engine.")
+                return 1
+            if 'binaries' in kinds:
+                # Engine/Binaries contains checked in files, such as ThirdParty libraries.
+                console.warn('Binaries of the engine are not purged, use `clean` with targets instead.')
+            roots[self.engine_dir] = self._dirs_to_purge(self.engine_dir, [k for k in kinds if k != 'binaries'])
+
+        trash_dirs = []
+        for root, dirs in roots.items():
+            trash_dir = os.path.join(root, fs.TRASH_DIR)
+            for path in dirs:
+                try:
+                    fs.move_to_trash(path, trash_dir)
+                    print(f'Purge {path}')
+                except OSError as e:
+                    console.warn(f"Can't move '{path}' to the trash: {e}")
+            # Also remove leftovers of previous purges.
+            if os.path.isdir(trash_dir):
+                trash_dirs.append(trash_dir)
+        if not trash_dirs:
+            print('Nothing to purge.')
+            return 0
+
+        if self.options.wait:
+            start = time.monotonic()
+            fs.remove_trees(trash_dirs)
+            print(f'Removed in {time.monotonic() - start:.1f}s.')
+        else:
+            pid = fs.remove_trees_detached(trash_dirs)
+            print(f'Removing in background, pid {pid}.')
+        return 0
+
+    def _dirs_to_purge(self, root, kinds) -> list:
+        """Existing output directories of the kinds under the root directory and its plugins."""
+        dirs = [os.path.join(root, kind.capitalize()) for kind in kinds]
+        plugin_kinds = [kind.capitalize() for kind in kinds if kind != 'saved']
+        for plugin_dir in fs.find_plugin_dirs(root):
+            dirs += [os.path.join(plugin_dir, kind) for kind in plugin_kinds]
+        return [d for d in dirs if os.path.isdir(d)]
+
+    def seed(self) -> int:
+        """
+        Handle the `seed` command.
+        Copy the build artifacts from another work tree of the same project.
+        """
+        if not self.project_file:
+            console.error('not in project directory')
+            return 1
+        src_dir = self._find_seed_source()
+        if not src_dir:
+            return 1
+
+        dirs = ['Binaries', os.path.join('Intermediate', 'Build')]
+        for plugin_dir in fs.find_plugin_dirs(src_dir):
+            plugin_dir = os.path.relpath(plugin_dir, src_dir)
+            dirs += [os.path.join(plugin_dir, 'Binaries'), os.path.join(plugin_dir, 'Intermediate', 'Build')]
+        dirs = [d for d in dirs if os.path.isdir(os.path.join(src_dir, d))]
+        existing = [d for d in dirs if os.path.exists(os.path.join(self.project_dir, d))]
+        if existing:
+            if not self.options.force:
+                console.error(f'{", ".join(existing)} already exist, use --force to replace them.')
+                return 1
+            trash_dir = os.path.join(self.project_dir, fs.TRASH_DIR)
+            for d in existing:
+                fs.move_to_trash(os.path.join(self.project_dir, d), trash_dir)
+            fs.remove_trees_detached([trash_dir])
+        self._seed_dirs(src_dir, dirs)
+
+        receipts = fs.find_files_under(os.path.join(self.project_dir, 'Binaries'), ['*.target'])
+        for receipt in sorted(receipts):
+            with open(receipt, encoding='utf8') as f:
+                info = json.load(f)
+            print(f"Seeded {info['TargetName']} {info['Platform']} {info['Configuration']}")
+        return 0
+
+    def _find_seed_source(self) -> Optional[str]:
+        """Find the source project directory to seed from, None if it is not the same project."""
+        src_project_file = self._find_project_file(self.options.source)
+        if not src_project_file:
+            console.error(f"Can't find project in '{self.options.source}'.")
+            return None
+        src_dir = os.path.dirname(src_project_file)
+        if os.path.samefile(src_dir, self.project_dir):
+            console.error("Can't seed from the project itself.")
+            return None
+        if os.path.basename(src_project_file) != os.path.basename(self.project_file):
+            console.error(f"'{src_project_file}' is not the same project with '{self.project_file}'.")
+            return None
+        if self._find_engine(src_project_file) != self.engine_root:
+            console.error(f"'{src_project_file}' is not associated with the same engine.")
+            return None
+        return src_dir
+
+    def _seed_dirs(self, src_dir, dirs):
+        """Copy the dirs from the source project and fix up the paths and modification times."""
+        start = time.monotonic()
+        methods: Dict[str, int] = {}
+        patched = 0
+        for d in dirs:
+            print(f'Seed {d}')
+            dst = os.path.join(self.project_dir, d)
+            for method, count in seed.copy_tree(os.path.join(src_dir, d), dst, self.options.hardlink).items():
+                methods[method] = methods.get(method, 0) + count
+            patched += seed.patch_paths(dst, src_dir, self.project_dir)
+        synced = seed.sync_source_mtimes(src_dir, self.project_dir)
+        print(f'Copied {", ".join(f"{n} files by {m}" for m, n in methods.items()) or "nothing"}, '
+              f'patched {patched} files, synchronized modification times of {synced} source files '
+              f'in {time.monotonic() - start:.1f}s.')
+
     def run(self) -> int:
         """
         Handle the `run` command.
@@ -741,34 +1337,304 @@ class UnrealCommandTool:
         if not self.targets:
             console.error('Missing targets, nothing to run.')
             return 1
+        if self.options.primary and self.options.primary not in self.targets:
+            console.error(f'Primary target {self.options.primary} is not in the targets to run.')
+            return 1
+        if self.options.perf:
+            return self._run_perf()
+        trace_dir = self._new_trace_dir()
+        if trace_dir is None:
+            return 1
+        if self.options.parallel or self.options.primary or self.options.instances > 1:
+            return self._run_parallel(trace_dir)
+        return self._run_sequential(trace_dir)
+
+    def _run_sequential(self, trace_dir) -> int:
+        """Run the targets one by one, collect the memory reports of them if required."""
+        memreport_baseline = self._load_memreport_baseline()
+        if memreport_baseline is None:
+            return 1
         returncode = 0
         failed_targets = []
+        memreports: Dict[str, List[llm.Report]] = {}
         for target in self.targets:
-            executable = self._full_path_of_target(target)
-            if not executable or not os.path.exists(executable):
-                if executable:
-                    console.error(f"{executable} doesn't exist, please build it first.")
+            cmd = self._make_run_cmd(target)
+            if not cmd:
                 returncode = EXIT_COMMAND_NOT_FOUND
                 continue
-            cmd = [executable]
-            if self._is_project_target(target):
-                info = self._get_target_info(target, None, None)
-                assert info
-                if info['TargetType'] != 'Program' and self.project_file:
-                    cmd.append(self._make_path_argument('-Project', self.project_file))
-            cmd += self.extra_args
+            cmd += self._make_trace_args(trace_dir, target)
+            if self.options.memreport:
+                cmd += llm.memreport_args()
             print(f'Run {" ".join(cmd)}')
             if self.options.dry_run:
                 continue
+            reports_before = llm.list_reports(self._memreport_root()) if self.options.memreport else {}
             ret = subprocess_call(cmd)
             if ret != 0:
                 # Use first failed exitcode
                 returncode = returncode or ret
                 failed_targets.append(target)
+            if self.options.memreport:
+                memreports[target] = self._collect_memreports(reports_before)
         if failed_targets:
             console.error(f'Failed to run {" ".join(failed_targets)}.')
+        self._report_traces(trace_dir)
+        if memreports and not self._report_memory(memreports, memreport_baseline):
+            returncode = returncode or 1
         return returncode
 
+    def _load_memreport_baseline(self) -> Optional[dict]:
+        """Load the baseline of the memory reports if specified, None if failed."""
+        if not self.options.memreport_baseline:
+            return {}
+        try:
+            return llm.load_baseline(self.options.memreport_baseline)
+        except (OSError, ValueError, KeyError) as e:
+            console.error(f"Can't load memory report baseline {self.options.memreport_baseline}: {e}")
+            return None
+
+    def _memreport_root(self) -> str:
+        return self.project_dir or self.engine_dir
+
+    def _collect_memreports(self, reports_before: Dict[str, float]) -> List[llm.Report]:
+        """Load the LLM CSV files written since the listing before the run."""
+        root = self._memreport_root()
+        files = llm.new_reports(root, reports_before)
+        if not files:
+            console.warn(f'No LLM CSV file is written into {os.path.join(root, llm.LLM_DIR)}.')
+        return [llm.load(file) for file in files]
+
+    def _report_memory(self, memreports: Dict[str, List[llm.Report]], baseline: dict) -> bool:
+        """Print the memory reports and their differences from the baseline, returns False if any tag regresses."""
+        ok = True
+        for target, reports in memreports.items():
+            for report in reports:
+                print_memreport(report)
+                base = baseline.get(target, {}).get(report.kind)
+                if base is None:
+                    continue
+                diffs = llm.compare(base, report)
+                print_memreport_diffs(diffs)
+                regressions = [d.tag for d in diffs if d.is_regression]
+                if regressions:
+                    console.error(f'Memory of {len(regressions)} tags of {target} regresses: {", ".join(regressions)}.')
+                    ok = False
+        if self.options.memreport_output:
+            data = {target: {r.kind: llm.to_json(r) for r in reports} for target, reports in memreports.items()}
+            llm.save_baseline(self.options.memreport_output, data)
+            print(f'Memory reports are written to {self.options.memreport_output}')
+        return ok
+
+    def _run_perf(self) -> int:
+        """Profile the target with perf, then generate the folded stacks and the flame graph."""
+        if not sys.platform.startswith('linux') or not shutil.which('perf'):
+            console.error('--perf requires perf on Linux.')
+            return EXIT_COMMAND_NOT_FOUND
+        if len(self.targets) != 1:
+            console.error('--perf requires exactly one target.')
+            return 1
+        target = self.targets[0]
+        cmd = self._make_run_cmd(target)
+        if not cmd:
+            return EXIT_COMMAND_NOT_FOUND
+        output_dir = os.path.join(self.project_dir or self.engine_dir, 'Saved', 'Profiling', 'uct')
+        os.makedirs(output_dir, exist_ok=True)
+        prefix = os.path.join(output_dir, f'{target}-{time.strftime("%Y%m%d-%H%M%S")}')
+        made = self._make_perf_record_cmd(cmd, prefix + '.perf.data')
+        if not made:
+            return 1
+        record, timeout = made
+        print(' '.join(record))
+        if self.options.dry_run:
+            return 0
+        return self._record_perf(record, timeout, prefix + '.perf.data') or self._make_flame_graph(prefix, target)
+
+    @staticmethod
+    def _record_perf(record, timeout, data_file) -> int:
+        """Run the perf record command until it exits or the timeout, returns nonzero if no data is written."""
+        with subprocess.Popen(record) as p:
+            try:
+                ret = p.wait(timeout)
+            except subprocess.TimeoutExpired:
+                # perf stops recording and terminates the program on SIGINT.
+                p.send_signal(signal.SIGINT)
+                ret = p.wait()
+            except KeyboardInterrupt:
+                # perf also received the SIGINT, wait for it to write the data.
+                ret = p.wait()
+        if not os.path.exists(data_file):
+            console.error(f'perf record failed with exit code {ret}.')
+            return ret or 1
+        return 0
+
+    def _make_perf_record_cmd(self, cmd, data_file) -> Optional[Tuple[List[str], Optional[float]]]:
+        """
+        Make the perf record command to run the cmd or attach to its running processes.
+        Returns the command and the timeout to stop it, None if there is no process to attach.
+        """
+        record = ['perf', 'record', '-F', str(self.options.freq), '-g', '-o', data_file]
+        timeout = self.options.duration
+        if self.options.attach:
+            pids = launcher.find_processes(cmd[0])
+            if not pids:
+                console.error(f'No running process of {cmd[0]}.')
+                return None
+            record += ['-p', ','.join(str(pid) for pid in pids)]
+            if self.options.duration:
+                record += ['--', 'sleep', str(self.options.duration)]
+                timeout = None
+        else:
+            record += ['--'] + cmd
+        return record, timeout
+
+    def _make_flame_graph(self, prefix, title) -> int:
+        """Fold the stacks in the perf data streamingly, and write the folded stacks and the flame graph."""
+        print('Folding stacks')
+        with subprocess.Popen(['perf', 'script', '-i', prefix + '.perf.data'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, errors='replace') as p:
+            assert p.stdout
+            stacks = flamegraph.fold_perf_script(p.stdout)
+        if not stacks:
+            console.error('No samples are collected.')
+            return 1
+        flamegraph.write_folded(prefix + '.folded', stacks)
+        flamegraph.render_svg(prefix + '.svg', stacks, f'{title} ({sum(stacks.values())} samples)')
+        print(f'Folded stacks: {prefix}.folded')
+        print(f'Flame graph: {prefix}.svg')
+        return 0
+
+    def _new_trace_dir(self) -> Optional[str]:
+        """Make the trace session directory if --trace is specified, empty if not, None if it is unsupported."""
+        if not self.options.trace and not self.options.trace_channels:
+            return ''
+        if not insights.is_supported(self.engine_version):
+            console.error('Capturing traces into files requires UE 4.26 or later.')
+            return None
+        trace_dir = insights.new_session_dir(self.project_dir or self.engine_dir)
+        if not getattr(self.options, 'dry_run', False):
+            os.makedirs(trace_dir, exist_ok=True)
+        return trace_dir
+
+    def _make_trace_args(self, trace_dir, name) -> List[str]:
+        """Make the arguments to capture the trace into the session directory, empty if not tracing."""
+        if not trace_dir:
+            return []
+        trace_file = os.path.join(trace_dir, name + insights.TRACE_SUFFIX)
+        channels = self.options.trace_channels or insights.DEFAULT_CHANNELS
+        return insights.trace_args(channels) + [self._make_path_argument('-tracefile', trace_file)]
+
+    def _report_traces(self, trace_dir):
+        """Print the path and size of the captured trace files."""
+        if not trace_dir or getattr(self.options, 'dry_run', False):
+            return
+        files = glob.glob(os.path.join(trace_dir, '*' + insights.TRACE_SUFFIX))
+        if not files:
+            console.warn(f'No trace file is written into {trace_dir}.')
+        for file in sorted(files):
+            print(f'Trace: {file} ({format_size(os.path.getsize(file))})')
+
+    def _run_parallel(self, trace_dir) -> int:
+        """Run all targets concurrently, stop all of them on Ctrl-C or when the primary target exits."""
+        if not self._check_parallel_run_options():
+            return 1
+        cmds = self._make_parallel_run_cmds()
+        if not cmds:
+            return EXIT_COMMAND_NOT_FOUND
+        for name, cmd in cmds.items():
+            cmd += self._make_trace_args(trace_dir, name)
+        cpu_sets = self._pin_cpus(cmds) if self.options.pin_cpus else []
+        for i, (name, cmd) in enumerate(cmds.items()):
+            print(f'Run {" ".join(cmd)}' + (f' on CPU {format_cpu_set(cpu_sets[i])}' if cpu_sets else ''))
+        if self.options.dry_run:
+            return 0
+        group = launcher.ProcessGroup(self.options.log_dir)
+        for i, (name, cmd) in enumerate(cmds.items()):
+            p = group.start(name, cmd)
+            if cpu_sets:
+                # Not by preexec_fn, which is unsafe since the output reader threads are running.
+                # Threads created by the process before it are not pinned.
+                try:
+                    os.sched_setaffinity(p.pid, cpu_sets[i])
+                except OSError as e:
+                    console.warn(f"Can't pin {name} to CPU {format_cpu_set(cpu_sets[i])}: {e}")
+        monitor = launcher.UsageMonitor(group.processes) if os.path.isdir('/proc') else None
+        results = group.wait(self.options.primary, on_poll=monitor.poll if monitor else None)
+        if monitor:
+            print_usage_summary(monitor.summary(), results)
+        self._report_traces(trace_dir)
+        if self.options.primary:
+            return results.get(self.options.primary, 0)
+        failed_targets = [target for target, ret in results.items() if ret != 0]
+        if failed_targets:
+            console.error(f'Failed to run {" ".join(failed_targets)}.')
+            return results[failed_targets[0]]
+        return 0
+
+    def _check_parallel_run_options(self) -> bool:
+        """Check the options which are incompatible with running targets concurrently."""
+        if self.options.memreport:
+            console.error("--memreport can't be used to run targets concurrently.")
+            return False
+        if self.options.instances > 1 and (len(self.targets) != 1 or self.options.primary):
+            console.error('--instances requires exactly one target and no --primary.')
+            return False
+        return True
+
+    @staticmethod
+    def _pin_cpus(cmds: Dict[str, List[str]]) -> list:
+        """
+        Pin the commands to their own sets of CPUs by launching them with taskset, so all their threads are pinned.
+        Returns the CPU sets to pin the processes after they are started if taskset is not found, otherwise empty.
+        """
+        cpu_sets = launcher.split_cpus(len(cmds))
+        if not cpu_sets:
+            console.warn('CPU pinning is not supported on this system, ignored.')
+            return []
+        taskset = shutil.which('taskset')
+        if not taskset:
+            console.warn('taskset is not found, the processes are pinned after they are started.')
+            return cpu_sets
+        for cmd, cpus in zip(cmds.values(), cpu_sets):
+            cmd[:0] = [taskset, '-c', format_cpu_set(cpus)]
+        return []
+
+    def _make_parallel_run_cmds(self) -> Dict[str, List[str]]:
+        """Make the commands to run concurrently by name, empty if any executable doesn't exist."""
+        cmds = {}
+        for target in self.targets:
+            cmd = self._make_run_cmd(target)
+            if not cmd:
+                return {}
+            if self.options.instances <= 1:
+                cmds[target] = cmd
+                continue
+            # Each instance listens on its own port and writes its own log file.
+            for i in range(self.options.instances):
+                name = f'{target}-{i + 1}'
+                instance_args = [f'-log={name}.log']
+                if self.options.base_port:
+                    instance_args.append(f'-port={self.options.base_port + i}')
+                cmds[name] = cmd + instance_args
+        return cmds
+
+    def _make_run_cmd(self, target, config=None, args: Optional[List[str]] = None) -> List[str]:
+        """
+        Make the command to run the target, empty if its executable doesn't exist.
+        The arguments of the program are the extra arguments of uct if args is None.
+        """
+        executable = self._full_path_of_target(target, config=config)
+        if not executable or not os.path.exists(executable):
+            if executable:
+                console.error(f"{executable} doesn't exist, please build it first.")
+            return []
+        cmd = [executable]
+        if self._is_project_target(target):
+            info = self._get_target_info(target, None, None)
+            assert info
+            if info['TargetType'] != 'Program' and self.project_file:
+                cmd.append(self._make_path_argument('-Project', self.project_file))
+        return cmd + (self.extra_args if args is None else args)
+
     def _full_path_of_target(self, target, key='Launch', platform=None, config=None):
         info = self._get_target_info(target, platform, config)
         if not info:
@@ -819,6 +1685,159 @@ class UnrealCommandTool:
     def _is_engine_target(self, target):
         return any(t['Name'] == target for t in self.engine_targets)
 
+    def bench(self) -> int:
+        """
+        Handle the `bench` command.
+        Run the targets repeatedly, report the statistics and compare them if required.
+        """
+        if self.options.editor_startup:
+            return self._bench_editor_startup()
+        if not self._check_bench_options():
+            return 1
+        configs = [self.config]
+        if self.options.compare:
+            configs.append(constants.CONFIG_MAP[self.options.compare])
+        baselines = self._load_bench_baselines()
+        if baselines is None:
+            return 1
+        results = []
+        comparisons = {}
+        for target in self.targets:
+            cmds = self._make_bench_cmds(target, configs)
+            if not cmds:
+                return EXIT_COMMAND_NOT_FOUND
+            samples = self._run_benchmark(cmds, self.options.repeat, self.options.warmup, not self.options.verbose)
+            if not samples:
+                return 1
+            target_results = [
+                benchmark.make_result(name, cmd, [{m: getattr(s, m) for m in benchmark.METRICS} for s in samples[name]],
+                                      target, config)
+                for (name, cmd), config in zip(cmds.items(), configs)]
+            for result in target_results:
+                print_bench_result(result)
+            results += target_results
+            if len(target_results) > 1:
+                key = f"{target_results[0]['name']} vs {target_results[1]['name']}"
+                comparisons[key] = benchmark.compare(target_results[0], target_results[1])
+                print_bench_comparison(key, comparisons[key])
+            for result in target_results:
+                self._compare_bench_baseline(baselines, result, comparisons)
+        if self.options.output:
+            benchmark.save_results(self.options.output, results, comparisons or None)
+            print(f'Results are written to {self.options.output}')
+        return 0
+
+    def _check_bench_options(self) -> bool:
+        """Check the options of benchmarking the targets."""
+        for option in ('cold', 'map'):
+            if getattr(self.options, option):
+                console.error(f'--{option} can only be used with --editor-startup.')
+                return False
+        if not self.targets:
+            console.error('Missing targets, nothing to benchmark.')
+            return False
+        return True
+
+    def _make_bench_cmds(self, target, configs) -> Optional[Dict[str, list]]:
+        """Make the commands to run the builds of the target in the configs, keyed by the result names."""
+        cmds = {}
+        for config in configs:
+            cmd = self._make_run_cmd(target, config)
+            if not cmd:
+                return None
+            cmds[f'{target}-{config}' if len(configs) > 1 else target] = cmd
+        return cmds
+
+    def _compare_bench_baseline(self, baselines, result, comparisons: Dict[str, dict]):
+        """Compare the result with the baseline of the same target and config if --baseline is specified."""
+        if not self.options.baseline:
+            return
+        baseline = benchmark.find_baseline(baselines, result)
+        if not baseline:
+            console.warn(f"No result of {result['target']} {result['config']} in baseline {self.options.baseline}.")
+            return
+        key = f"{result['name']} (baseline) vs {result['name']}"
+        comparisons[key] = benchmark.compare(baseline, result)
+        print_bench_comparison(key, comparisons[key])
+
+    def _load_bench_baselines(self) -> Optional[List[dict]]:
+        """Load the baseline results if specified, None if failed."""
+        if not self.options.baseline:
+            return []
+        try:
+            return benchmark.load_results(self.options.baseline)
+        except (OSError, ValueError, KeyError) as e:
+            console.error(f"Can't load baseline {self.options.baseline}: {e}")
+            return None
+
+    def _bench_editor_startup(self) -> int:
+        """Launch the editor and quit repeatedly, report the durations of the startup phases parsed from the log."""
+        if self.raw_targets or self.options.compare:
+            console.error("--editor-startup doesn't accept targets or --compare.")
+            return 1
+        editor = self._full_path_of_editor(config=self.config)
+        if not editor or not os.path.exists(editor):
+            console.error(f"Editor {editor} doesn't exist, please build it first.")
+            return EXIT_COMMAND_NOT_FOUND
+        if self.options.cold and not benchmark.can_drop_page_cache():
+            console.error('--cold requires dropping the page cache, which is only supported as root on Linux.')
+            return 1
+        baselines = self._load_bench_baselines()
+        if baselines is None:
+            return 1
+        cmd = [editor]
+        if self.project_file:
+            cmd.append(self.project_file)
+        if self.options.map:
+            cmd.append(self.options.map)
+        cmd += ['-ExecCmds=Quit', '-unattended', '-nosplash', '-nopause'] + self.extra_args
+        log_dir = os.path.join(self.project_dir or self.engine_dir, 'Saved', 'Logs', 'uct')
+        os.makedirs(log_dir, exist_ok=True)
+        # Warmup runs are meaningless for cold starts.
+        warmup = 0 if self.options.cold else self.options.warmup
+        print(f'Benchmark {"cold" if self.options.cold else "warm"} editor startup: '
+              f'{warmup} warmup and {self.options.repeat} measured runs')
+        print(' '.join(cmd))
+        samples = []
+        for i in range(warmup + self.options.repeat):
+            if self.options.cold:
+                benchmark.drop_page_cache()
+            log_file = os.path.join(log_dir, f'EditorStartup-{i + 1}.log')
+            sample = benchmark.run_once(cmd + [self._make_path_argument('-abslog', log_file)], not self.options.verbose)
+            if sample.returncode != 0:
+                console.error(f'Editor exited with code {sample.returncode}, see {log_file}.')
+                return 1
+            if i >= warmup:
+                phases = benchmark.parse_startup_phases(log_file)
+                phases['process'] = sample.wall
+                samples.append(phases)
+                print(f'Run {i - warmup + 1}: {sample.wall:.1f}s')
+        name = 'editor-startup' + ('-cold' if self.options.cold else '')
+        result = benchmark.make_result(name, cmd, samples, name, self.config)
+        print_bench_result(result)
+        comparisons: Dict[str, dict] = {}
+        self._compare_bench_baseline(baselines, result, comparisons)
+        if self.options.output:
+            benchmark.save_results(self.options.output, [result], comparisons or None)
+            print(f'Results are written to {self.options.output}')
+        return 0
+
+    def _run_benchmark(self, cmds: Dict[str, List[str]], repeat, warmup=1,
+                       quiet=True) -> Dict[str, List[benchmark.Sample]]:
+        """Run the commands interleaved after warming up, returns the samples by name, empty if any run failed."""
+        samples: Dict[str, List[benchmark.Sample]] = {name: [] for name in cmds}
+        print(f'Benchmark {", ".join(cmds)}: {warmup} warmup and {repeat} measured runs')
+        for i in range(warmup + repeat):
+            # Interleave the commands so the drift of the system state affects all of them equally.
+            for name, cmd in cmds.items():
+                sample = benchmark.run_once(cmd, quiet)
+                if sample.returncode != 0:
+                    console.error(f'{name} exited with code {sample.returncode}, run `uct run` to see its output.')
+                    return {}
+                if i >= warmup:
+                    samples[name].append(sample)
+        return samples
+
     def test(self) -> int:
         """
         Handle the `test` command.
@@ -840,9 +1859,14 @@ class UnrealCommandTool:
         cmd = [editor, self.project_file, '-log', '-NoSplash', '-Unattended', f'-ExecCmds="{test_cmds}"']
         if self._is_list_test_only():
             cmd += ['-LogCmds="global Error, LogAutomationCommandLine Display"', '-NullRHI']
-        cmd += self.extra_args
+        trace_dir = self._new_trace_dir()
+        if trace_dir is None:
+            return 1
+        cmd += self._make_trace_args(trace_dir, 'Test') + self.extra_args
         print(f'Command line: {cmd}')
-        return subprocess_call(cmd)
+        ret = subprocess_call(cmd)
+        self._report_traces(trace_dir)
+        return ret
 
     def _full_path_of_editor(self, is_cmd=False, platform=None, config=None):
         if self.engine_major_version >= 5:
@@ -876,6 +1900,236 @@ class UnrealCommandTool:
             cmds += self.options.test_cmds
         return '; '.join(cmds)
 
+    def cook(self) -> int:
+        """
+        Handle the `cook` command.
+        Cook the content of the project for the target platform.
+        """
+        if not self.project_file:
+            console.error('This command must run under a game project.')
+            return 1
+        editor = self._full_path_of_editor(is_cmd=True, platform=self.host_platform, config='Development')
+        if not editor or not os.path.exists(editor):
+            if editor:
+                console.error(f"{editor} doesn't exist, build it first.")
+            return EXIT_COMMAND_NOT_FOUND
+        cook_platforms = [self._cook_platform(target) for target in self.targets] or [self._cook_platform(None)]
+        cmd = [editor, self.project_file, '-run=Cook', '-TargetPlatform=' + '+'.join(cook_platforms),
+               '-unattended', '-stdout', '-FullStdOutLogOutput', '-UTF8Output']
+        if not self.options.full:
+            cmd.append('-iterate')
+        processes = self.options.processes or self._cook_process_count()
+        if processes > 1 and self.engine_major_version >= 5:
+            cmd.append(f'-cookprocesscount={processes}')
+        if self.options.maps:
+            cmd.append('-Map=' + '+'.join(self.options.maps))
+        cmd += self.extra_args
+        print(f'Command line: {cmd}')
+
+        start = time.monotonic()
+
+        def on_line(line):
+            print(line, end='')
+            m = re.search(r'Cooked packages (\d+) Packages Remain (\d+) Total (\d+)', line)
+            if m:
+                cooked, total = int(m.group(1)), int(m.group(3))
+                rate = cooked / max(time.monotonic() - start, 0.001)
+                print(console.colored(f'Cooked {cooked}/{total} packages, {rate:.1f} packages/s', 'green'))
+
+        ret = subprocess_stream(cmd, on_line)
+        if ret == 0:
+            print(f'Cook done in {time.monotonic() - start:.1f}s, use `uct pack target --skip-cook` to pack it.')
+        return ret
+
+    def _cook_platform(self, target) -> str:
+        """The cook platform name of the target, such as WindowsClient."""
+        platform = constants.COOK_PLATFORM_MAP.get(self.platform, self.platform)
+        target_type = self._get_target_type(target) if target else 'Game'
+        if target_type in ('Client', 'Server'):
+            return platform + target_type
+        if self.engine_major_version < 5 and platform in ('Windows', 'Linux', 'Mac'):
+            return platform + 'NoEditor'
+        return platform
+
+    def _cook_process_count(self) -> int:
+        """Size the number of cook processes from CPU cores and memory, each one needs 4 cores and 12G."""
+        cpus = os.cpu_count() or 1
+        memory_gb = total_memory() // 2**30
+        return max(1, min(cpus // 4, memory_gb // 12, 8))
+
+    def ddc_stats(self) -> int:
+        """Handle the `ddc stats` command."""
+        dirs = self._ddc_dirs()
+        if not dirs:
+            return 1
+        print(f'{"Size":>10}{"Files":>10}  Directory')
+        print('-' * 80)
+        all_files = []
+        for path in dirs:
+            files = ddc.scan([path])
+            print(f'{format_size(sum(f.size for f in files)):>10}{len(files):>10}  {path}')
+            all_files += files
+        print(f'{format_size(sum(f.size for f in all_files)):>10}{len(all_files):>10}  Total')
+        print()
+        print(f'{"Last access":16}{"Size":>10}{"Files":>10}')
+        print('-' * 36)
+        for label, count, size in ddc.age_histogram(all_files):
+            print(f'{label:16}{format_size(size):>10}{count:>10}')
+        return 0
+
+    def ddc_prune(self) -> int:
+        """Handle the `ddc prune` command."""
+        dirs = self._ddc_dirs()
+        if not dirs:
+            return 1
+        files = ddc.scan(dirs)
+        total = sum(f.size for f in files)
+        budget = self.options.max_size
+        print(f'DDC size is {format_size(total)} in {len(files)} files, budget is {format_size(budget)}.')
+        count, size = ddc.prune(files, budget, self.options.dry_run)
+        action = 'Would remove' if self.options.dry_run else 'Removed'
+        print(f'{action} {count} least recently accessed files, reclaimed {format_size(size)}.')
+        return 0
+
+    def ddc_fill(self) -> int:
+        """
+        Handle the `ddc fill` command.
+        Warm the DDC by running the DerivedDataCache commandlet.
+        """
+        if not self.project_file:
+            console.error('This command must run under a game project.')
+            return 1
+        if self.options.background:
+            return self._ddc_fill_in_background()
+        editor = self._full_path_of_editor(is_cmd=True, platform=self.host_platform, config='Development')
+        if not editor or not os.path.exists(editor):
+            if editor:
+                console.error(f"{editor} doesn't exist, build it first.")
+            return EXIT_COMMAND_NOT_FOUND
+        cmd = [editor, self.project_file, '-run=DerivedDataCache', '-fill',
+               '-TargetPlatform=' + self._cook_platform(None),
+               '-unattended', '-NoSplash', '-NullRHI', '-stdout', '-FullStdOutLogOutput', '-UTF8Output']
+        if self.options.maps:
+            cmd.append('-Map=' + '+'.join(self.options.maps))
+        cmd += self.extra_args
+        print(f'Command line: {cmd}')
+
+        history_file = os.path.join(self.project_dir, 'Saved', 'uct', 'ddc_fill_history.json')
+        history = []
+        try:
+            with open(history_file, encoding='utf8') as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if history:
+            last = history[-1]
+            print(f'Last fill at {last["time"]} took {last["duration"]:.1f}s.')
+
+        start = time.monotonic()
+        loaded = 0
+
+        def on_line(line):
+            nonlocal loaded
+            print(line, end='')
+            m = re.search(r'Loading \((\d+)\) ', line)
+            if m:
+                loaded = int(m.group(1))
+                rate = loaded / max(time.monotonic() - start, 0.001)
+                print(console.colored(f'Loaded {loaded} packages, {rate:.1f} packages/s', 'green'))
+
+        ret = subprocess_stream(cmd, on_line)
+        duration = time.monotonic() - start
+        history.append({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'duration': duration,
+                        'packages': loaded, 'returncode': ret, 'maps': self.options.maps or []})
+        os.makedirs(os.path.dirname(history_file), exist_ok=True)
+        with open(history_file, 'w', encoding='utf8') as f:
+            json.dump(history, f, indent=4)
+        print(f'DDC fill took {duration:.1f}s, recorded in {history_file}.')
+        return ret
+
+    def _ddc_fill_in_background(self) -> int:
+        """Run this command again without --background as a detached low priority process."""
+        log_file = os.path.join(self.project_dir, 'Saved', 'Logs', 'uct_ddc_fill.log')
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        # The arguments after "--" are passed to the commandlet as is.
+        end = sys.argv.index('--') if '--' in sys.argv else len(sys.argv)
+        argv = [a for a in sys.argv[:end] if a != '--background'] + sys.argv[end:]
+        cmd = [sys.executable, os.path.abspath(argv[0])] + argv[1:]
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = (subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP |
+                                       subprocess.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            kwargs['start_new_session'] = True
+            kwargs['preexec_fn'] = lambda: os.nice(10)
+        with open(log_file, 'w', encoding='utf8') as log:
+            # pylint: disable-next=consider-using-with
+            p = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                 cwd=os.getcwd(), **kwargs)
+        print(f'DDC fill is running in background with low priority, pid {p.pid}, log: {log_file}')
+        return 0
+
+    def _ddc_dirs(self) -> list:
+        """The local DDC directories in the scope."""
+        dirs = []
+        if self.options.dirs:
+            dirs = self.options.dirs
+        else:
+            search_in_engine, search_in_project = self._get_search_scope()
+            if search_in_project:
+                dirs.append(os.path.join(self.project_dir, 'DerivedDataCache'))
+            if search_in_engine:
+                dirs += [os.path.join(self.engine_dir, 'DerivedDataCache'), ddc.user_ddc_dir()]
+        dirs = [d for d in dirs if os.path.isdir(d)]
+        if not dirs:
+            console.error('No DerivedDataCache directory is found.')
+        return dirs
+
+    def pak_info(self) -> int:
+        """Handle the `pak info` command."""
+        containers = self._open_pak_files()
+        for container in containers:
+            info = container.info()
+            for key, value in info.items():
+                if key.endswith('Size'):
+                    value = f'{format_size(value)} ({value})'
+                print(f'{key:20}{value}')
+            if info['UncompressedSize']:
+                print(f'{"CompressionRatio":20}{info["CompressedSize"] / info["UncompressedSize"]:.1%}')
+            print()
+        return 0 if len(containers) == len(self.options.files) else 1
+
+    def pak_list(self) -> int:
+        """Handle the `pak list` command."""
+        containers = self._open_pak_files()
+        for container in containers:
+            if len(self.options.files) > 1:
+                print(f'{container.path}:')
+            for entry in container.entries:
+                print(f'{entry.uncompressed_size:>12}{entry.size:>12}  {entry.compression or "None":8}{entry.path}')
+        return 0 if len(containers) == len(self.options.files) else 1
+
+    def pak_stat(self) -> int:
+        """Handle the `pak stat` command."""
+        containers = self._open_pak_files()
+        entries = [entry for container in containers for entry in container.entries]
+        rollup = pak.directory_rollup(entries, self.options.depth)
+        print(f'{"Files":>8}{"Size":>10}{"Stored":>10}{"Ratio":>8}  Directory')
+        print('-' * 80)
+        for directory, (count, uncompressed, size) in sorted(rollup.items(), key=lambda i: i[1][1], reverse=True):
+            ratio = f'{size / uncompressed:.1%}' if uncompressed else '-'
+            print(f'{count:>8}{format_size(uncompressed):>10}{format_size(size):>10}{ratio:>8}  {directory}')
+        return 0 if len(containers) == len(self.options.files) else 1
+
+    def _open_pak_files(self) -> list:
+        containers = []
+        for path in self.options.files:
+            try:
+                containers.append(pak.open_container(path))
+            except (OSError, pak.PakError) as e:
+                console.error(str(e))
+        return containers
+
     def pack_target(self) -> int:
         """
         Handle the `pack target` command.
@@ -884,34 +2138,160 @@ class UnrealCommandTool:
         if not self.project_file:
             console.error('not in project directory')
             return 0
+        tools = self._find_pack_tools()
+        if not tools:
+            return 1
+        uat, editor = tools
+
+        ret = self._verify_sdks(uat)
+        if ret != 0:
+            return ret
+
+        archive_dir = os.path.abspath(self.options.output)
+        if self.options.jobs > 1 and len(self.targets) > 1:
+            return self._pack_targets_parallel(uat, editor, archive_dir) or self._store_archive(archive_dir)
 
+        for target in self.targets:
+            print(f'Pack {target}')
+            cmd = self._make_pack_target_cmd(uat, editor, PackJob(target, archive_dir, self.options.skip_cook))
+            # print(f'Run {' '.join(cmd)}')
+            ret = subprocess_call(cmd)
+            if ret != 0:
+                return ret
+        return self._store_archive(archive_dir)
+
+    def _find_pack_tools(self) -> Optional[Tuple[str, str]]:
+        """Find the UAT script and the editor to pack the targets, None if anything is missing."""
         uat = self._find_build_script('RunUAT', platform='')
         # UnrealEditor does not support the Shipping configuration
         editor = self._full_path_of_editor(is_cmd=True, platform=self.host_platform, config='Development')
         if not editor:
+            return None
+
+        if not self.targets:
+            console.error('Missing targets, nothing to pack.')
+            return None
+        return uat, editor
+
+    def _store_archive(self, archive_dir) -> int:
+        """Move the archived files into the store if the --store option is specified."""
+        if not self.options.store:
+            return 0
+        print(f'Store {archive_dir} into {self.options.store}')
+        start = time.monotonic()
+        try:
+            count, size = store.ingest(os.path.abspath(self.options.store), archive_dir)
+        except store.StoreError as e:
+            console.error(str(e))
             return 1
+        print(f'{count} files ({format_size(size)}) are deduplicated in {time.monotonic() - start:.1f}s.')
+        return 0
+
+    def _make_pack_target_cmd(self, uat, editor, job: PackJob) -> list:
+        cmd = [
+            uat, self._make_path_argument('-ScriptsForProject', self.project_file),
+            # BuildCookRun
+            'BuildCookRun', '-nop4', '-utf8output', '-nocompile', '-nocompileeditor', '-nocompileuat',
+            '-skipbuildeditor', '-skipcook' if job.skip_cook else '-cook',
+            self._make_path_argument('-Project', self.project_file),
+            '-stage', '-archive', '-package', '-build', '-pak', '-iostore', '-compressed', '-prereqs',
+            f'-target={job.target}', self._make_path_argument('-unrealexe', editor), f'-platform={self.platform}',
+            f'-clientconfig={self.config}', f'-serverconfig={self.config}',
+            self._make_path_argument('-archivedirectory', job.archive_dir)
+        ]
+        if job.staging_dir:
+            cmd.append(self._make_path_argument('-stagingdirectory', job.staging_dir))
+        cmd += self.extra_args
+        return cmd
 
+    def _verify_sdks(self, uat) -> int:
+        """Verify the SDK once for each distinct platform of the targets, such as WindowsClient and WindowsServer."""
+        platforms: Dict[str, str] = {}
         for target in self.targets:
-            print(f'Pack {target}')
-            cmd = [
-                uat, self._make_path_argument('-ScriptsForProject', self.project_file),
-                # Turnkey
-                'Turnkey', '-command=VerifySdk', f'-target={target}', f'-platform={self.platform}',
-                '-UpdateIfNeeded', self._make_path_argument('-Project', self.project_file),
-                # BuildCookRun
-                'BuildCookRun', '-nop4', '-utf8output', '-nocompile', '-nocompileeditor', '-nocompileuat',
-                '-skipbuildeditor', '-cook', self._make_path_argument('-Project', self.project_file),
-                '-stage', '-archive', '-package', '-build', '-pak', '-iostore', '-compressed', '-prereqs',
-                f'-target={target}', self._make_path_argument('-unrealexe', editor), f'-platform={self.platform}',
-                f'-clientconfig={self.config}', f'-serverconfig={self.config}',
-                self._make_path_argument('-archivedirectory', os.path.abspath(self.options.output))
-            ]
-            # print(f'Run {' '.join(cmd)}')
-            ret = subprocess_call(cmd)
+            platforms.setdefault(self._cook_platform(target), target)
+        for platform, target in platforms.items():
+            ret = self._verify_sdk(uat, target, platform)
             if ret != 0:
                 return ret
         return 0
 
+    def _verify_sdk(self, uat, target, platform) -> int:
+        """Run the Turnkey VerifySdk command if there is no valid cached result."""
+        key = f'{self.engine_root}|{engine.version_string(self.engine_version)}|{platform}'
+        cache_file = os.path.join(os.path.expanduser(constants.CACHE_DIR), 'verified_sdks.json')
+        cache = {}
+        try:
+            with open(cache_file, encoding='utf8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            pass
+        ttl = self.options.sdk_ttl * 3600
+        if not self.options.verify_sdk and time.time() - cache.get(key, 0) < ttl:
+            console.info(f'SDK for {platform} was verified recently, skip Turnkey.')
+            return 0
+
+        cmd = [
+            uat, self._make_path_argument('-ScriptsForProject', self.project_file),
+            'Turnkey', '-command=VerifySdk', f'-target={target}', f'-platform={self.platform}',
+            '-UpdateIfNeeded', self._make_path_argument('-Project', self.project_file),
+        ]
+        ret = subprocess_call(cmd)
+        if ret != 0 or ttl <= 0:
+            return ret
+        cache[key] = time.time()
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w', encoding='utf8') as f:
+            json.dump(cache, f, indent=4)
+        return 0
+
+    def _pack_targets_parallel(self, uat, editor, archive_dir) -> int:
+        """
+        Pack multiple targets concurrently, each one into its own archive subdirectory.
+        Targets of the same type use the same cooked content, so only the first one of them cooks,
+        the others are packed with -skipcook after it.
+        """
+        groups: Dict[str, list] = {}
+        for target in self.targets:
+            groups.setdefault(self._get_target_type(target), []).append(target)
+
+        # Keep the logs out of the archive directory, which is shipped.
+        log_dir = os.path.join(self.project_dir, 'Saved', 'Logs', 'uct', 'Pack')
+        staging_root = os.path.join(self.project_dir, 'Saved', 'StagedBuilds', 'uct')
+
+        def make_cmd(target, skip_cook):
+            return self._make_pack_target_cmd(uat, editor, PackJob(target, os.path.join(archive_dir, target),
+                                                                   skip_cook or self.options.skip_cook,
+                                                                   os.path.join(staging_root, target)))
+
+        print(f'Pack {" ".join(self.targets)} in parallel')
+        start = time.monotonic()
+        cooking = {targets[0]: make_cmd(targets[0], False) for targets in groups.values()}
+        results = run_commands_parallel(cooking, log_dir, self.options.jobs)
+        sharing = {}
+        for targets in groups.values():
+            if results[targets[0]][0] == 0:
+                sharing.update({t: make_cmd(t, True) for t in targets[1:]})
+        if sharing:
+            results.update(run_commands_parallel(sharing, log_dir, self.options.jobs))
+        print_parallel_results('Target', results, time.monotonic() - start)
+
+        returncode = 0
+        for targets in groups.values():
+            for target in targets:
+                if target not in results:
+                    console.error(f"{target} is not packed because cooking of {targets[0]} failed.")
+                    returncode = returncode or 1
+                elif results[target][0] != 0:
+                    console.error(f'Failed to pack {target}, see {os.path.join(log_dir, target + ".log")}')
+                    returncode = returncode or results[target][0]
+        return returncode
+
+    def _get_target_type(self, target) -> str:
+        for t in self.all_targets:
+            if t['Name'] == target:
+                return t['Type']
+        return ''
+
     def pack_plugin(self) -> int:
         """
         Handle the `pack target` command.
@@ -921,22 +2301,191 @@ class UnrealCommandTool:
         if not plugin_file:
             return 1
         pack_dir = os.path.abspath(self.options.output)
+        platforms = []
+        if self.options.platforms:
+            platforms = [constants.PLATFORM_MAP[p] for p in self.options.platforms]
+        if self.options.parallel:
+            if len(platforms) > 1:
+                return self._pack_plugin_parallel(plugin_file, pack_dir, platforms)
+            console.warn('--parallel takes effect only when multiple platforms are specified.')
+
+        cmd = self._make_pack_plugin_cmd(plugin_file, pack_dir, platforms)
+        ret = subprocess_call(cmd)
+        if ret != 0:
+            return ret
+
+        self._cleanup_packed_plugin(pack_dir)
+        plugin_name = os.path.splitext(os.path.basename(plugin_file))[0]
+        return self._store_archive(os.path.join(pack_dir, plugin_name))
+
+    def _make_pack_plugin_cmd(self, plugin_file, pack_dir, platforms) -> list:
         cmd = [
             self._find_build_script('RunUAT', platform=''),
             'BuildPlugin', self._make_path_argument('-Plugin', plugin_file),
             self._make_path_argument('-Package', pack_dir),
             '-CreateSubFolder'
         ]
-        if self.options.platforms:
-            platforms = [constants.PLATFORM_MAP[p] for p in self.options.platforms]
+        if platforms:
             cmd.append('-TargetPlatforms=' + '+'.join(platforms))
         cmd += self.extra_args
+        return cmd
 
-        ret = subprocess_call(cmd)
-        if ret != 0:
-            return ret
+    def _pack_plugin_parallel(self, plugin_file, pack_dir, platforms) -> int:
+        """
+        Run one BuildPlugin for each platform concurrently, each one into its own staging directory,
+        then merge the results into the pack_dir.
+        """
+        plugin_name = os.path.splitext(os.path.basename(plugin_file))[0]
+        staging_root = os.path.join(pack_dir, '.uct-staging')
+        commands = {}
+        for platform in platforms:
+            staging_dir = os.path.join(staging_root, platform)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            commands[platform] = self._make_pack_plugin_cmd(plugin_file, staging_dir, [platform])
+
+        print(f'Pack {plugin_name} for {" ".join(platforms)} in parallel')
+        start = time.monotonic()
+        results = run_commands_parallel(commands, log_dir=staging_root)
+        elapsed = time.monotonic() - start
+
+        print_parallel_results('Platform', results, elapsed)
+
+        failed = [p for p, (ret, _) in results.items() if ret != 0]
+        if failed:
+            for platform in failed:
+                console.error(f'Failed to pack {plugin_name} for {platform}, '
+                              f'see {os.path.join(staging_root, platform + ".log")}')
+            return results[failed[0]][0]
+
+        # The platform specific files such as Binaries/{Platform} are merged into one package,
+        # the common files are taken from the first platform.
+        package_dir = os.path.join(pack_dir, plugin_name)
+        shutil.rmtree(package_dir, ignore_errors=True)
+        for platform in platforms:
+            platform_dir = os.path.join(staging_root, platform, plugin_name)
+            if not os.path.isdir(platform_dir):
+                console.error(f"The package of {plugin_name} for {platform} is not found at '{platform_dir}'")
+                return 1
+            fs.merge_tree(platform_dir, package_dir)
+        print(f'Plugin is packed into {package_dir}')
+
+        self._cleanup_packed_plugin(pack_dir, [staging_root])
+        return self._store_archive(package_dir)
+
+    def pack_diff(self) -> int:
+        """
+        Handle the `pack diff` command.
+        Compare two archive directories to estimate the patch size.
+        """
+        for path in (self.options.old_dir, self.options.new_dir):
+            if not os.path.isdir(path):
+                console.error(f"'{path}' is not a directory.")
+                return 1
+        # Keep the stdout clean for the JSON.
+        out = sys.stderr if self.options.json == '-' else sys.stdout
+        print(f'Hashing {self.options.old_dir}', file=out)
+        old = filehash.hash_tree(self.options.old_dir)
+        print(f'Hashing {self.options.new_dir}', file=out)
+        new = filehash.hash_tree(self.options.new_dir)
+
+        added = sorted(p for p in new if p not in old)
+        removed = sorted(p for p in old if p not in new)
+        modified = sorted(p for p, h in new.items() if p in old and h.digest != old[p].digest)
+        changes = [('added', p, new[p].size) for p in added] + [('modified', p, new[p].size) for p in modified]
+        changes.sort(key=lambda c: c[2], reverse=True)
+        result = {
+            'old_dir': os.path.abspath(self.options.old_dir),
+            'new_dir': os.path.abspath(self.options.new_dir),
+            'added': {'files': len(added), 'bytes': sum(new[p].size for p in added)},
+            'removed': {'files': len(removed), 'bytes': sum(old[p].size for p in removed)},
+            'modified': {'files': len(modified), 'bytes': sum(new[p].size for p in modified),
+                         'old_bytes': sum(old[p].size for p in modified)},
+            'unchanged': {'files': len(new) - len(added) - len(modified)},
+            'patch_bytes': sum(c[2] for c in changes),
+            'biggest': [{'change': c, 'path': p, 'bytes': size} for c, p, size in changes[:self.options.top]],
+            'files': {'added': added, 'removed': removed, 'modified': modified},
+        }
+
+        for kind in ('added', 'removed', 'modified'):
+            print(f'{kind.capitalize():10}{result[kind]["files"]:>8} files{format_size(result[kind]["bytes"]):>10}',
+                  file=out)
+        print(f'{"Unchanged":10}{result["unchanged"]["files"]:>8} files', file=out)
+        print(f'Estimated patch size: {format_size(result["patch_bytes"])}', file=out)
+        if changes:
+            print(f'\nBiggest {min(len(changes), self.options.top)} changes:', file=out)
+            for item in result['biggest']:
+                print(f'{format_size(item["bytes"]):>10}  {item["change"]:10}{item["path"]}', file=out)
+
+        if self.options.json:
+            if self.options.json == '-':
+                json.dump(result, sys.stdout, indent=4)
+            else:
+                with open(self.options.json, 'w', encoding='utf8') as f:
+                    json.dump(result, f, indent=4)
+                print(f'Result is written to {self.options.json}')
+        return 0
 
-        return self._cleanup_packed_plugin(pack_dir)
+    def trace_list(self) -> int:
+        """
+        Handle the `trace list` command.
+        List the captured trace sessions.
+        """
+        sessions = insights.list_sessions(self.project_dir or self.engine_dir)
+        for session in sessions:
+            print(f'{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session.time))}'
+                  f'{len(session.files):>6} files{format_size(session.size):>10}  {session.path}')
+            if self.options.verbose:
+                for file in session.files:
+                    print(f'    {os.path.basename(file)}')
+        print(f'{len(sessions)} sessions, {format_size(sum(s.size for s in sessions))}.')
+        return 0
+
+    def trace_prune(self) -> int:
+        """
+        Handle the `trace prune` command.
+        Remove old trace sessions.
+        """
+        sessions = insights.list_sessions(self.project_dir or self.engine_dir)
+        pruned = insights.sessions_to_prune(sessions, self.options.keep, self.options.older_than)
+        for session in pruned:
+            print(f'{"Would remove" if self.options.dry_run else "Remove"} {session.path}')
+        if not self.options.dry_run:
+            fs.remove_trees([s.path for s in pruned])
+        action = 'Would remove' if self.options.dry_run else 'Removed'
+        print(f'{action} {len(pruned)} sessions, {format_size(sum(s.size for s in pruned))}.')
+        return 0
+
+    def perf_csv(self) -> int:
+        """
+        Handle the `perf csv` command.
+        Report the frame times and stats of CSV profiler captures, and the regressions from the first one.
+        """
+        captures = []
+        for path in self.options.files:
+            try:
+                capture = perfcsv.load(path)
+            except OSError as e:
+                console.error(f"Can't load {path}: {e}")
+                return 1
+            if not capture.frames or perfcsv.FRAME_TIME not in capture.columns:
+                console.error(f"{path} isn't a CSV profiler capture or has no frames.")
+                return 1
+            print_csv_capture(capture, self.options.thresholds, self.options.top)
+            captures.append(capture)
+        for capture in captures[1:]:
+            print_csv_regressions(captures[0], capture, self.options.top)
+        return 0
+
+    def store_gc(self) -> int:
+        """Handle the `store gc` command."""
+        try:
+            count, size = store.gc(self.options.dir, self.options.dry_run)
+        except store.StoreError as e:
+            console.error(str(e))
+            return 1
+        action = 'Would remove' if self.options.dry_run else 'Removed'
+        print(f'{action} {count} unreferenced objects, {format_size(size)}.')
+        return 0
 
     def _find_plugin_file_to_pack(self) -> str:
         if not self.project_dir:
@@ -955,12 +2504,134 @@ class UnrealCommandTool:
             return ''
         return plugins[0]
 
-    def _cleanup_packed_plugin(self, pack_dir):
-        shutil.rmtree(os.path.join(pack_dir, 'Intermediate'), ignore_errors=True)
-        shutil.rmtree(os.path.join(pack_dir, 'Binaries'), ignore_errors=True)
+    def _cleanup_packed_plugin(self, pack_dir, extra_dirs=()):
+        dirs = [os.path.join(pack_dir, 'Intermediate'), os.path.join(pack_dir, 'Binaries')]
+        fs.remove_dirs_in_background(dirs + list(extra_dirs))
         return 0
 
 
+def print_parallel_results(kind: str, results: Dict[str, Tuple[int, float]], elapsed: float):
+    """Print a summary table of the results of run_commands_parallel."""
+    print(f'{kind:32}{"Result":10}{"Time":>10}')
+    print('-' * 52)
+    for name, (ret, duration) in results.items():
+        print(f'{name:32}{"OK" if ret == 0 else "FAILED":10}{duration:9.1f}s')
+    print(f'Total {elapsed:.1f}s, {sum(d for _, d in results.values()) / max(elapsed, 0.001):.1f}x speedup.')
+
+
+def format_cpu_set(cpus: List[int]) -> str:
+    """Format a CPU set in the form of taskset, such as 0-3,8."""
+    ranges: List[List[int]] = []
+    for cpu in cpus:
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+def print_usage_summary(summary: Dict[str, launcher.Usage], results: Dict[str, int]):
+    """Print the resource usage summary table of the processes."""
+    if not summary:
+        return
+    width = max(len(name) for name in summary) + 2
+    print(f'\n{"Process":{width}}{"CPU avg":>9}{"CPU peak":>10}{"RSS avg":>10}{"RSS peak":>10}{"Exit":>6}')
+    print('-' * (width + 45))
+    for name, usage in summary.items():
+        exit_code = str(results[name]) if name in results else '-'
+        print(f'{name:{width}}{usage.average_cpu:>8.1f}%{usage.peak_cpu:>9.1f}%'
+              f'{format_size(usage.average_rss):>10}{format_size(usage.peak_rss):>10}{exit_code:>6}')
+
+
+def print_bench_result(result: dict):
+    """Print the statistics table of a benchmark result."""
+    print(f'\n{result["name"]}, {len(result["samples"])} runs')
+    print(f'{"Metric":16}' + ''.join(f'{column:>10}' for column in benchmark.Stats._fields))
+    print('-' * 76)
+    for metric, stats in result['stats'].items():
+        if any(stats.values()):
+            print(f'{metric:16}' + ''.join(f'{benchmark.format_value(metric, value):>10}' for value in stats.values()))
+
+
+def print_bench_comparison(title, comparison: Dict[str, dict]):
+    """Print the comparison of two benchmark results."""
+    print(f'\n{title}')
+    print(f'{"Metric":16}{"Change":>10}{"p-value":>10}')
+    print('-' * 36)
+    for metric, item in comparison.items():
+        verdict = 'significant' if item['significant'] else 'not significant'
+        print(f'{metric:16}{item["change"]:>+10.1%}{item["p"]:>10.4f}  {verdict}')
+
+
+def print_memreport(report: llm.Report, top=30):
+    """Print the top tags by peak memory of a LLM report."""
+    print(f'\n{report.path}: {report.samples} samples')
+    print(f'{"Tag":48}{"Peak":>12}{"Final":>12}{"Growth":>12}')
+    print('-' * 84)
+    tags = sorted(report.tags.items(), key=lambda item: item[1].peak, reverse=True)
+    for tag, stats in tags[:top]:
+        print(f'{tag:48}{stats.peak:>10.2f}MB{stats.final:>10.2f}MB{stats.growth:>+10.2f}MB')
+    if len(tags) > top:
+        print(f'... and {len(tags) - top} more tags')
+
+
+def print_memreport_diffs(diffs: List[llm.TagDiff]):
+    """Print the tags whose peak memory changes from the baseline."""
+    changes = [d for d in diffs if abs(d.delta) >= 0.01]
+    print(f'\nPeak memory changes of {len(changes)} tags from the baseline:')
+    if not changes:
+        return
+    print(f'{"Tag":48}{"Base":>12}{"New":>12}{"Delta":>12}')
+    print('-' * 84)
+    for diff in changes:
+        mark = '  REGRESSION' if diff.is_regression else ''
+        print(f'{diff.tag:48}{diff.base:>10.2f}MB{diff.new:>10.2f}MB{diff.delta:>+10.2f}MB{mark}')
+
+
+def print_time_trace_report(report: timetrace.Report, top: int):
+    """Print the compile-time hotspots of the aggregated time traces."""
+    total = sum(duration for _, duration in report.units)
+    print(f'\n{len(report.units)} translation units in {len(report.modules)} modules, '
+          f'total compile time {total / 1e6:.1f}s')
+    for title, items in (('Most expensive headers by total parse time', report.top_headers(top)),
+                         ('Slowest template instantiations by total time', report.top_templates(top))):
+        print(f'\n{title}:')
+        print(f'{"Total":>10}{"Count":>8}{"Avg":>10}  Name')
+        for name, item in items:
+            print(f'{item.time / 1e6:>9.2f}s{item.calls:>8}{item.time / item.calls / 1e3:>8.1f}ms  {name}')
+    for title, times in (('Slowest translation units', report.top_units(top)),
+                         ('Slowest modules', report.top_modules(top))):
+        print(f'\n{title}:')
+        for name, duration in times:
+            print(f'{duration / 1e6:>9.2f}s  {name}')
+
+
+def print_csv_capture(capture: perfcsv.Capture, thresholds: List[float], top: int):
+    """Print the frame time percentiles, hitches and the top stats of a CSV profiler capture."""
+    metadata = ', '.join(f'{k} {capture.metadata[k]}' for k in ('platform', 'config') if k in capture.metadata)
+    print(f'\n{capture.path}: {capture.frames} frames' + (f', {metadata}' if metadata else ''))
+    frame_times = capture.columns[perfcsv.FRAME_TIME]
+    points = [50, 90, 95, 99, 99.9, 100]
+    print(f'{"":12}{"avg":>9}' + ''.join(f'{"max" if p == 100 else f"p{p:g}":>9}' for p in points))
+    values = [perfcsv.average(frame_times)] + perfcsv.percentiles(frame_times, points)
+    print(f'{perfcsv.FRAME_TIME:12}' + ''.join(f'{v:>7.2f}ms' for v in values))
+    hitches = perfcsv.count_hitches(frame_times, thresholds)
+    print('Hitches: ' + ', '.join(f'>{t:g}ms: {n} ({100.0 * n / capture.frames:.2f}%)' for t, n in hitches.items()))
+    averages = sorted(perfcsv.averages(capture).items(), key=lambda item: item[1], reverse=True)
+    print(f'Top {min(top, len(averages))} stats by average:')
+    for stat, value in averages[:top]:
+        print(f'  {stat:48}{value:>12.3f}')
+
+
+def print_csv_regressions(base: perfcsv.Capture, new: perfcsv.Capture, top: int):
+    """Print the top regressing stats between two CSV profiler captures."""
+    changes = perfcsv.regressions(base, new, top)
+    print(f'\nTop {len(changes)} regressing stats from {base.path} to {new.path}:')
+    print(f'  {"Stat":48}{"Base":>12}{"New":>12}{"Delta":>12}{"Change":>10}')
+    for change in changes:
+        print(f'  {change.stat:48}{change.base:>12.3f}{change.new:>12.3f}{change.delta:>+12.3f}{change.ratio:>+10.1%}')
+
+
 def check_targets(targets):
     """Check the correctness of targets."""
     ok = True
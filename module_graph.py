@@ -0,0 +1,350 @@
+"""
+Module dependency graph built by parsing the build rules and descriptor files.
+"""
+
+import collections
+import concurrent.futures
+import json
+import os
+import re
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+import fs
+
+# The cache file under the engine or project directory.
+CACHE_FILE = os.path.join('Intermediate', 'uct', 'module_graph.json')
+# Increase it when the format of the parsed data is changed.
+_CACHE_VERSION = 1
+
+# Dependency fields in the build rules and the kind of them.
+DEPENDENCY_FIELDS = {
+    'PublicDependencyModuleNames': 'public',
+    'PrivateDependencyModuleNames': 'private',
+    'DynamicallyLoadedModuleNames': 'dynamic',
+    'PublicIncludePathModuleNames': 'include',
+    'PrivateIncludePathModuleNames': 'include',
+}
+
+_EXCLUDED_DIRS = {'Binaries', 'Content', 'DerivedDataCache', 'Intermediate', 'Resources', 'Saved', 'Shaders'}
+_COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+_MODULE_NAMES_RE = re.compile(r'\b(\w+ModuleNames)\s*\.\s*(?:Add|AddRange)\s*\(([^;]*?)\)\s*;', re.S)
+_STRING_RE = re.compile(r'"(\w+)"')
+_EXTERNAL_RE = re.compile(r'\bType\s*=\s*ModuleType\.External\b')
+_TARGET_CLASS_RE = re.compile(r'\bclass\s+(\w+)Target\s*:\s*TargetRules\b')
+_TARGET_TYPE_RE = re.compile(r'\bType\s*=\s*TargetType\.(\w+)')
+_LAUNCH_MODULE_RE = re.compile(r'\bLaunchModuleName\s*=\s*"(\w+)"')
+
+# Module types of the engine modules, by the first directory under Engine/Source.
+_ENGINE_MODULE_TYPES = {
+    'Developer': 'Developer',
+    'Editor': 'Editor',
+    'Programs': 'Program',
+    'ThirdParty': 'External',
+}
+
+
+class Module(NamedTuple):
+    """A module in the graph."""
+    name: str
+    # Path of the .Build.cs file.
+    path: str
+    # Such as Runtime, Editor, Developer, Program, External or other module types in the descriptors.
+    type: str
+    # Name of the plugin which the module belongs to, empty if not in a plugin.
+    plugin: str
+    # Dependencies of each kind, such as public, private, dynamic and include.
+    dependencies: Dict[str, List[str]]
+
+
+class Target(NamedTuple):
+    """A target in the graph."""
+    name: str
+    path: str
+    type: str
+    # Modules listed in the .Target.cs file, including the launch module.
+    modules: List[str]
+
+
+class Plugin(NamedTuple):
+    """A plugin in the graph."""
+    name: str
+    path: str
+    enabled_by_default: bool
+    # Modules in the descriptor, (name, type).
+    modules: List[tuple]
+
+
+class ModuleGraph:
+    """The module dependency graph of the engine and the project."""
+    def __init__(self, modules: List[Module], targets: List[Target], plugins: List[Plugin], project: dict):
+        self.modules = {m.name: m for m in modules}
+        self.targets = {t.name: t for t in targets}
+        self.plugins = {p.name: p for p in plugins}
+        # The parsed .uproject file, empty if there is no project.
+        self.project = project
+        self._module_dirs = {os.path.dirname(m.path): m.name for m in modules}
+        self._dependents: Dict[str, Set[str]] = collections.defaultdict(set)
+        for module in modules:
+            for deps in module.dependencies.values():
+                for dep in deps:
+                    self._dependents[dep].add(module.name)
+
+    def dependencies(self, name) -> Set[str]:
+        """All direct and indirect dependencies of the module."""
+        return self._closure([name], self._all_dependencies) - {name}
+
+    def dependents(self, name) -> Set[str]:
+        """All modules which depend on the module directly or indirectly."""
+        return self._closure([name], lambda m: self._dependents.get(m, ())) - {name}
+
+    def module_of_file(self, path) -> str:
+        """Name of the module which the file belongs to, empty if not found."""
+        path = os.path.abspath(path)
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return ''
+            path = parent
+            if path in self._module_dirs:
+                return self._module_dirs[path]
+
+    def affected_modules(self, files: Iterable[str]) -> Set[str]:
+        """Modules containing the files and all modules depend on them."""
+        modules = {self.module_of_file(f) for f in files} - {''}
+        return self._closure(modules, lambda m: self._dependents.get(m, ()))
+
+    def target_modules(self, name) -> Optional[Set[str]]:
+        """All modules may be built in the target, None if the target is unknown."""
+        target = self.targets.get(name)
+        if not target:
+            return None
+        roots = list(target.modules)
+        if target.type != 'Program':
+            roots += self._plugin_modules(target)
+            if self.project and _is_in_dir(target.path, self.project['Dir']):
+                roots += [m['Name'] for m in self.project.get('Modules', [])
+                          if _is_compatible(m.get('Type', 'Runtime'), target.type)]
+
+        def dependencies(name):
+            return (d for d in self._all_dependencies(name)
+                    if d in self.modules and _is_compatible(self.modules[d].type, target.type))
+        return self._closure([r for r in roots if r in self.modules], dependencies)
+
+    def _plugin_modules(self, target: Target) -> List[str]:
+        enabled = {}
+        if self.project and _is_in_dir(target.path, self.project['Dir']):
+            enabled = {p['Name']: p.get('Enabled', True) for p in self.project.get('Plugins', [])}
+        modules = []
+        for plugin in self.plugins.values():
+            if self.project and _is_in_dir(plugin.path, self.project['Dir']):
+                is_enabled = enabled.get(plugin.name, True)
+            else:
+                is_enabled = enabled.get(plugin.name, plugin.enabled_by_default)
+            if is_enabled:
+                modules += [name for name, module_type in plugin.modules if _is_compatible(module_type, target.type)]
+        return modules
+
+    def _all_dependencies(self, name) -> List[str]:
+        module = self.modules.get(name)
+        if not module:
+            return []
+        return [d for deps in module.dependencies.values() for d in deps]
+
+    @staticmethod
+    def _closure(names: Iterable[str], edges) -> Set[str]:
+        result = set(names)
+        stack = list(result)
+        while stack:
+            for name in edges(stack.pop()):
+                if name not in result:
+                    result.add(name)
+                    stack.append(name)
+        return result
+
+
+def _is_in_dir(path, directory) -> bool:
+    return path.startswith(os.path.join(directory, ''))
+
+
+def _is_compatible(module_type: str, target_type: str) -> bool:
+    """Whether a module of the type can be built in the target of the type."""
+    if target_type == 'Editor':
+        return module_type != 'Program'
+    if target_type == 'Program':
+        return not module_type.startswith('Editor') or module_type == 'EditorAndProgram'
+    if module_type.startswith('Editor') or module_type in ('Program', 'UncookedOnly'):
+        return False
+    if target_type == 'Server' and module_type.startswith('ClientOnly'):
+        return False
+    if target_type == 'Client' and module_type.startswith('ServerOnly'):
+        return False
+    return True
+
+
+def load(engine_dir, project_file=None) -> ModuleGraph:
+    """Load the module graph of the engine and the project, the cached results are used for unchanged files."""
+    files = _load_tree(engine_dir, ['Source', 'Plugins', 'Platforms'])
+    project = {}
+    if project_file:
+        project_dir = os.path.dirname(project_file)
+        files.update(_load_tree(project_dir, ['Source', 'Plugins'], [project_file]))
+        project = files.pop(project_file, {})
+        project['Dir'] = project_dir
+
+    modules, targets, plugins = [], [], []
+    plugin_dirs = {os.path.dirname(path): data for path, data in files.items() if path.endswith('.uplugin')}
+    for path, data in files.items():
+        if path.endswith('.Build.cs'):
+            modules.append(_make_module(path, data, engine_dir, project, plugin_dirs))
+        elif path.endswith('.Target.cs'):
+            targets += [Target(t['Name'], path, t['Type'], t['Modules']) for t in data.get('Targets', [])]
+        elif path.endswith('.uplugin'):
+            plugins.append(Plugin(os.path.splitext(os.path.basename(path))[0], path,
+                                  data.get('EnabledByDefault', False),
+                                  [(m['Name'], m.get('Type', 'Runtime')) for m in data.get('Modules', [])]))
+    return ModuleGraph(modules, targets, plugins, project)
+
+
+def _make_module(path, data, engine_dir, project, plugin_dirs) -> Module:
+    name = os.path.basename(path)[:-len('.Build.cs')]
+    module_type = 'Runtime'
+    plugin = ''
+    descriptor = None
+    directory = os.path.dirname(path)
+    while True:
+        if directory in plugin_dirs:
+            plugin = os.path.basename(directory)
+            descriptor = plugin_dirs[directory]
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    if descriptor is None and project and _is_in_dir(path, project['Dir']):
+        descriptor = project
+    if descriptor is not None:
+        for m in descriptor.get('Modules', []):
+            if m.get('Name') == name:
+                module_type = m.get('Type', 'Runtime')
+    elif _is_in_dir(path, os.path.join(engine_dir, 'Source')):
+        category = os.path.relpath(path, os.path.join(engine_dir, 'Source')).split(os.sep)[0]
+        module_type = _ENGINE_MODULE_TYPES.get(category, 'Runtime')
+    if data.get('External'):
+        module_type = 'External'
+    return Module(name, path, module_type, plugin, data.get('Dependencies', {}))
+
+
+def _load_tree(root, subdirs, extra_files=()) -> Dict[str, dict]:
+    """Parse all rules and descriptor files under the subdirs of root, reuse the cached results if not changed."""
+    cache_file = os.path.join(root, CACHE_FILE)
+    cache = {}
+    try:
+        with open(cache_file, encoding='utf8') as f:
+            content = json.load(f)
+            if content.get('Version') == _CACHE_VERSION:
+                cache = content['Files']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    files = {}
+    changed = False
+    for path in _list_files(root, subdirs, extra_files):
+        mtime = os.stat(path).st_mtime_ns
+        cached = cache.get(path)
+        if cached and cached['MTime'] == mtime:
+            files[path] = cached
+        else:
+            files[path] = {'MTime': mtime, 'Data': _parse_file(path)}
+            changed = True
+    if changed or len(files) != len(cache):
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w', encoding='utf8') as f:
+                json.dump({'Version': _CACHE_VERSION, 'Files': files}, f)
+        except OSError:
+            # Such as an installed engine in a read only directory, the cache is just an optimization.
+            pass
+    return {path: value['Data'] for path, value in files.items()}
+
+
+def _list_files(root, subdirs, extra_files) -> List[str]:
+    """Find the rules and descriptor files under the subdirs of root, the top level dirs are walked in parallel."""
+    paths = list(extra_files)
+    tops = []
+    for subdir in subdirs:
+        for entry in fs.list_dir_entries(os.path.join(root, subdir)):
+            if entry.is_dir() and entry.name not in _EXCLUDED_DIRS:
+                tops.append(entry.path)
+            elif _is_interesting(entry.name):
+                paths.append(entry.path)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for found in executor.map(_find_files, tops):
+            paths += found
+    return paths
+
+
+def _is_interesting(name) -> bool:
+    return name.endswith(('.Build.cs', '.Target.cs', '.uplugin'))
+
+
+def _find_files(top) -> List[str]:
+    result = []
+    for root, dirs, files in os.walk(top):
+        dirs[:] = [d for d in dirs if d not in _EXCLUDED_DIRS]
+        result += [os.path.join(root, f) for f in files if _is_interesting(f)]
+    return result
+
+
+def _parse_file(path) -> dict:
+    if path.endswith('.Build.cs'):
+        return _parse_build_cs(path)
+    if path.endswith('.Target.cs'):
+        return _parse_target_cs(path)
+    try:
+        with open(path, encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_rules(path) -> str:
+    with open(path, encoding='utf8', errors='replace') as f:
+        return _COMMENT_RE.sub('', f.read())
+
+
+def _parse_build_cs(path) -> dict:
+    """
+    Parse the dependencies in the .Build.cs file.
+    Conditions are not evaluated, so all possible dependencies are included.
+    """
+    content = _read_rules(path)
+    dependencies: Dict[str, List[str]] = {}
+    for field, args in _MODULE_NAMES_RE.findall(content):
+        kind = DEPENDENCY_FIELDS.get(field)
+        if kind:
+            deps = dependencies.setdefault(kind, [])
+            deps += [d for d in _STRING_RE.findall(args) if d not in deps]
+    return {'Dependencies': dependencies, 'External': bool(_EXTERNAL_RE.search(content))}
+
+
+def _parse_target_cs(path) -> dict:
+    """Parse the targets and their modules in the .Target.cs file."""
+    content = _read_rules(path)
+    classes = list(_TARGET_CLASS_RE.finditer(content))
+    targets = []
+    for i, m in enumerate(classes):
+        body = content[m.end():classes[i + 1].start() if i + 1 < len(classes) else len(content)]
+        type_match = _TARGET_TYPE_RE.search(body)
+        target_type = type_match.group(1) if type_match else 'Game'
+        modules = []
+        for field, args in _MODULE_NAMES_RE.findall(body):
+            if field == 'ExtraModuleNames':
+                modules += _STRING_RE.findall(args)
+        launch = _LAUNCH_MODULE_RE.search(body)
+        if launch:
+            modules.append(launch.group(1))
+        elif target_type != 'Program':
+            modules.append('Launch')
+        targets.append({'Name': m.group(1), 'Type': target_type, 'Modules': modules})
+    return {'Targets': targets}
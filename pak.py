@@ -0,0 +1,491 @@
+"""
+Pure python reader of the index of .pak files and IoStore .utoc files.
+
+Only the footer, header and index are parsed, payloads are never read, so it is fast even for multi-GB files.
+"""
+
+import functools
+import mmap
+import os
+import struct
+
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+PAK_MAGIC = 0x5A6F12E1
+# Some important versions of the pak file.
+PAK_VERSION_NO_TIMESTAMPS = 2
+PAK_VERSION_COMPRESSION_ENCRYPTION = 3
+PAK_VERSION_INDEX_ENCRYPTION = 4
+PAK_VERSION_ENCRYPTION_KEY_GUID = 7
+PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD = 8
+PAK_VERSION_FROZEN_INDEX = 9
+PAK_VERSION_PATH_HASH_INDEX = 10
+
+# Compression flags before PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD.
+_LEGACY_COMPRESSION_METHODS = {0: '', 1: 'Zlib', 2: 'Gzip', 4: 'Custom'}
+
+_COMPRESSION_METHOD_NAME_LEN = 32
+_PAK_ENTRY_FLAG_ENCRYPTED = 0x01
+_PAK_ENTRY_FLAG_DELETED = 0x02
+
+UTOC_MAGIC = b'-==--==--==--==-'
+UTOC_HEADER_FORMAT = '<16sBBHIIIIIIIIIQ16sBBHIQII40s'
+# Versions of the utoc file.
+UTOC_VERSION_DIRECTORY_INDEX = 2
+UTOC_VERSION_PERFECT_HASH = 4
+UTOC_VERSION_PERFECT_HASH_WITH_OVERFLOW = 5
+# Flags of the container.
+UTOC_FLAG_ENCRYPTED = 1 << 1
+UTOC_FLAG_SIGNED = 1 << 2
+UTOC_FLAG_INDEXED = 1 << 3
+_UTOC_INVALID_INDEX = 0xFFFFFFFF
+
+
+class PakError(Exception):
+    """The file is not a valid or supported pak/utoc file."""
+
+
+class Entry(NamedTuple):
+    """A file entry in the container."""
+    path: str
+    offset: int
+    # Stored size, may be compressed.
+    size: int
+    uncompressed_size: int
+    compression: str
+    encrypted: bool
+
+
+@functools.lru_cache(maxsize=None)
+def _struct(fmt) -> struct.Struct:
+    return struct.Struct(fmt)
+
+
+_I32 = _struct('<i')
+_U32 = _struct('<I')
+_U32X2 = _struct('<II')
+_U32X3 = _struct('<III')
+_I64 = _struct('<q')
+
+
+class _Reader:
+    """Little endian binary reader on a buffer."""
+    def __init__(self, buffer, pos=0):
+        self.buffer = buffer
+        self.pos = pos
+
+    def unpack(self, fmt):
+        """Read values by the struct format."""
+        st = _struct(fmt)
+        values = st.unpack_from(self.buffer, self.pos)
+        self.pos += st.size
+        return values
+
+    def u8(self) -> int:
+        """Read an uint8."""
+        return self.unpack('<B')[0]
+
+    def i32(self) -> int:
+        """Read an int32."""
+        return self.unpack('<i')[0]
+
+    def u32(self) -> int:
+        """Read an uint32."""
+        return self.unpack('<I')[0]
+
+    def i64(self) -> int:
+        """Read an int64."""
+        return self.unpack('<q')[0]
+
+    def skip(self, size):
+        """Skip some bytes."""
+        if self.pos + size > len(self.buffer):
+            raise PakError('Unexpected end of data')
+        self.pos += size
+
+    def bytes(self, size) -> bytes:
+        """Read raw bytes."""
+        data = bytes(self.buffer[self.pos:self.pos + size])
+        if len(data) != size:
+            raise PakError('Unexpected end of data')
+        self.pos += size
+        return data
+
+    def fstring(self) -> str:
+        """Read an FString, which is a length prefixed, null terminated ANSI or UTF-16 string."""
+        length = self.i32()
+        if length == 0:
+            return ''
+        if length > 0:
+            return self.bytes(length)[:-1].decode('latin-1')
+        return self.bytes(-length * 2)[:-2].decode('utf-16-le')
+
+
+class _Container: # pylint: disable=too-few-public-methods
+    """Common part of pak and utoc files."""
+    def __init__(self, path):
+        self.path = path
+        self.file_size = os.path.getsize(path)
+        self.version = 0
+        self.mount_point = ''
+        self.compression_methods: List[str] = []
+        self.entries: List[Entry] = []
+        self.encrypted_index = False
+        with open(path, 'rb') as f:
+            if self.file_size == 0:
+                raise PakError(f"'{path}' is empty")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    self._parse(mm)
+                except struct.error as e:
+                    raise PakError(f"'{path}' is corrupted: {e}") from e
+
+    def _parse(self, mm):
+        raise NotImplementedError()
+
+    def info(self) -> Dict[str, object]:
+        """Summary information of the container."""
+        return {
+            'Path': self.path,
+            'FileSize': self.file_size,
+            'Version': self.version,
+            'MountPoint': self.mount_point,
+            'Entries': len(self.entries),
+            'UncompressedSize': sum(e.uncompressed_size for e in self.entries),
+            'CompressedSize': sum(e.size for e in self.entries),
+            'CompressionMethods': [m for m in self.compression_methods if m],
+            'EncryptedIndex': self.encrypted_index,
+            'EncryptedEntries': sum(1 for e in self.entries if e.encrypted),
+        }
+
+
+class PakFile(_Container): # pylint: disable=too-few-public-methods
+    """The index of a .pak file."""
+
+    def _parse(self, mm):
+        footer_version, names_count, index_offset, index_size = self._parse_footer(mm)
+        if self.encrypted_index:
+            raise PakError(f"The index of '{self.path}' is encrypted")
+        if index_offset < 0 or index_offset + index_size > self.file_size:
+            raise PakError(f"Invalid index range of '{self.path}'")
+        is_v8a = footer_version == PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD and names_count == 4
+        # Parsing on bytes is much faster than on mmap.
+        reader = _Reader(mm[index_offset:index_offset + index_size])
+        if self.version >= PAK_VERSION_PATH_HASH_INDEX:
+            self._parse_index(reader, mm)
+        else:
+            self._parse_legacy_index(reader, is_v8a)
+
+    def _parse_footer(self, mm) -> Tuple[int, int, int, int]:
+        # Try all possible layouts of the footer from the latest version.
+        # (size of the footer, number of compression methods, has frozen index flag, valid versions)
+        layouts = [
+            (221, 5, False,
+             lambda v: v >= PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD and v != PAK_VERSION_FROZEN_INDEX),
+            (222, 5, True, lambda v: v == PAK_VERSION_FROZEN_INDEX),
+            (189, 4, False, lambda v: v == PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD),
+            (61, 0, False, lambda v: v == PAK_VERSION_ENCRYPTION_KEY_GUID),
+            (45, 0, False, lambda v: PAK_VERSION_INDEX_ENCRYPTION <= v < PAK_VERSION_ENCRYPTION_KEY_GUID),
+            (44, 0, False, lambda v: v < PAK_VERSION_INDEX_ENCRYPTION),
+        ]
+        for size, names_count, has_frozen, valid in layouts:
+            if size > self.file_size:
+                continue
+            reader = _Reader(mm, self.file_size - size)
+            if names_count or size == 61:
+                reader.skip(16)  # EncryptionKeyGuid
+            encrypted_index = size > 44 and reader.u8() != 0
+            magic, version, index_offset, index_size = reader.unpack('<IiqQ')
+            if magic != PAK_MAGIC or not valid(version):
+                continue
+            reader.skip(20)  # Index hash
+            if has_frozen and reader.u8():
+                raise PakError(f"Frozen index of '{self.path}' is not supported")
+            names = [reader.bytes(_COMPRESSION_METHOD_NAME_LEN).split(b'\0')[0].decode() for _ in range(names_count)]
+            self.version = version
+            self.encrypted_index = encrypted_index
+            self.compression_methods = [''] + names
+            return version, names_count, index_offset, index_size
+        raise PakError(f"'{self.path}' is not a valid pak file")
+
+    def _compression_method(self, index) -> str:
+        if self.version < PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD:
+            return _LEGACY_COMPRESSION_METHODS.get(index, str(index))
+        if index < len(self.compression_methods):
+            return self.compression_methods[index]
+        return str(index)
+
+    def _parse_legacy_index(self, reader, is_v8a):
+        self.mount_point = reader.fstring()
+        count = reader.i32()
+        for _ in range(count):
+            path = reader.fstring()
+            entry = self._parse_entry(reader, path, is_v8a)
+            if entry:
+                self.entries.append(entry)
+
+    def _parse_entry(self, reader, path, is_v8a=False):
+        """Parse a FPakEntry serialized in full form, returns None if it is a deleted record."""
+        offset, size, uncompressed_size = reader.unpack('<qqq')
+        if is_v8a:
+            compression = reader.u8()
+        elif self.version >= PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD:
+            compression = reader.u32()
+        else:
+            compression = reader.i32()
+        if self.version < PAK_VERSION_NO_TIMESTAMPS:
+            reader.skip(8)  # Timestamp
+        reader.skip(20)  # Hash
+        flags = 0
+        if self.version >= PAK_VERSION_COMPRESSION_ENCRYPTION:
+            if compression != 0:
+                reader.skip(reader.i32() * 16)  # Compression blocks
+            flags = reader.u8()
+            reader.u32()  # Compression block size
+        if flags & _PAK_ENTRY_FLAG_DELETED:
+            return None
+        return Entry(self.mount_point + path, offset, size, uncompressed_size,
+                     self._compression_method(compression), bool(flags & _PAK_ENTRY_FLAG_ENCRYPTED))
+
+    def _parse_index(self, reader, mm):
+        self.mount_point = reader.fstring()
+        reader.i32()  # Number of entries
+        reader.skip(8)  # Path hash seed
+        if reader.u32():
+            reader.skip(8 + 8 + 20)  # Path hash index
+        if not reader.u32():
+            raise PakError(f"'{self.path}' has no full directory index")
+        directory_index_offset, directory_index_size = reader.unpack('<qq')
+        reader.skip(20)  # Hash
+        encoded_entries = reader.bytes(reader.i32())
+        files = [self._parse_entry(reader, '') for _ in range(reader.i32())]
+
+        if directory_index_offset < 0 or directory_index_offset + directory_index_size > self.file_size:
+            raise PakError(f"Invalid directory index range of '{self.path}'")
+        directory_index = mm[directory_index_offset:directory_index_offset + directory_index_size]
+        self._add_entries(_parse_directory_index(directory_index), encoded_entries, files)
+
+    def _add_entries(self, locations, encoded_entries, files):
+        """Add the entries by their locations, which are in encoded_entries if positive, otherwise in files."""
+        methods = [self._compression_method(i) for i in range(64)]
+        mount_point = self.mount_point
+        for path, location in locations:
+            if location >= 0:
+                self.entries.append(Entry(mount_point + path, *_decode_entry(encoded_entries, location, methods)))
+            else:
+                entry = files[-location - 1]
+                if entry:
+                    self.entries.append(entry._replace(path=mount_point + path))
+
+
+def _decode_entry(buffer, pos, methods) -> tuple:
+    """
+    Decode a FPakEntry in the bit-encoded form.
+    Returns the fields of Entry except the path.
+    """
+    # This is the hot path, so the _Reader is not used.
+    bits = _U32.unpack_from(buffer, pos)[0]
+    pos += 4
+    compression = (bits >> 23) & 0x3f
+    encrypted = bool(bits & (1 << 22))
+    if bits & 0xE000003F == 0xE0000000:
+        # Fast path: all values are 32 bit safe and there is no extra compression block size.
+        if compression:
+            offset, uncompressed_size, size = _U32X3.unpack_from(buffer, pos)
+            return offset, size, uncompressed_size, methods[compression], encrypted
+        offset, uncompressed_size = _U32X2.unpack_from(buffer, pos)
+        return offset, uncompressed_size, uncompressed_size, methods[compression], encrypted
+    if bits & 0x3f == 0x3f:
+        pos += 4  # Compression block size
+    offset, pos = _read_size(buffer, pos, bits & (1 << 31))
+    uncompressed_size, pos = _read_size(buffer, pos, bits & (1 << 30))
+    size = uncompressed_size
+    if compression != 0:
+        size, pos = _read_size(buffer, pos, bits & (1 << 29))
+    return offset, size, uncompressed_size, methods[compression], encrypted
+
+
+def _parse_directory_index(buffer) -> List[Tuple[str, int]]:
+    """
+    Parse the full directory index, which is a TMap<FString, TMap<FString, int32>>.
+    Returns a list of (path, entry location).
+    """
+    # This is the hot path, the parsing is inlined.
+    unpack_i32 = _I32.unpack_from
+    result = []
+    pos = 0
+
+    def fstring(pos) -> Tuple[str, int]:
+        length = unpack_i32(buffer, pos)[0]
+        pos += 4
+        if length >= 0:
+            return buffer[pos:pos + length - 1].decode('latin-1'), pos + length
+        return buffer[pos:pos - length * 2 - 2].decode('utf-16-le'), pos - length * 2
+
+    directory_count = unpack_i32(buffer, pos)[0]
+    pos += 4
+    for _ in range(directory_count):
+        directory, pos = fstring(pos)
+        if directory == '/':
+            directory = ''
+        file_count = unpack_i32(buffer, pos)[0]
+        pos += 4
+        for _ in range(file_count):
+            length = unpack_i32(buffer, pos)[0]
+            pos += 4
+            if length >= 0:
+                name = buffer[pos:pos + length - 1].decode('latin-1')
+                pos += length
+            else:
+                name = buffer[pos:pos - length * 2 - 2].decode('utf-16-le')
+                pos -= length * 2
+            result.append((directory + name, unpack_i32(buffer, pos)[0]))
+            pos += 4
+    return result
+
+
+def _read_size(buffer, pos, is_32bit) -> Tuple[int, int]:
+    """Read an uint32 or int64 value, returns the value and the new position."""
+    if is_32bit:
+        return _U32.unpack_from(buffer, pos)[0], pos + 4
+    return _I64.unpack_from(buffer, pos)[0], pos + 8
+
+
+class IoStoreToc(_Container): # pylint: disable=too-few-public-methods
+    """The table of contents of an IoStore container (.utoc)."""
+
+    def _parse(self, mm):
+        if self.file_size < struct.calcsize(UTOC_HEADER_FORMAT):
+            raise PakError(f"'{self.path}' is not a valid utoc file")
+        header = _UtocHeader._make(struct.unpack_from(UTOC_HEADER_FORMAT, mm))
+        if header.magic != UTOC_MAGIC:
+            raise PakError(f"'{self.path}' is not a valid utoc file")
+        if header.compressed_block_entry_size != 12:
+            raise PakError(f"Unsupported compressed block entry size {header.compressed_block_entry_size} "
+                           f"in '{self.path}'")
+        self.version = header.version
+
+        reader = _Reader(mm, header.toc_header_size)
+        reader.skip(header.entry_count * 12)  # Chunk ids
+        offset_lengths = reader.bytes(header.entry_count * 10)
+        if header.version >= UTOC_VERSION_PERFECT_HASH:
+            reader.skip(header.perfect_hash_seeds_count * 4)
+        if header.version >= UTOC_VERSION_PERFECT_HASH_WITH_OVERFLOW:
+            reader.skip(header.chunks_without_perfect_hash_count * 4)
+        blocks = reader.bytes(header.compressed_block_entry_count * 12)
+        self.compression_methods = [''] + [
+            reader.bytes(header.compression_method_name_length).split(b'\0')[0].decode()
+            for _ in range(header.compression_method_name_count)]
+        if header.container_flags & UTOC_FLAG_SIGNED:
+            hash_size = reader.i32()
+            reader.skip(hash_size * 2 + header.compressed_block_entry_count * 20)
+
+        names: Dict[int, str] = {}
+        self.encrypted_index = bool(header.container_flags & UTOC_FLAG_ENCRYPTED)
+        if (header.version >= UTOC_VERSION_DIRECTORY_INDEX and header.container_flags & UTOC_FLAG_INDEXED and
+                header.directory_index_size > 0 and not self.encrypted_index):
+            names = self._parse_directory_index(_Reader(reader.bytes(header.directory_index_size)))
+
+        for i in range(header.entry_count):
+            data = offset_lengths[i * 10:i * 10 + 10]
+            offset = int.from_bytes(data[:5], 'big')
+            length = int.from_bytes(data[5:], 'big')
+            size, compression = self._compressed_size(blocks, header.compression_block_size, offset, length)
+            path = names.get(i, f'<chunk {i}>')
+            self.entries.append(Entry(path, offset, size, length, self.compression_methods[compression],
+                                      self.encrypted_index))
+
+    def _compressed_size(self, blocks, block_size, offset, length) -> Tuple[int, int]:
+        """Returns the total compressed size of the blocks of a chunk and its compression method index."""
+        if length == 0 or block_size == 0:
+            return 0, 0
+        size = 0
+        method = 0
+        for i in range(offset // block_size, (offset + length - 1) // block_size + 1):
+            entry = blocks[i * 12:i * 12 + 12]
+            if len(entry) < 12:
+                break
+            size += int.from_bytes(entry[5:8], 'little')
+            method = method or entry[11]
+        if method >= len(self.compression_methods):
+            method = 0
+        return size, method
+
+    def _parse_directory_index(self, reader) -> Dict[int, str]:
+        """Returns a dict of chunk index -> path."""
+        self.mount_point = reader.fstring()
+        directories = [reader.unpack('<IIII') for _ in range(reader.i32())]
+        files = [reader.unpack('<III') for _ in range(reader.i32())]
+        strings = [reader.fstring() for _ in range(reader.i32())]
+
+        names = {}
+        stack = [(0, '')] if directories else []
+        while stack:
+            index, path = stack.pop()
+            name, first_child, next_sibling, first_file = directories[index]
+            if next_sibling != _UTOC_INVALID_INDEX:
+                stack.append((next_sibling, path))
+            if name != _UTOC_INVALID_INDEX:
+                path += strings[name] + '/'
+            if first_child != _UTOC_INVALID_INDEX:
+                stack.append((first_child, path))
+            for file_name, chunk_index in _chunk_files(files, first_file):
+                names[chunk_index] = self.mount_point + path + strings[file_name]
+        return names
+
+
+class _UtocHeader(NamedTuple):
+    """FIoStoreTocHeader."""
+    magic: bytes
+    version: int
+    reserved0: int
+    reserved1: int
+    toc_header_size: int
+    entry_count: int
+    compressed_block_entry_count: int
+    compressed_block_entry_size: int
+    compression_method_name_count: int
+    compression_method_name_length: int
+    compression_block_size: int
+    directory_index_size: int
+    partition_count: int
+    container_id: int
+    encryption_key_guid: bytes
+    container_flags: int
+    reserved3: int
+    reserved4: int
+    perfect_hash_seeds_count: int
+    partition_size: int
+    chunks_without_perfect_hash_count: int
+    reserved7: int
+    reserved8: bytes
+
+
+def _chunk_files(files, first_file) -> Iterator[Tuple[int, int]]:
+    """Iterate the linked list of files from first_file in the utoc directory index, yields (name, chunk index)."""
+    file_index = first_file
+    while file_index != _UTOC_INVALID_INDEX:
+        name, file_index, chunk_index = files[file_index]
+        yield name, chunk_index
+
+
+def open_container(path):
+    """Open a .pak or .utoc file according to its extension."""
+    if path.lower().endswith('.utoc'):
+        return IoStoreToc(path)
+    return PakFile(path)
+
+
+def directory_rollup(entries: List[Entry], depth: int) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Sum the sizes of entries by directory at the depth.
+    Returns a dict of directory -> (number of files, uncompressed size, stored size).
+    """
+    result: Dict[str, Tuple[int, int, int]] = {}
+    for entry in entries:
+        # Skip the relative parts of the mount point, such as '../../../'.
+        parts = [p for p in entry.path.split('/')[:-1] if p not in ('', '.', '..')]
+        directory = '/'.join(parts[:depth]) or '.'
+        count, uncompressed, size = result.get(directory, (0, 0, 0))
+        result[directory] = (count + 1, uncompressed + entry.uncompressed_size, size + entry.size)
+    return result
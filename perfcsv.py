@@ -0,0 +1,147 @@
+"""
+Analyze the CSV files written by the engine's CSV profiler (-csvprofile).
+
+Rows are parsed into a compact row-major array of doubles and split into columns at the end,
+which are processed with NumPy if it is installed, otherwise with the pure Python fallbacks.
+"""
+
+import array
+import csv
+import math
+import operator
+
+from typing import Dict, List, NamedTuple, Sequence
+
+try:
+    import numpy  # type: ignore # pylint: disable=import-error
+except ImportError:
+    numpy = None
+
+FRAME_TIME = 'FrameTime'
+# Columns which are not numeric stats.
+_NON_STAT_COLUMNS = {'events'}
+
+
+class Capture(NamedTuple):
+    """The stats of a CSV profiler capture."""
+    path: str
+    # Stat name -> value of each frame.
+    columns: Dict[str, Sequence[float]]
+    # Such as platform, config and commandline, written at the end of the file.
+    metadata: Dict[str, str]
+
+    @property
+    def frames(self) -> int:
+        """Number of frames."""
+        return len(next(iter(self.columns.values()), ()))
+
+
+class Regression(NamedTuple):
+    """Change of the average of a stat between two captures."""
+    stat: str
+    base: float
+    new: float
+
+    @property
+    def delta(self) -> float:
+        """The absolute change."""
+        return self.new - self.base
+
+    @property
+    def ratio(self) -> float:
+        """The relative change, inf if the base is 0."""
+        return self.delta / self.base if self.base else math.inf
+
+
+def load(path) -> Capture:
+    """Load a CSV profiler file, the rows are parsed one by one into a flat array."""
+    with open(path, encoding='utf8', errors='replace', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        names = [name for name in header if name and name not in _NON_STAT_COLUMNS]
+        indexes = [header.index(name) for name in names]
+        cells = operator.itemgetter(*indexes) if len(indexes) > 1 else lambda row: [row[i] for i in indexes]
+        flat = array.array('d')
+        metadata: Dict[str, str] = {}
+        for row in reader:
+            if not row or row == header:
+                # The header row is repeated at the end of the file.
+                continue
+            if row[0].startswith('['):
+                # The metadata row, such as "[HasHeaderRowAtEnd],1,[platform],Linux,...".
+                metadata.update((k.strip('[]'), v) for k, v in zip(row[::2], row[1::2]))
+                continue
+            try:
+                flat.extend(list(map(float, cells(row))))
+            except (IndexError, ValueError):
+                flat.extend(_parse_float(row, i) for i in indexes)
+    return Capture(path, _split_columns(names, flat), metadata)
+
+
+def _parse_float(row: List[str], index: int) -> float:
+    try:
+        return float(row[index])
+    except (IndexError, ValueError):
+        return math.nan
+
+
+def _split_columns(names: List[str], flat: array.array) -> Dict[str, Sequence[float]]:
+    """Split the row-major flat array into columns."""
+    if not names:
+        return {}
+    if numpy is None:
+        return {name: flat[i::len(names)] for i, name in enumerate(names)}
+    matrix = numpy.frombuffer(flat, dtype=numpy.float64).reshape(-1, len(names))
+    return {name: matrix[:, i] for i, name in enumerate(names)}
+
+
+def percentiles(values: Sequence[float], points: Sequence[float]) -> List[float]:
+    """Calculate the percentiles of the values with linear interpolation, NaNs are ignored."""
+    if numpy is not None:
+        values = values[~numpy.isnan(values)]
+        if not len(values):  # pylint: disable=use-implicit-booleaness-not-len
+            return [math.nan] * len(points)
+        return [float(v) for v in numpy.percentile(values, points)]
+    ordered = sorted(v for v in values if not math.isnan(v))
+    if not ordered:
+        return [math.nan] * len(points)
+    result = []
+    for point in points:
+        rank = (len(ordered) - 1) * point / 100
+        low = math.floor(rank)
+        high = min(low + 1, len(ordered) - 1)
+        result.append(ordered[low] + (ordered[high] - ordered[low]) * (rank - low))
+    return result
+
+
+def average(values: Sequence[float]) -> float:
+    """The average of the values, NaNs are ignored."""
+    if numpy is not None:
+        return float(numpy.nanmean(values)) if len(values) else math.nan
+    total = math.fsum(values)
+    if not math.isnan(total):
+        return total / len(values) if values else math.nan
+    valid = [v for v in values if not math.isnan(v)]
+    return math.fsum(valid) / len(valid) if valid else math.nan
+
+
+def count_hitches(frame_times: Sequence[float], thresholds: Sequence[float]) -> Dict[float, int]:
+    """Count the frames which take longer than each threshold."""
+    if numpy is not None:
+        values = numpy.asarray(frame_times)
+        return {t: int(numpy.count_nonzero(values > t)) for t in thresholds}
+    return {t: sum(1 for v in frame_times if v > t) for t in thresholds}
+
+
+def averages(capture: Capture) -> Dict[str, float]:
+    """The average of each stat."""
+    return {name: average(values) for name, values in capture.columns.items()}
+
+
+def regressions(base: Capture, new: Capture, top: int) -> List[Regression]:
+    """The top stats whose averages increase the most from the base capture to the new one."""
+    base_averages, new_averages = averages(base), averages(new)
+    changes = [Regression(stat, base_averages[stat], new_averages[stat])
+               for stat in base_averages.keys() & new_averages.keys()]
+    changes = [c for c in changes if c.delta > 0]
+    return sorted(changes, key=lambda c: c.delta, reverse=True)[:top]
@@ -0,0 +1,57 @@
+"""
+Profile-guided optimization (PGO) support for the clang based platforms.
+
+UBT builds the instrumented binary with -PGOProfile, and reads the merged profile from
+Build/<Platform>/PGO/<Target>-<Platform>-<Config>.profdata of the project with -PGOOptimize.
+"""
+
+import configparser
+import os
+import shlex
+
+from typing import List, Optional
+
+# The raw profiles are written into its subdirectory for each target, relative to the project directory.
+PROFRAW_DIR = os.path.join('Intermediate', 'uct', 'PGO')
+# %p is expanded to the pid by the profile runtime so that the processes don't overwrite each other.
+PROFRAW_PATTERN = '%p.profraw'
+PROFRAW_SUFFIX = '.profraw'
+PROFDATA_SUFFIX = '.profdata'
+
+# The section of the workload arguments of the targets in the configuration file.
+_WORKLOAD_SECTION = 'PGO'
+
+
+def profile_name(target, platform, config) -> str:
+    """The base name of the profile files, which is the same as the one UBT uses."""
+    return f'{target}-{platform}-{config}'
+
+
+def profdata_path(project_dir, platform, name) -> str:
+    """Path of the merged profile which UBT reads with -PGOOptimize."""
+    return os.path.join(project_dir, 'Build', platform, 'PGO', name + PROFDATA_SUFFIX)
+
+
+def profraw_dir(project_dir, name) -> str:
+    """The directory of the raw profiles written by the instrumented binary."""
+    return os.path.join(project_dir, PROFRAW_DIR, name)
+
+
+def load_workload(config_file, target) -> Optional[List[str]]:
+    """
+    Load the arguments of the representative workload of the target from the [PGO] section of the configuration file,
+    such as `MyGame = -ExecCmds="Automation RunTests MyGame.Perf; Quit" -unattended`. None if not configured.
+    """
+    config_file = os.path.expanduser(config_file)
+    if not os.path.exists(config_file):
+        return None
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.has_option(_WORKLOAD_SECTION, target):
+        return None
+    return shlex.split(config.get(_WORKLOAD_SECTION, target), posix=os.name != 'nt')
+
+
+def merge_cmd(llvm_profdata, output, raw_files: List[str]) -> List[str]:
+    """The command to merge the raw profiles into the profile data."""
+    return [llvm_profdata, 'merge', '-o', output] + raw_files
@@ -0,0 +1,92 @@
+"""
+Fingerprint the inputs of project files generation, to skip it when nothing relevant changed.
+"""
+
+import hashlib
+import json
+import os
+
+from typing import Any, Dict, List
+
+# The fingerprint file under the engine or project directory.
+FINGERPRINT_FILE = os.path.join('Intermediate', 'uct', 'project_files.json')
+
+_EXCLUDED_DIRS = {'.git', '.vs', 'Binaries', 'Content', 'DerivedDataCache', 'Documentation', 'Intermediate',
+                  'Saved', 'Shaders'}
+_RULES_SUFFIXES = ('.Build.cs', '.Target.cs', '.uplugin', '.uproject')
+_SOURCE_SUFFIXES = ('.c', '.cc', '.cpp', '.cs', '.h', '.hpp', '.inl', '.ispc', '.usf', '.ush')
+
+
+def fingerprint(root, settings: Dict[str, str], engine_dir=None) -> Dict[str, str]:
+    """
+    Fingerprint the inputs of project files generation under the root directory.
+    The build rules and descriptors are identified by their sizes and mtimes, the source files of a module
+    are identified by their path list, changes of the file contents don't affect the project files.
+    The settings, such as the engine version and the UBT arguments, are included as is.
+    If engine_dir is specified, the engine modules and plugins are included too, which are also
+    in the project files of a game for a source engine.
+    Returns a dict of input name -> digest.
+    """
+    inputs: Dict[str, Any] = {f'<{key}>': value for key, value in settings.items()}
+    _fingerprint_tree(root, root, '', inputs)
+    if engine_dir:
+        for subdir in ('Source', 'Plugins'):
+            _fingerprint_tree(os.path.join(engine_dir, subdir), engine_dir, '<engine>', inputs)
+    return {key: value if isinstance(value, str) else value.hexdigest() for key, value in inputs.items()}
+
+
+def _fingerprint_tree(top, base, prefix, inputs: Dict[str, Any]):
+    """Add the build rules, descriptors and module source lists under the top directory into the inputs."""
+    # Directory -> the source list digest of the module which contains it.
+    modules: Dict[str, Any] = {}
+    for current, dirs, files in os.walk(top):
+        dirs[:] = sorted(d for d in dirs if d not in _EXCLUDED_DIRS)
+        module = modules.get(os.path.dirname(current))
+        if any(name.endswith('.Build.cs') for name in files):
+            module = hashlib.blake2b(digest_size=16)
+            inputs[os.path.join(prefix, os.path.relpath(current, base)) + ' sources'] = module
+        for name in sorted(files):
+            path = os.path.join(current, name)
+            if name.endswith(_RULES_SUFFIXES):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                inputs[os.path.join(prefix, os.path.relpath(path, base))] = f'{st.st_size} {st.st_mtime_ns}'
+            elif module is not None and name.endswith(_SOURCE_SUFFIXES):
+                module.update(os.path.relpath(path, base).encode() + b'\n')
+        if module is not None:
+            modules[current] = module
+
+
+def load(root) -> Dict[str, str]:
+    """Load the fingerprint saved by the last successful generation, empty if not exist."""
+    try:
+        with open(os.path.join(root, FINGERPRINT_FILE), encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save(root, inputs: Dict[str, str]):
+    """Save the fingerprint after a successful generation."""
+    path = os.path.join(root, FINGERPRINT_FILE)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump(inputs, f, indent=4, sort_keys=True)
+    except OSError:
+        pass
+
+
+def diff(old: Dict[str, str], new: Dict[str, str]) -> List[str]:
+    """Describe the changed inputs between two fingerprints."""
+    changes = []
+    for key in sorted(old.keys() | new.keys()):
+        if key not in old:
+            changes.append(f'added: {key}')
+        elif key not in new:
+            changes.append(f'removed: {key}')
+        elif old[key] != new[key]:
+            changes.append(f'changed: {key}')
+    return changes
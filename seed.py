@@ -0,0 +1,103 @@
+"""
+Seed build artifacts from another work tree of the same project.
+"""
+
+import collections
+import concurrent.futures
+import json
+import os
+import re
+
+from typing import Dict, List
+
+import fs
+import vcs
+
+# Text files which may contain absolute paths of the project.
+PATCHED_SUFFIXES = ('.target', '.modules', '.json', '.rsp', '.response', '.uhtmanifest', '.cpp', '.h', '.txt')
+
+# The old path only matches when followed by one of them, so that /work/Game doesn't match /work/GameOther.
+_PATH_END = rb'(?=[/\\"\'\s,;:)\]>]|\Z)'
+
+# Files which contain absolute paths but can't be patched, UBT regenerates them if they are missing.
+SKIPPED_FILES = ('Makefile.bin',)
+
+
+def copy_tree(src_dir, dst_dir, hardlink=False) -> Dict[str, int]:
+    """
+    Copy the src_dir to dst_dir in parallel with fs.clone_file.
+    Returns the number of files copied by each method.
+    """
+    jobs = []
+    for root, _, files in os.walk(src_dir):
+        target_dir = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for file in files:
+            if file in SKIPPED_FILES:
+                continue
+            # Patched files are rewritten, never hardlink them to avoid modifying the source.
+            link = hardlink and not file.endswith(PATCHED_SUFFIXES)
+            jobs.append((os.path.join(root, file), os.path.join(target_dir, file), link))
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        return collections.Counter(executor.map(lambda job: fs.clone_file(*job), jobs))
+
+
+def patch_paths(root, old_path, new_path) -> int:
+    """
+    Replace old_path with new_path in the text files under root, the modification times are kept.
+    Returns the number of patched files.
+    """
+    replacements = [(re.compile(re.escape(old) + _PATH_END), new)
+                    for old, new in zip(_path_forms(old_path), _path_forms(new_path))]
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        files += [os.path.join(dirpath, f) for f in filenames if f.endswith(PATCHED_SUFFIXES)]
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        return sum(executor.map(lambda path: _patch_file(path, replacements), files))
+
+
+def _path_forms(path) -> List[bytes]:
+    """Forms of the path may appear in files: native, with '/' separators and escaped in JSON."""
+    forms = [path, path.replace('\\', '/'), json.dumps(path)[1:-1]]
+    return [os.fsencode(form) for form in dict.fromkeys(forms)]
+
+
+def _patch_file(path, replacements) -> bool:
+    with open(path, 'rb') as f:
+        content = f.read()
+    patched = content
+    for pattern, new in replacements:
+        patched = pattern.sub(lambda _, new=new: new, patched)
+    if patched == content:
+        return False
+    st = os.stat(path)
+    with open(path, 'wb') as f:
+        f.write(patched)
+    # Keep the modification time to avoid rebuilding actions depend on it.
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return True
+
+
+def sync_source_mtimes(src_dir, dst_dir) -> int:
+    """
+    Copy the modification times of tracked files which have identical content in both git work trees,
+    so UBT considers them unchanged, and only rebuilds actions depend on the different files.
+    Returns the number of synchronized files.
+    """
+    src_files = vcs.ls_files(src_dir)
+    dst_files = vcs.ls_files(dst_dir)
+    modified = set(vcs.modified_files(src_dir)) | set(vcs.modified_files(dst_dir))
+    count = 0
+    for path, blob in dst_files.items():
+        if src_files.get(path) != blob or path in modified:
+            continue
+        try:
+            src_mtime = os.stat(os.path.join(src_dir, path)).st_mtime_ns
+            dst_path = os.path.join(dst_dir, path)
+            st = os.stat(dst_path)
+            if st.st_mtime_ns != src_mtime:
+                os.utime(dst_path, ns=(st.st_atime_ns, src_mtime))
+                count += 1
+        except OSError:
+            pass
+    return count
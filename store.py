@@ -0,0 +1,118 @@
+"""
+Content-addressed artifact store.
+
+Files are stored as `objects/<first 2 hex digits>/<rest of the hex digest>` in the store directory,
+archived files are replaced with hardlinks to them, so identical files across archives share the disk space.
+Objects are made read only, since writing to an archived file in place would change all archives sharing it.
+"""
+
+import concurrent.futures
+import os
+import stat
+
+from typing import Tuple
+
+import filehash
+
+
+class StoreError(Exception):
+    """Error in operating the store."""
+
+
+def object_path(store_dir, digest) -> str:
+    """Path of the object of the digest in the store."""
+    return os.path.join(store_dir, 'objects', digest[:2], digest[2:])
+
+
+def ingest(store_dir, archive_dir, max_workers=None) -> Tuple[int, int]:
+    """
+    Move all files under archive_dir into the store and replace them with hardlinks.
+    The store must be on the same file system with archive_dir.
+    Returns the number and total size of files which are deduplicated.
+    """
+    hashes = filehash.hash_tree(archive_dir, max_workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {relpath: executor.submit(_link, store_dir, os.path.join(archive_dir, relpath), h.digest)
+                   for relpath, h in hashes.items()}
+        count, size = 0, 0
+        for relpath, future in futures.items():
+            st, deduplicated = future.result()
+            if deduplicated:
+                count += 1
+                size += st.st_size
+            # The file may be replaced with an existing object with a different mtime, update the cache to keep
+            # it valid, so next hashing of this directory is incremental.
+            hashes[relpath] = filehash.FileHash(st.st_size, st.st_mtime_ns, hashes[relpath].digest)
+    filehash.save_cache(archive_dir, hashes)
+    return count, size
+
+
+def _link(store_dir, path, digest) -> Tuple[os.stat_result, bool]:
+    """Link the file to the object, returns the new stat and whether the file is deduplicated."""
+    obj = object_path(store_dir, digest)
+    st = os.stat(path)
+    try:
+        obj_st = os.stat(obj)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        try:
+            os.link(path, obj)
+            _make_read_only(obj)
+            return os.stat(path), False
+        except FileExistsError:
+            # Added by another file with the same content concurrently.
+            obj_st = os.stat(obj)
+        except OSError as e:
+            raise StoreError(f"Can't link '{path}' into the store, "
+                             f"the store must be on the same file system: {e}") from e
+    if os.path.samestat(st, obj_st):
+        return st, False
+    tmp = path + '.uct-link'
+    try:
+        os.link(obj, tmp)
+        os.replace(tmp, path)
+    except OSError as e:
+        raise StoreError(f"Can't link '{path}' to '{obj}': {e}") from e
+    return obj_st, True
+
+
+def _make_read_only(path):
+    """The file is shared by all archives, so it must not be modified in place."""
+    os.chmod(path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+
+
+def gc(store_dir, dry_run=False) -> Tuple[int, int]:
+    """
+    Remove objects which are not referenced by any archive, that is, which have no other hardlinks.
+    Returns the number and total size of removed objects.
+    """
+    count, size = 0, 0
+    objects_dir = os.path.join(store_dir, 'objects')
+    if not os.path.isdir(objects_dir):
+        raise StoreError(f"'{store_dir}' is not a store.")
+    with os.scandir(objects_dir) as it:
+        subdirs = [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for c, s in executor.map(lambda d: _gc_dir(d, dry_run), subdirs):
+            count += c
+            size += s
+    return count, size
+
+
+def _gc_dir(path, dry_run) -> Tuple[int, int]:
+    count, size = 0, 0
+    with os.scandir(path) as it:
+        for entry in it:
+            st = entry.stat(follow_symlinks=False)
+            if st.st_nlink > 1:
+                continue
+            if not dry_run:
+                try:
+                    # Read only files can't be removed on Windows.
+                    os.chmod(entry.path, stat.S_IREAD | stat.S_IWRITE)
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+            count += 1
+            size += st.st_size
+    return count, size
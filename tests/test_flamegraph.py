@@ -0,0 +1,61 @@
+"""
+Tests of the flamegraph module.
+"""
+
+import unittest
+
+import flamegraph
+
+_PERF_SCRIPT = '''\
+UnrealServer 12345 [003] 1234.567890:    1010101 cycles:
+\t    7f0000001000 FEngineLoop::Tick+0x12 (/work/Binaries/Linux/UnrealServer)
+\t    7f0000002000 GuardedMain+0x40 (/work/Binaries/Linux/UnrealServer)
+\t    7f0000003000 main+0x8 (/work/Binaries/Linux/UnrealServer)
+
+UnrealServer 12345 [003] 1234.577890:    1010101 cycles:
+\t    7f0000001000 FEngineLoop::Tick+0x12 (/work/Binaries/Linux/UnrealServer)
+\t    7f0000002000 GuardedMain+0x40 (/work/Binaries/Linux/UnrealServer)
+\t    7f0000003000 main+0x8 (/work/Binaries/Linux/UnrealServer)
+
+Foreground Worker #1 12350/12351 [001] 1234.567891:    1010101 cycles:
+\t    7f0000004000 [unknown] (/usr/lib/libc.so.6)
+\t    7f0000005000 TGraphTask<A;B>::ExecuteTask+0x30 (/work/Binaries/Linux/UnrealServer)
+
+UnrealServer 12345 [003] 1234.587890:    1010101 cycles:
+\t    7f0000003000 main+0x8 (/work/Binaries/Linux/UnrealServer)
+'''
+
+
+class FlameGraphTest(unittest.TestCase):
+    """Fold the perf script output and layout the frames."""
+
+    def test_fold(self):
+        """The stacks are folded from the root, the command names may contain spaces."""
+        self.assertEqual(flamegraph.fold_perf_script(_PERF_SCRIPT.splitlines(keepends=True)), {
+            'UnrealServer;main;GuardedMain;FEngineLoop::Tick': 2,
+            'Foreground Worker #1;TGraphTask<A:B>::ExecuteTask;[libc.so.6]': 1,
+            'UnrealServer;main': 1,
+        })
+
+    def test_layout(self):
+        """The frames of different threads are placed side by side, so are the children of a frame."""
+        root = flamegraph._build_tree({'A;x': 5, 'B;y': 3, 'B;z': 2})  # pylint: disable=protected-access
+        frames, max_depth = flamegraph._layout(root, 10.0)  # pylint: disable=protected-access
+        self.assertEqual(max_depth, 2)
+        self.assertEqual(sorted(frames, key=lambda f: (f[4], f[2])), [
+            ('A', 5, 10, 50.0, 1),
+            ('B', 5, 60.0, 50.0, 1),
+            ('x', 5, 10, 50.0, 2),
+            ('y', 3, 60.0, 30.0, 2),
+            ('z', 2, 90.0, 20.0, 2),
+        ])
+
+    def test_min_width(self):
+        """Frames narrower than the minimum width are not drawn."""
+        root = flamegraph._build_tree({'A': 1000, 'B': 1})  # pylint: disable=protected-access
+        frames, _ = flamegraph._layout(root, 0.05)  # pylint: disable=protected-access
+        self.assertEqual([frame[0] for frame in frames], ['A'])
+
+
+if __name__ == '__main__':
+    unittest.main()
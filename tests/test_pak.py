@@ -0,0 +1,253 @@
+"""
+Tests of the pak module.
+
+The pak and utoc files are built in memory with the same layouts as the engine writes, only the index is filled,
+the payloads are never read by the reader.
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+
+import pak
+
+_INVALID = 0xFFFFFFFF
+_HASH = b'\0' * 20
+_MOUNT_POINT = '../../../G/'
+
+
+def _fstring(value: str) -> bytes:
+    if value.isascii():
+        data = value.encode() + b'\0'
+        return struct.pack('<i', len(data)) + data
+    data = value.encode('utf-16-le') + b'\0\0'
+    return struct.pack('<i', -(len(data) // 2)) + data
+
+
+def _pak_entry(version, sizes, compression=0, flags=0) -> bytes:
+    """A FPakEntry in the full form, the sizes are (offset, size, uncompressed size)."""
+    offset, size, _ = sizes
+    data = struct.pack('<qqq', *sizes)
+    data += struct.pack('<I' if version >= pak.PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD else '<i', compression)
+    data += _HASH
+    if compression:
+        data += struct.pack('<i', 1) + struct.pack('<qq', offset, offset + size)
+    return data + struct.pack('<BI', flags, 0x10000 if compression else 0)
+
+
+def _pak_footer(version, index_offset, index_size, methods=()) -> bytes:
+    data = b''
+    if version >= pak.PAK_VERSION_INDEX_ENCRYPTION:
+        data += b'\0' * 16 + b'\0'  # EncryptionKeyGuid, bEncryptedIndex
+    data += struct.pack('<IiqQ', pak.PAK_MAGIC, version, index_offset, index_size) + _HASH
+    if version >= pak.PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD:
+        names = list(methods) + [''] * (5 - len(methods))
+        data += b''.join(name.encode().ljust(32, b'\0') for name in names)
+    return data
+
+
+def _legacy_pak(version, methods=()) -> bytes:
+    """A pak file of the version before the path hash index."""
+    zlib = 1 if version < pak.PAK_VERSION_FNAME_BASED_COMPRESSION_METHOD else methods.index('Zlib') + 1
+    files = [
+        ('Content/A.uasset', _pak_entry(version, (0, 100, 100))),
+        ('Content/Maps/M.umap', _pak_entry(version, (100, 300, 1000), zlib)),
+        ('Content/Deleted.uasset', _pak_entry(version, (0, 0, 0), flags=0x02)),
+        ('Config/DefaultGame.ini', _pak_entry(version, (400, 50, 50), flags=0x01)),
+    ]
+    index = _fstring(_MOUNT_POINT) + struct.pack('<i', len(files))
+    index += b''.join(_fstring(path) + entry for path, entry in files)
+    payload = b'\0' * 450
+    return payload + index + _pak_footer(version, len(payload), len(index), methods)
+
+
+def _encoded_entry(offset, size, uncompressed_size, compression=0, encrypted=False) -> bytes:
+    """A FPakEntry in the bit-encoded form of the path hash index."""
+    bits = (compression << 23) | (int(encrypted) << 22)
+    data = b''
+    for value, flag in ((offset, 31), (uncompressed_size, 30), (size, 29)):
+        if flag == 29 and not compression:
+            break
+        if value < 1 << 32:
+            bits |= 1 << flag
+            data += struct.pack('<I', value)
+        else:
+            data += struct.pack('<q', value)
+    return struct.pack('<I', bits) + data
+
+
+def _v11_pak() -> bytes:
+    """A pak file with the path hash index, version 11."""
+    encoded = [
+        _encoded_entry(0, 100, 100),
+        _encoded_entry(100, 300, 1000, compression=1),
+        _encoded_entry(1 << 33, 50, 50, encrypted=True),
+    ]
+    locations = []
+    pos = 0
+    for data in encoded:
+        locations.append(pos)
+        pos += len(data)
+    # Entries which can't be encoded are written in the full form and referenced by negative locations.
+    full_entries = _pak_entry(11, (450, 20, 20)) + _pak_entry(11, (0, 0, 0), flags=0x02)
+    directories = [
+        ('/', [('Root.txt', -1)]),
+        ('Content/', [('A.uasset', locations[0]), ('Deleted.uasset', -2)]),
+        ('Content/Maps/', [('M.umap', locations[1])]),
+        ('Config/', [('配置.ini', locations[2])]),
+    ]
+    directory_index = struct.pack('<i', len(directories))
+    for directory, files in directories:
+        directory_index += _fstring(directory) + struct.pack('<i', len(files))
+        directory_index += b''.join(_fstring(name) + struct.pack('<i', location) for name, location in files)
+
+    payload = b'\0' * 470
+    index_offset = len(payload) + len(directory_index)
+    index = _fstring(_MOUNT_POINT) + struct.pack('<i', 5) + b'\0' * 8
+    index += struct.pack('<I', 0)  # No path hash index
+    index += struct.pack('<Iqq', 1, len(payload), len(directory_index)) + _HASH
+    index += struct.pack('<i', pos) + b''.join(encoded)
+    index += struct.pack('<i', 2) + full_entries
+    return payload + directory_index + index + _pak_footer(11, index_offset, len(index), ['Oodle'])
+
+
+def _utoc() -> bytes:
+    """An IoStore container of version 5 with 3 chunks, the last one has no path."""
+    block_size = 0x10000
+    # (offset, length) of the chunks in the uncompressed space.
+    chunks = [(0, 100), (block_size, 70000), (block_size * 3, 10)]
+    # (compressed size, uncompressed size, compression method) of the blocks.
+    blocks = [(60, 100, 1), (30000, block_size, 1), (2000, 70000 - block_size, 1), (10, 10, 0)]
+    strings = ['Content', 'Maps', 'A.uasset', 'M.umap']
+    # (name, first child, next sibling, first file)
+    directories = [(_INVALID, 1, _INVALID, _INVALID), (0, 2, _INVALID, 0), (1, _INVALID, _INVALID, 1)]
+    # (name, next file, chunk index)
+    files = [(2, _INVALID, 0), (3, _INVALID, 1)]
+
+    directory_index = _fstring(_MOUNT_POINT) + struct.pack('<i', len(directories))
+    directory_index += b''.join(struct.pack('<IIII', *d) for d in directories)
+    directory_index += struct.pack('<i', len(files)) + b''.join(struct.pack('<III', *f) for f in files)
+    directory_index += struct.pack('<i', len(strings)) + b''.join(_fstring(s) for s in strings)
+
+    header_size = struct.calcsize(pak.UTOC_HEADER_FORMAT)
+    header = struct.pack(pak.UTOC_HEADER_FORMAT, pak.UTOC_MAGIC, pak.UTOC_VERSION_PERFECT_HASH_WITH_OVERFLOW, 0, 0,
+                         header_size, len(chunks), len(blocks), 12, 1, 32, block_size, len(directory_index),
+                         1, 0, b'\0' * 16, pak.UTOC_FLAG_INDEXED, 0, 0, 1, 0, 1, 0, b'\0' * 40)
+    data = header + b'\0' * 12 * len(chunks)  # Chunk ids
+    data += b''.join(o.to_bytes(5, 'big') + n.to_bytes(5, 'big') for o, n in chunks)
+    data += struct.pack('<i', 0) + struct.pack('<i', 2)  # Perfect hash seeds, chunks without perfect hash
+    offset = 0
+    for size, uncompressed_size, method in blocks:
+        data += (offset.to_bytes(5, 'little') + size.to_bytes(3, 'little') +
+                 uncompressed_size.to_bytes(3, 'little') + bytes([method]))
+        offset += size
+    data += b'Oodle'.ljust(32, b'\0')
+    return data + directory_index
+
+
+class PakTest(unittest.TestCase):
+    """Parse the containers and check the results of info, list and stat."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def _open(self, name, data):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return pak.open_container(path)
+
+    def _check_legacy(self, version, methods, zlib):
+        container = self._open(f'v{version}.pak', _legacy_pak(version, methods))
+        self.assertIsInstance(container, pak.PakFile)
+        info = container.info()
+        self.assertEqual(info['Version'], version)
+        self.assertEqual(info['MountPoint'], _MOUNT_POINT)
+        self.assertEqual(info['Entries'], 3)
+        self.assertEqual(info['UncompressedSize'], 1150)
+        self.assertEqual(info['CompressedSize'], 450)
+        self.assertEqual(info['CompressionMethods'], list(methods))
+        self.assertFalse(info['EncryptedIndex'])
+        self.assertEqual(info['EncryptedEntries'], 1)
+        self.assertEqual(container.entries, [
+            pak.Entry('../../../G/Content/A.uasset', 0, 100, 100, '', False),
+            pak.Entry('../../../G/Content/Maps/M.umap', 100, 300, 1000, zlib, False),
+            pak.Entry('../../../G/Config/DefaultGame.ini', 400, 50, 50, '', True),
+        ])
+
+    def test_v3(self):
+        """The oldest layout, with the legacy compression flags."""
+        self._check_legacy(3, (), 'Zlib')
+
+    def test_v8(self):
+        """The compression methods are named in the footer."""
+        self._check_legacy(8, ('Oodle', 'Zlib'), 'Zlib')
+
+    def test_v11(self):
+        """The path hash index with bit-encoded entries."""
+        container = self._open('v11.pak', _v11_pak())
+        info = container.info()
+        self.assertEqual(info['Version'], 11)
+        self.assertEqual(info['Entries'], 4)
+        self.assertEqual(info['UncompressedSize'], 1170)
+        self.assertEqual(info['CompressedSize'], 470)
+        self.assertEqual(info['CompressionMethods'], ['Oodle'])
+        self.assertEqual(info['EncryptedEntries'], 1)
+        self.assertEqual(container.entries, [
+            pak.Entry('../../../G/Root.txt', 450, 20, 20, '', False),
+            pak.Entry('../../../G/Content/A.uasset', 0, 100, 100, '', False),
+            pak.Entry('../../../G/Content/Maps/M.umap', 100, 300, 1000, 'Oodle', False),
+            pak.Entry('../../../G/Config/配置.ini', 1 << 33, 50, 50, '', True),
+        ])
+
+    def test_utoc(self):
+        """The chunk sizes are summed from the compressed blocks."""
+        container = self._open('G.utoc', _utoc())
+        self.assertIsInstance(container, pak.IoStoreToc)
+        info = container.info()
+        self.assertEqual(info['Version'], 5)
+        self.assertEqual(info['MountPoint'], _MOUNT_POINT)
+        self.assertEqual(info['Entries'], 3)
+        self.assertEqual(info['UncompressedSize'], 70110)
+        self.assertEqual(info['CompressedSize'], 32070)
+        self.assertEqual(info['CompressionMethods'], ['Oodle'])
+        self.assertFalse(info['EncryptedIndex'])
+        self.assertEqual(container.entries, [
+            pak.Entry('../../../G/Content/A.uasset', 0, 60, 100, 'Oodle', False),
+            pak.Entry('../../../G/Content/Maps/M.umap', 0x10000, 32000, 70000, 'Oodle', False),
+            pak.Entry('<chunk 2>', 0x30000, 10, 10, '', False),
+        ])
+
+    def test_stat(self):
+        """The relative parts of the mount point are skipped."""
+        entries = self._open('v11.pak', _v11_pak()).entries
+        self.assertEqual(pak.directory_rollup(entries, 2), {
+            'G': (1, 20, 20),
+            'G/Content': (2, 1100, 400),
+            'G/Config': (1, 50, 50),
+        })
+        self.assertEqual(pak.directory_rollup(entries, 3), {
+            'G': (1, 20, 20),
+            'G/Content': (1, 100, 100),
+            'G/Content/Maps': (1, 1000, 300),
+            'G/Config': (1, 50, 50),
+        })
+        self.assertEqual(pak.directory_rollup(self._open('G.utoc', _utoc()).entries, 1), {
+            'G': (2, 70100, 32060),
+            '.': (1, 10, 10),
+        })
+
+    def test_invalid(self):
+        """Truncated and empty files are rejected."""
+        with self.assertRaises(pak.PakError):
+            self._open('empty.pak', b'')
+        with self.assertRaises(pak.PakError):
+            self._open('bad.pak', b'\0' * 100)
+        with self.assertRaises(pak.PakError):
+            self._open('bad.utoc', _utoc()[:100])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+Aggregate the clang -ftime-trace files of the translation units to find the compile-time hotspots.
+
+Clang writes a Chrome trace JSON file next to each object file. The durations of the "Source" events of the
+headers and the instantiation events of the templates are inclusive, they contain the nested ones.
+"""
+
+import collections
+import concurrent.futures
+import json
+import os
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+TRACE_SUFFIX = '.json'
+# Clang always starts the file with it, used to skip other JSON files quickly.
+_TRACE_HEAD = '{"traceEvents"'
+_TEMPLATE_EVENTS = ('InstantiateClass', 'InstantiateFunction')
+_UNIT_EVENT = 'ExecuteCompiler'
+_CHUNK_SIZE = 16
+# Size of the text read from a trace file at a time.
+_READ_SIZE = 1024 * 1024
+# Between the events in the traceEvents array.
+_SEPARATORS = ' \t\r\n,'
+
+
+class Item(NamedTuple):
+    """The accumulated time and number of times of a header or a template, the time is in microseconds."""
+    time: int
+    calls: int
+
+
+class Unit(NamedTuple):
+    """The time trace of a translation unit."""
+    path: str
+    module: str
+    time: int
+    headers: Dict[str, Tuple[int, int]]
+    templates: Dict[str, Tuple[int, int]]
+
+
+class Report(NamedTuple):
+    """The aggregated time traces."""
+    headers: Dict[str, Item]
+    templates: Dict[str, Item]
+    # (path, time) of each translation unit.
+    units: List[Tuple[str, int]]
+    modules: Dict[str, int]
+
+    def top_headers(self, count) -> List[Tuple[str, Item]]:
+        """The most expensive headers by total parse time."""
+        return sorted(self.headers.items(), key=lambda item: item[1].time, reverse=True)[:count]
+
+    def top_templates(self, count) -> List[Tuple[str, Item]]:
+        """The slowest template instantiations by total time."""
+        return sorted(self.templates.items(), key=lambda item: item[1].time, reverse=True)[:count]
+
+    def top_units(self, count) -> List[Tuple[str, int]]:
+        """The slowest translation units."""
+        return sorted(self.units, key=lambda unit: unit[1], reverse=True)[:count]
+
+    def top_modules(self, count) -> List[Tuple[str, int]]:
+        """The slowest modules by the total time of their translation units."""
+        return sorted(self.modules.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def build_args() -> List[str]:
+    """UBT arguments to make clang write the time traces."""
+    return ['-Timing']
+
+
+def find_traces(dirs: Iterable[str], since: float) -> List[str]:
+    """Find the JSON files under the dirs which are modified since the time."""
+    files = []
+    for top in dirs:
+        for root, _, names in os.walk(top):
+            for name in names:
+                if not name.endswith(TRACE_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) >= since:
+                        files.append(path)
+                except OSError:
+                    continue
+    return files
+
+
+def load(path) -> Optional[Unit]:
+    """Load the time trace of a translation unit, None if it is not a time trace file."""
+    unit_time = 0
+    headers: Dict[str, List[int]] = collections.defaultdict(lambda: [0, 0])
+    templates: Dict[str, List[int]] = collections.defaultdict(lambda: [0, 0])
+    try:
+        with open(path, encoding='utf8', errors='replace') as f:
+            head = f.read(len(_TRACE_HEAD))
+            if head != _TRACE_HEAD:
+                return None
+            for event in _iter_events(f, head):
+                name = event.get('name')
+                duration = event.get('dur', 0)
+                if name == 'Source':
+                    item = headers[event['args']['detail']]
+                elif name in _TEMPLATE_EVENTS:
+                    item = templates[event['args']['detail']]
+                else:
+                    if name == _UNIT_EVENT:
+                        unit_time = max(unit_time, duration)
+                    continue
+                item[0] += duration
+                item[1] += 1
+    except (OSError, ValueError, KeyError):
+        return None
+    # The object files of a module are in the directory named after it.
+    module = os.path.basename(os.path.dirname(path))
+    return Unit(path, module, unit_time, {k: (v[0], v[1]) for k, v in headers.items()},
+                {k: (v[0], v[1]) for k, v in templates.items()})
+
+
+def _iter_events(f, buffer='') -> Iterator[dict]:
+    """
+    Parse the events in the traceEvents array one by one, only a chunk of the file and an event are in memory.
+    The buffer is the content read from the file already.
+    """
+    decoder = json.JSONDecoder()
+    buffer += f.read(_READ_SIZE)
+    pos = buffer.index('[', len(_TRACE_HEAD)) + 1
+    while True:
+        while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            event, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # The event is cut by the end of the buffer, read more.
+            chunk = f.read(_READ_SIZE)
+            if not chunk:
+                raise
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield event
+
+
+def aggregate(paths: List[str], max_workers: Optional[int] = None) -> Report:
+    """
+    Load the trace files in parallel and aggregate them one by one as they are loaded.
+    Processes are used since parsing JSON holds the GIL.
+    """
+    headers: Dict[str, List[int]] = collections.defaultdict(lambda: [0, 0])
+    templates: Dict[str, List[int]] = collections.defaultdict(lambda: [0, 0])
+    units = []
+    modules: Dict[str, int] = collections.Counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for unit in executor.map(load, paths, chunksize=_CHUNK_SIZE):
+            if unit is None:
+                continue
+            _accumulate(headers, unit.headers)
+            _accumulate(templates, unit.templates)
+            units.append((unit.path, unit.time))
+            modules[unit.module] += unit.time
+    return Report({k: Item(*v) for k, v in headers.items()}, {k: Item(*v) for k, v in templates.items()},
+                  units, dict(modules))
+
+
+def _accumulate(total: Dict[str, List[int]], items: Dict[str, Tuple[int, int]]):
+    for key, (time, count) in items.items():
+        item = total[key]
+        item[0] += time
+        item[1] += count
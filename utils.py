@@ -2,10 +2,14 @@
 Some utility functions.
 """
 
+import concurrent.futures
 import subprocess
 import os
+import re
+import signal
+import time
 
-from typing import Union, List
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 
 def subprocess_call(cmd: Union[str, List[str]], *args, **kwargs) -> int:
@@ -28,3 +32,118 @@ def subprocess_run(cmd: Union[str, List[str]], *args, **kwargs):
         # For the above same reason.
         return subprocess.run(' '.join(cmd), *args, **kwargs)
     return subprocess.run(cmd, *args, **kwargs)
+
+
+def subprocess_stream(cmd: Union[str, List[str]], on_line: Callable[[str], None], **kwargs) -> int:
+    """Run an external command, call on_line for each line of its output."""
+    if os.name == 'nt' and isinstance(cmd, list):
+        # For the above same reason.
+        cmd = ' '.join(cmd)
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True, errors='replace', **kwargs) as p:
+        assert p.stdout
+        for line in p.stdout:
+            on_line(line)
+    return p.returncode
+
+
+def popen_in_new_group(cmd: Union[str, List[str]], **kwargs) -> subprocess.Popen:
+    """Start a process in a new process group, so it can be terminated together with its children."""
+    if os.name == 'nt':
+        if isinstance(cmd, list):
+            # For the above same reason.
+            cmd = ' '.join(cmd)
+        kwargs['creationflags'] = kwargs.get('creationflags', 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    return subprocess.Popen(cmd, **kwargs) # pylint: disable=consider-using-with
+
+
+def terminate_process_group(p: subprocess.Popen, timeout=5.0) -> int:
+    """
+    Terminate a process started by popen_in_new_group and its children,
+    kill them if they don't exit in timeout seconds. Returns the exit code.
+    """
+    if os.name == 'nt':
+        subprocess.call(['taskkill', '/T', '/F', '/PID', str(p.pid)],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return p.wait()
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+        return p.wait(timeout)
+    except ProcessLookupError:
+        return p.wait()
+    except subprocess.TimeoutExpired:
+        os.killpg(p.pid, signal.SIGKILL)
+        return p.wait()
+
+
+def total_memory() -> int:
+    """Total physical memory of the system in bytes, 0 if unknown."""
+    if os.name == 'nt':
+        import ctypes # pylint: disable=import-outside-toplevel
+
+        class MemoryStatusEx(ctypes.Structure):
+            """The MEMORYSTATUSEX structure, the field names follow the Windows API."""
+            # pylint: disable=too-few-public-methods,invalid-name
+            _fields_ = [
+                ('dwLength', ctypes.c_ulong),
+                ('dwMemoryLoad', ctypes.c_ulong),
+                ('ullTotalPhys', ctypes.c_ulonglong),
+                ('ullAvailPhys', ctypes.c_ulonglong),
+                ('ullTotalPageFile', ctypes.c_ulonglong),
+                ('ullAvailPageFile', ctypes.c_ulonglong),
+                ('ullTotalVirtual', ctypes.c_ulonglong),
+                ('ullAvailVirtual', ctypes.c_ulonglong),
+                ('sullAvailExtendedVirtual', ctypes.c_ulonglong),
+            ]
+
+            def __init__(self):
+                super().__init__()
+                self.dwLength = ctypes.sizeof(self)
+
+        status = MemoryStatusEx()
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)): # type: ignore
+            return status.ullTotalPhys
+        return 0
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError):
+        return 0
+
+
+def run_commands_parallel(commands: Dict[str, List[str]], log_dir: str,
+                          max_workers: Optional[int] = None) -> Dict[str, Tuple[int, float]]:
+    """
+    Run multiple external commands concurrently.
+    The output of each command is written to `log_dir/{name}.log`.
+    Returns a dict of name -> (returncode, duration in seconds).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+
+    def run_one(name, cmd):
+        start = time.monotonic()
+        with open(os.path.join(log_dir, name + '.log'), 'w', encoding='utf8') as log:
+            ret = subprocess_call(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        return ret, time.monotonic() - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(commands)) as executor:
+        futures = {name: executor.submit(run_one, name, cmd) for name, cmd in commands.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def format_size(size: float) -> str:
+    """Format a size in bytes to a human readable string, such as 1.5G."""
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(size) < 1024:
+            return f'{size:.1f}{unit}' if unit != 'B' else f'{size:.0f}{unit}'
+        size /= 1024
+    return f'{size:.1f}T'
+
+
+def parse_size(text: str) -> int:
+    """Parse a human readable size string such as 100G to bytes."""
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', text, re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Invalid size '{text}'")
+    return int(float(m.group(1)) * 1024 ** ' KMGT'.index(m.group(2).upper() or ' '))
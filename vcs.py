@@ -0,0 +1,61 @@
+"""
+Version control system utility, only git is supported.
+"""
+
+import subprocess
+
+from typing import Dict, List
+
+
+class VcsError(Exception):
+    """Error in running the version control system."""
+
+
+def _git(repo_dir, *args, check=False) -> List[str]:
+    """
+    Run a git command in the repo_dir, returns the NUL separated output.
+    If failed, raise VcsError if check is true, otherwise returns an empty list.
+    """
+    try:
+        result = subprocess.run(['git', '-C', repo_dir] + list(args), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        if check:
+            message = e.stderr.decode('utf8', errors='replace').strip() if hasattr(e, 'stderr') else str(e)
+            raise VcsError(f"git {' '.join(args)}: {message}") from e
+        return []
+    return [item for item in result.stdout.decode('utf8', errors='replace').split('\0') if item]
+
+
+def is_repo(path) -> bool:
+    """Whether the path is in a git work tree."""
+    # It prints false in the .git directory.
+    return ''.join(_git(path, 'rev-parse', '--is-inside-work-tree')).strip() == 'true'
+
+
+def ls_files(repo_dir) -> Dict[str, str]:
+    """
+    List files tracked by git under the repo_dir.
+    Returns a dict of path relative to repo_dir (with '/' as separator) -> blob id in the index.
+    """
+    files = {}
+    for item in _git(repo_dir, 'ls-files', '--stage', '-z'):
+        # <mode> SP <object> SP <stage> TAB <file>
+        info, path = item.split('\t', 1)
+        files[path] = info.split(' ')[1]
+    return files
+
+
+def modified_files(repo_dir) -> List[str]:
+    """Tracked files under the repo_dir which are modified in the work tree but not staged."""
+    return _git(repo_dir, 'ls-files', '--modified', '-z')
+
+
+def changed_files(repo_dir, base='HEAD') -> List[str]:
+    """
+    Files under the repo_dir which are added or modified in the work tree since the base revision,
+    including untracked files. Returns paths relative to repo_dir (with '/' as separator).
+    """
+    files = _git(repo_dir, 'diff', '--name-only', '--relative', '--diff-filter=d', '-z', base, '--', check=True)
+    files += _git(repo_dir, 'ls-files', '--others', '--exclude-standard', '-z', check=True)
+    return list(dict.fromkeys(files))
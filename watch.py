@@ -0,0 +1,195 @@
+"""
+Watch file changes in directory trees, with inotify on Linux and polling on other systems.
+"""
+
+import abc
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from typing import Dict, List, Optional, Set, Tuple
+
+import console
+
+# Directories are not watched, they are changed by building and running.
+IGNORED_DIRS = {'Binaries', 'DerivedDataCache', 'Intermediate', 'Saved', '.git', '.vs'}
+
+# inotify constants, see /usr/include/linux/inotify.h
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+
+class Watcher(abc.ABC):
+    """Base class of watchers."""
+    kind = ''
+
+    def __init__(self, dirs: List[str], suffixes: Tuple[str, ...]):
+        self.dirs = dirs
+        self.suffixes = suffixes
+
+    @abc.abstractmethod
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Wait for changes until timeout, returns paths of the changed files, empty if timeout."""
+
+    def close(self):
+        """Stop watching."""
+
+    def _is_interesting(self, name) -> bool:
+        return name.endswith(self.suffixes)
+
+    def _walk(self, top):
+        """Walk the directory tree, skipping the ignored directories."""
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            yield root, files
+
+
+class InotifyWatcher(Watcher):
+    """Watch changes with inotify."""
+    kind = 'inotify'
+
+    def __init__(self, dirs: List[str], suffixes: Tuple[str, ...]):
+        super().__init__(dirs, suffixes)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self._paths: Dict[int, str] = {}
+        try:
+            for top in dirs:
+                self._add_tree(top)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, top) -> List[str]:
+        """Watch all directories in the tree, returns the interesting files in it."""
+        files = []
+        for root, names in self._walk(top):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(root), _WATCH_MASK)
+            if wd < 0:
+                # ENOSPC means the fs.inotify.max_user_watches limit is reached.
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch '{root}'")
+            self._paths[wd] = root
+            files += [os.path.join(root, n) for n in names if self._is_interesting(n)]
+        return files
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        changes: Set[str] = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changes
+        data = os.read(self._fd, 256 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                # Some events are lost, report the watched directories so the caller does a full build.
+                changes.update(self.dirs)
+                continue
+            if mask & _IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            if wd not in self._paths:
+                continue
+            path = os.path.join(self._paths[wd], name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and name not in IGNORED_DIRS:
+                    changes.update(self._add_tree(path))
+            elif self._is_interesting(name):
+                changes.add(path)
+        return changes
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Watch changes by scanning the directories periodically."""
+    kind = 'polling'
+
+    def __init__(self, dirs: List[str], suffixes: Tuple[str, ...], interval=1.0):
+        super().__init__(dirs, suffixes)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for top in self.dirs:
+            for root, names in self._walk(top):
+                for name in names:
+                    if self._is_interesting(name):
+                        path = os.path.join(root, name)
+                        try:
+                            st = os.stat(path)
+                        except OSError:
+                            continue
+                        snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self._scan()
+            changes = {p for p in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(p) != self._snapshot.get(p)}
+            self._snapshot = snapshot
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+
+def create_watcher(dirs: List[str], suffixes: Tuple[str, ...]) -> Watcher:
+    """Create the best watcher supported by current system."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(dirs, suffixes)
+        except (OSError, AttributeError) as e:
+            console.warn(f"Can't use inotify ({e}), fallback to polling.")
+    return PollingWatcher(dirs, suffixes)
+
+
+def wait_quiet(watcher: Watcher, changes: Set[str], quiet: float) -> Set[str]:
+    """Debounce a burst of changes: collect more changes until there is none in quiet seconds."""
+    while True:
+        more = watcher.wait(quiet)
+        if not more:
+            return changes
+        changes |= more
+
+
+def wait_changes(watcher: Watcher, timeout: Optional[float], quiet: float) -> Tuple[Watcher, Set[str]]:
+    """
+    Wait for changes until timeout and debounce them, returns the watcher to use next and the changes.
+    If the watcher fails, such as the inotify watches run out, it's replaced by a polling one,
+    and the watched directories are reported since some changes may be lost.
+    """
+    try:
+        changes = watcher.wait(timeout)
+        return watcher, wait_quiet(watcher, changes, quiet) if changes else changes
+    except OSError as e:
+        console.warn(f"Can't watch by {watcher.kind} ({e}), fallback to polling.")
+        watcher.close()
+        return PollingWatcher(watcher.dirs, watcher.suffixes), set(watcher.dirs)